@@ -1,12 +1,21 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
 import dspy
 from django.utils import timezone
 from llmonkey.llms import BaseLLMModel
 
+from columns.logic.llm_request_stats import llm_request_stats
+from columns.logic.llm_response_cache import (
+    get_cached_llm_response,
+    get_llm_response_cache_key,
+    set_cached_llm_response,
+)
 from columns.schemas import CellData, Criterion
 from config.utils import get_default_model
 from data_map_backend.models import CollectionColumn, ServiceUsage
 from workflows.dspy_models import dspy_model_registry
-import dspy
 
 
 class RelevanceSignature(dspy.Signature):
@@ -24,22 +33,72 @@ class RelevanceSignature(dspy.Signature):
     )
 
 
+class MultiCriteriaRelevanceSignature(dspy.Signature):
+    """You are a helpful assistant for evaluating the relevance of a document based on a list of criteria.
+    Evaluate each criterion separately and return exactly one review per criterion, in the order of the criteria."""
+
+    document: str = dspy.InputField()
+    criteria: list[str] = dspy.InputField()
+    target_language: str = dspy.InputField(desc="The desired output language for reason")
+    criteria_review: list[Criterion] = dspy.OutputField(
+        desc="One review per criterion: the criterion, if it is fulfilled, a very short reason (in output_language) "
+        "and a short supporting quote from the document in original language"
+    )
+
+
 class RelevanceJudge(dspy.Module):
-    def __init__(self, callbacks=None):
+    # "sequential": one LLM call per criterion, one after another (default, the original behavior)
+    # "parallel": one LLM call per criterion, issued concurrently
+    # "single_call": all criteria are evaluated in one structured LLM call (falls back to "parallel" on errors)
+    def __init__(self, mode: str = "sequential", callbacks=None):
         super().__init__(callbacks)
+        self.mode = mode
         self.relevance = dspy.Predict(RelevanceSignature)
+        self.multi_criteria_relevance = dspy.Predict(MultiCriteriaRelevanceSignature)
 
     def forward(self, document: str, criteria: list[str], target_language: str) -> list[Criterion]:
-        criteria_review = []
-        for c in criteria:
-            rel = self.relevance(document=document, criterion=c, target_language=target_language)
-            criteria_review.append(
-                Criterion(
-                    criteria=c, fulfilled=rel.fullfilled, reason=rel.reason, supporting_quote=rel.supporting_quote
-                )
+        if self.mode == "single_call" and len(criteria) > 1:
+            try:
+                return self._judge_all_criteria_at_once(document, criteria, target_language)
+            except Exception as e:
+                logging.warning(f"Single call relevance judging failed, judging criteria separately: {e}")
+        if self.mode in ["single_call", "parallel"] and len(criteria) > 1:
+            # dspy settings like the LM are thread-local and need to be passed to the worker threads
+            lm = dspy.settings.lm
+
+            def judge_criterion(criterion: str) -> Criterion:
+                with dspy.context(lm=lm):
+                    return self._judge_criterion(document, criterion, target_language)
+
+            with ThreadPoolExecutor(max_workers=min(len(criteria), 10)) as executor:
+                return list(executor.map(judge_criterion, criteria))
+        return [self._judge_criterion(document, c, target_language) for c in criteria]
+
+    def _judge_criterion(self, document: str, criterion: str, target_language: str) -> Criterion:
+        rel = self.relevance(document=document, criterion=criterion, target_language=target_language)
+        return Criterion(
+            criteria=criterion, fulfilled=rel.fullfilled, reason=rel.reason, supporting_quote=rel.supporting_quote
+        )
+
+    def _judge_all_criteria_at_once(self, document: str, criteria: list[str], target_language: str) -> list[Criterion]:
+        rel = self.multi_criteria_relevance(document=document, criteria=criteria, target_language=target_language)
+        if len(rel.criteria_review) != len(criteria):
+            raise ValueError(f"Got {len(rel.criteria_review)} reviews for {len(criteria)} criteria")
+        # using the original criteria texts in case the LLM changed them slightly:
+        return [
+            Criterion(
+                criteria=criterion,
+                fulfilled=review.fulfilled,
+                reason=review.reason,
+                supporting_quote=review.supporting_quote,
             )
+            for criterion, review in zip(criteria, rel.criteria_review)
+        ]
+
 
-        return criteria_review
+def record_lm_statistics(cause: str, lm: dspy.LM, duration: float):
+    tokens = sum((entry.get("usage") or {}).get("total_tokens", 0) or 0 for entry in lm.history)
+    llm_request_stats.record(cause, requests=len(lm.history), tokens=tokens, seconds=duration)
 
 
 class CellPromptSignature(dspy.Signature):
@@ -152,23 +211,60 @@ def generate_llm_cell_data(
     #     logging.error("No model specified for LLM column.")
     #     cell_data["value"] = "No model specified"
     #     return cell_data
+
+    # reprocessed columns or items that appear in several collections often lead to exactly the same request:
+    use_cache = column.parameters.get("use_llm_response_cache", True)
+    language = column.parameters.get("language") or "en"
+    # opt-in per column, as "single_call" uses a different prompt:
+    relevance_judge_mode = column.parameters.get("relevance_judge_mode") or "sequential"
+    if is_relevance_column:
+        signature = (
+            MultiCriteriaRelevanceSignature.__doc__
+            if relevance_judge_mode == "single_call"
+            else RelevanceSignature.__doc__
+        )
+    elif column.prompt_template:
+        signature = None  # the prompt template is part of the key anyway
+    else:
+        signature = CellPromptSignature.__doc__
+    cache_key = get_llm_response_cache_key(
+        model=model_name,
+        is_relevance_column=is_relevance_column,
+        relevance_judge_mode=relevance_judge_mode if is_relevance_column else None,
+        signature=signature,
+        input_data=input_data,
+        column_name=column.name,
+        expression=column.expression,
+        prompt_template=column.prompt_template,
+        language=language,
+    )
+    if use_cache:
+        cached_response = get_cached_llm_response(cache_key)
+        if cached_response is not None:
+            cell_data.value = cached_response["value"]
+            cell_data.used_prompt = cached_response["used_prompt"]
+            return cell_data
+
     model = BaseLLMModel.load(model_name)
 
     # necessary 'AI credits' is defined by us as the cost per 1M tokens / factor:
     ai_credits = model.config.euro_per_1M_output_tokens / 5.0
     usage_tracker = ServiceUsage.get_usage_tracker(user_id, "External AI")
-    result = usage_tracker.track_usage(ai_credits, f"extract information using {model.__class__.__name__}")
+    usage_cause = f"extract information using {model.__class__.__name__}"
+    result = usage_tracker.track_usage(ai_credits, usage_cause)
     if result["approved"] != True:
         cell_data.value = "AI usage limit exceeded"
         return cell_data
 
     if is_relevance_column:
         # handle special case for relevance column
-        language = column.parameters.get("language") or "en"
-        judge = RelevanceJudge()
+        judge = RelevanceJudge(mode=relevance_judge_mode)
         criteria = column.expression.split("\n")
-        with dspy.context(lm=dspy.LM(**model.to_litellm())):
+        lm = dspy.LM(**model.to_litellm())
+        t1 = time.time()
+        with dspy.context(lm=lm):
             criteria_review = judge(document=input_data, criteria=criteria, target_language=language)
+        record_lm_statistics(usage_cause, lm, time.time() - t1)
         relevance_score = sum([c.fulfilled for c in criteria_review]) / max(len(criteria_review), 1)
         value = {
             "criteria_review": [c.model_dump() for c in criteria_review],  # type: ignore
@@ -177,17 +273,13 @@ def generate_llm_cell_data(
         }
         cell_data.value = value
         cell_data.used_prompt = f"system_prompt: {judge.__class__.__name__}"
-        return cell_data
-
-    if column.prompt_template:
+    elif column.prompt_template:
         # if the column has a prompt template, we use it to generate the system prompt
         value, used_prompt = generate_custom_prompt_response(column, model, input_data)
         cell_data.value = value
         cell_data.used_prompt = f"system_prompt:\n{used_prompt}"
-        return cell_data
     else:
         # otherwise we use the default DSPy module to generate the response
-        language = column.parameters.get("language") or "en"
         executor = CellPromptExecutor()
         with dspy.context(lm=dspy.LM(**model.to_litellm())):
             value = executor(
@@ -198,4 +290,7 @@ def generate_llm_cell_data(
             )
         cell_data.value = value
         cell_data.used_prompt = f"system_prompt: {executor.__class__.__name__}"
-        return cell_data
+
+    if use_cache:
+        set_cached_llm_response(cache_key, {"value": cell_data.value, "used_prompt": cell_data.used_prompt})
+    return cell_data
@@ -0,0 +1,26 @@
+import threading
+from collections import defaultdict
+
+
+class LlmRequestStats(object):
+    """Counts LLM requests, tokens and latency per usage cause, exported as Prometheus metrics.
+
+    Kept separate from ServiceUsage.usage_by_cause, which is only used for the AI credits (billing)."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._stats: dict[str, dict[str, float]] = defaultdict(lambda: {"requests": 0, "tokens": 0, "seconds": 0.0})
+
+    def record(self, cause: str, requests: int, tokens: int, seconds: float) -> None:
+        with self._lock:
+            stats = self._stats[cause]
+            stats["requests"] += requests
+            stats["tokens"] += tokens
+            stats["seconds"] += seconds
+
+    def get_stats(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            return {cause: dict(stats) for cause, stats in self._stats.items()}
+
+
+llm_request_stats = LlmRequestStats()
@@ -0,0 +1,42 @@
+import hashlib
+import json
+import logging
+import os
+
+from diskcache import Cache
+
+LLM_RESPONSE_CACHE_MAX_BYTES = int(os.getenv("LLM_RESPONSE_CACHE_MAX_BYTES", 5 * 1024 * 1024 * 1024))
+LLM_RESPONSE_CACHE_TTL_SECONDS = 3600 * 24 * 7 * 4  # 4 weeks
+LLM_RESPONSE_CACHE_DIR = "/data/quiddity_data/llm_response_cache/"
+
+
+def create_llm_response_cache(
+    directory: str = LLM_RESPONSE_CACHE_DIR, size_limit: int = LLM_RESPONSE_CACHE_MAX_BYTES
+) -> Cache:
+    # least recently used responses are removed when the size limit is reached
+    return Cache(directory, size_limit=size_limit, eviction_policy="least-recently-used")
+
+
+cache = create_llm_response_cache()
+
+
+def get_llm_response_cache_key(**request_parts) -> str:
+    # content-addressed: the key is a hash of everything that influences the response (model, prompts, parameters)
+    serialized = json.dumps(request_parts, sort_keys=True, ensure_ascii=False)
+    return "llm_response_" + hashlib.sha256(serialized.encode()).hexdigest()
+
+
+def get_cached_llm_response(cache_key: str) -> dict | None:
+    try:
+        return cache.get(cache_key)  # type: ignore
+    except Exception as e:
+        logging.error(f"Error while getting LLM response cache: {e}", exc_info=True)
+        cache.delete(cache_key)
+        return None
+
+
+def set_cached_llm_response(cache_key: str, response: dict):
+    try:
+        cache.set(cache_key, response, expire=LLM_RESPONSE_CACHE_TTL_SECONDS)
+    except Exception as e:
+        logging.error(f"Error while setting LLM response cache: {e}", exc_info=True)
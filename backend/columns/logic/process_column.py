@@ -1,8 +1,12 @@
 import json
 import logging
+import threading
+import time
 from concurrent.futures import ThreadPoolExecutor
 from typing import Iterable
 
+from django.db.models import F, Func, JSONField, Value
+from django.db.models.functions import Coalesce
 from django.db.models.manager import BaseManager
 from django.utils import timezone
 
@@ -16,7 +20,10 @@ from data_map_backend.models import (
     DataCollection,
     FieldType,
 )
-from legacy_backend.logic.chat_and_extraction import get_item_question_context
+from legacy_backend.logic.chat_and_extraction import (
+    get_item_question_context,
+    get_question_context_of_items,
+)
 from legacy_backend.logic.search_common import get_document_details_by_id
 
 
@@ -30,6 +37,53 @@ def remove_column_data_from_collection_items(collection_items: Iterable[Collecti
         CollectionItem.objects.bulk_update(items_to_save, ["column_data"])
 
 
+class CellDataWriter(object):
+    """Buffers finished cells of one column and writes them to the database in bulk.
+
+    Only the key of this column is merged into column_data on the database side, so that cells of other columns
+    written concurrently are not overwritten. Cells are flushed after max_cells cells or max_delay seconds.
+    """
+
+    def __init__(self, column_identifier: str, max_cells: int = 50, max_delay: float = 1.0) -> None:
+        self.column_identifier = column_identifier
+        self.max_cells = max_cells
+        self.max_delay = max_delay
+        self._pending: dict[int, dict] = {}  # collection item id -> cell data
+        self._last_flush = time.time()
+        self._lock = threading.Lock()
+
+    def add(self, collection_item: CollectionItem, cell_data: dict):
+        if collection_item.column_data is None:
+            collection_item.column_data = {}
+        collection_item.column_data[self.column_identifier] = cell_data
+        with self._lock:
+            self._pending[collection_item.id] = cell_data
+            if len(self._pending) < self.max_cells and time.time() - self._last_flush < self.max_delay:
+                return
+        self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._last_flush = time.time()
+        if not pending:
+            return
+        # one UPDATE statement for all cells, using "column_data || {column_identifier: cell}" for each row
+        items_to_update = []
+        for item_id, cell_data in pending.items():
+            item = CollectionItem(id=item_id)
+            item.column_data = Func(  # type: ignore
+                Coalesce(F("column_data"), Value({}, output_field=JSONField())),
+                Value({self.column_identifier: cell_data}, output_field=JSONField()),
+                template="(%(expressions)s)",
+                arg_joiner=" || ",
+                output_field=JSONField(),
+            )
+            items_to_update.append(item)
+        CollectionItem.objects.bulk_update(items_to_update, ["column_data"])
+
+
 def get_collection_items_from_cell_range(column: CollectionColumn, cell_range: ColumnCellRange):
     if cell_range.collection_item_id:
         collection_items = CollectionItem.objects.filter(id=cell_range.collection_item_id)
@@ -55,10 +109,11 @@ def process_cells_blocking(
     collection.save(update_fields=["columns_with_running_processes"])
 
     batch_size = 10
+    cell_data_writer = CellDataWriter(column.identifier)
     try:
         for i in range(0, len(collection_items), batch_size):
             batch = collection_items[i : i + batch_size]
-            _process_cell_batch(batch, column, collection, user_id)
+            _process_cell_batch(batch, column, collection, user_id, cell_data_writer)
         logging.warning("Done extracting question from collection class items.")
     except Exception as e:
         logging.error(e)
@@ -66,6 +121,10 @@ def process_cells_blocking(
 
         logging.error(traceback.format_exc())
     finally:
+        try:
+            cell_data_writer.flush()
+        except Exception as e:
+            logging.error(f"Error saving cells of column {column.identifier}: {e}")
         collection.columns_with_running_processes.remove(column.identifier)
         collection.save(update_fields=["columns_with_running_processes"])
 
@@ -75,6 +134,7 @@ def _process_cell_batch(
     column: CollectionColumn,
     collection: DataCollection,
     user_id: int,
+    cell_data_writer: CellDataWriter,
 ):
     if not column.module:
         logging.warning(f"No module specified for column {column.identifier}.")
@@ -102,6 +162,27 @@ def _process_cell_batch(
         return
     input_type = module_definitions[column.module]["input_type"]
 
+    collection_items = list(collection_items)
+    question_contexts = {}
+    if input_type == "natural_language":
+        # getting the contexts of all items at once, to search their relevant full text snippets in one batch:
+        try:
+            question_contexts = get_question_context_of_items(
+                [
+                    (item.dataset_id, item.item_id)
+                    for item in collection_items
+                    if item.field_type == FieldType.IDENTIFIER
+                    and item.dataset_id is not None
+                    and item.item_id is not None
+                    and not (item.column_data or {}).get(column.identifier, {}).get("value")
+                ],
+                column.source_fields,
+                column.expression or "",
+            )
+        except Exception as e:
+            # the contexts are then retrieved for each cell separately, to get the error per cell
+            logging.warning(f"Column Processing: Could not get contexts of batch: {e}")
+
     def process_cell(collection_item: CollectionItem):
         if (collection_item.column_data or {}).get(column.identifier, {}).get("value"):
             # already extracted (only empty fields are extracted again)
@@ -115,9 +196,12 @@ def _process_cell_batch(
             assert collection_item.dataset_id is not None
             assert collection_item.item_id is not None
             if input_type == "natural_language":
-                input_data = get_item_question_context(
-                    collection_item.dataset_id, collection_item.item_id, column.source_fields, column.expression or ""
-                )["context"]
+                question_context = question_contexts.get((collection_item.dataset_id, collection_item.item_id))
+                if question_context is None:
+                    question_context = get_item_question_context(
+                        collection_item.dataset_id, collection_item.item_id, column.source_fields, column.expression or ""
+                    )
+                input_data = question_context["context"]
                 for additional_source_column in source_columns:
                     if not collection_item.column_data:
                         continue
@@ -173,10 +257,7 @@ def _process_cell_batch(
             cell_data.value = "Module not found"
             cell_data.is_computed = True
 
-        if collection_item.column_data is None:
-            collection_item.column_data = {}
-        collection_item.column_data[column.identifier] = cell_data.dict()
-        collection_item.save(update_fields=["column_data"])
+        cell_data_writer.add(collection_item, cell_data.dict())
 
     def process_cell_safe(collection_item: CollectionItem):
         try:
@@ -191,8 +272,7 @@ def _process_cell_batch(
                     value=f"Error processing cell: {e}",
                     changed_at=timezone.now().isoformat(),
                 )
-                collection_item.column_data[column.identifier] = cell_data.dict()
-                collection_item.save(update_fields=["column_data"])
+                cell_data_writer.add(collection_item, cell_data.dict())
             except Exception as e:
                 logging.error(f"Error saving error message for cell {collection_item.id}: {e}")
                 import traceback
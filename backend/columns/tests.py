@@ -0,0 +1,105 @@
+import tempfile
+import unittest
+from unittest import mock
+
+from django.test import TestCase
+
+from columns.logic import llm_response_cache
+from columns.logic.llm_response_cache import (
+    create_llm_response_cache,
+    get_cached_llm_response,
+    get_llm_response_cache_key,
+    set_cached_llm_response,
+)
+from columns.logic.process_column import CellDataWriter
+from data_map_backend.models import CollectionItem, DataCollection, FieldType, User
+
+
+class LlmResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_cache_key_depends_on_all_request_parts(self):
+        key = get_llm_response_cache_key(model="a", input_data="text", language="en")
+        self.assertEqual(key, get_llm_response_cache_key(language="en", input_data="text", model="a"))
+        self.assertNotEqual(key, get_llm_response_cache_key(model="b", input_data="text", language="en"))
+        self.assertNotEqual(key, get_llm_response_cache_key(model="a", input_data="text", language="de"))
+
+    def test_stored_response_is_returned(self):
+        cache = create_llm_response_cache(self.directory.name, size_limit=10 * 1024 * 1024)
+        with mock.patch.object(llm_response_cache, "cache", cache):
+            key = get_llm_response_cache_key(model="a", input_data="text")
+            self.assertIsNone(get_cached_llm_response(key))
+            set_cached_llm_response(key, {"value": "answer", "used_prompt": "prompt"})
+            self.assertEqual(get_cached_llm_response(key), {"value": "answer", "used_prompt": "prompt"})
+        cache.close()
+
+    def test_size_limit_evicts_least_recently_used_responses(self):
+        size_limit = 256 * 1024
+        cache = create_llm_response_cache(self.directory.name, size_limit=size_limit)
+        with mock.patch.object(llm_response_cache, "cache", cache):
+            keys = [get_llm_response_cache_key(model="a", input_data=str(i)) for i in range(100)]
+            for key in keys:
+                set_cached_llm_response(key, {"value": "x" * 20_000, "used_prompt": ""})
+            self.assertLess(len(cache), len(keys))
+            self.assertIsNone(get_cached_llm_response(keys[0]))
+            self.assertIsNotNone(get_cached_llm_response(keys[-1]))
+        cache.close()
+
+
+class CellDataWriterTest(TestCase):
+    def setUp(self):
+        user = User.objects.create(username="test")
+        self.collection = DataCollection.objects.create(name="test", created_by=user)
+        CollectionItem.objects.bulk_create(
+            [
+                CollectionItem(collection=self.collection, field_type=FieldType.TEXT, value=str(i), column_data={})
+                for i in range(60)
+            ]
+        )
+        # cells of other columns that were written before must be kept, too:
+        CollectionItem.objects.filter(collection=self.collection).update(column_data={"other": {"value": "x"}})
+
+    def load_items(self) -> list[CollectionItem]:
+        # each column process works on its own, possibly outdated instances of the items
+        return list(CollectionItem.objects.filter(collection=self.collection).order_by("id"))
+
+    def column_data(self) -> list[dict]:
+        return [item.column_data for item in self.load_items()]
+
+    def test_columns_written_concurrently_are_merged(self):
+        writer_a = CellDataWriter("a")
+        writer_b = CellDataWriter("b")
+        for item_a, item_b in zip(self.load_items(), self.load_items()):
+            writer_a.add(item_a, {"value": f"a{item_a.id}"})
+            writer_b.add(item_b, {"value": f"b{item_b.id}"})
+
+        # the first 50 cells of each column were flushed automatically:
+        column_data = self.column_data()
+        self.assertEqual([sorted(data) for data in column_data], [["a", "b", "other"]] * 50 + [["other"]] * 10)
+
+        writer_a.flush()
+        writer_b.flush()
+        for item in self.load_items():
+            self.assertEqual(
+                item.column_data,
+                {"other": {"value": "x"}, "a": {"value": f"a{item.id}"}, "b": {"value": f"b{item.id}"}},
+            )
+
+    def test_cells_are_flushed_after_max_delay(self):
+        writer = CellDataWriter("a", max_cells=50, max_delay=1.0)
+        items = self.load_items()
+        writer.add(items[0], {"value": "first"})
+        self.assertNotIn("a", self.column_data()[0])
+        with mock.patch("columns.logic.process_column.time.time", return_value=writer._last_flush + 1.5):
+            writer.add(items[1], {"value": "second"})
+        column_data = self.column_data()
+        self.assertEqual(column_data[0]["a"], {"value": "first"})
+        self.assertEqual(column_data[1]["a"], {"value": "second"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -544,8 +544,8 @@ class DatasetAdmin(DjangoQLSearchMixin, DjangoObjectActions, SimpleHistoryAdmin)
 
     @action(label="Update Database Layout", description="Update Database Layout")
     def update_database_layout(self, request, obj):
-        update_database_layout(obj.id)
-        self.message_user(request, "Updated the database layout")
+        update_database_layout(obj.id, blocking=False)
+        self.message_user(request, "Now updating the database layout in the background...")
 
     @action(label="Delete Content", description="Delete all items from the database")
     def delete_content(self, request, obj):
@@ -603,7 +603,15 @@ class GenerationTaskAdmin(DjangoObjectActions, admin.ModelAdmin):
     list_display_links = ("id",)
     search_fields = ("id", "dataset", "field")
     ordering = ["dataset", "field", "created_at"]
-    readonly_fields = ("changed_at", "created_at", "action_buttons", "status", "progress", "log")
+    readonly_fields = (
+        "changed_at",
+        "created_at",
+        "action_buttons",
+        "status",
+        "progress",
+        "slice_checkpoints",
+        "log",
+    )
 
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         # only show fields of same dataset for source fields:
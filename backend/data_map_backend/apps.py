@@ -9,6 +9,9 @@ class DataMapBackendConfig(AppConfig):
     verbose_name = "Data Map Backend"
 
     def ready(self) -> None:
+        # connects the signals that invalidate cached datasets when they are changed:
+        import data_map_backend.dataset_cache  # noqa: F401
+
         # only initialize the monitoring when the server is started, not in tests or migrations:
         if os.environ.get("RUN_MAIN") or os.environ.get("WERKZEUG_RUN_MAIN"):
             from data_map_backend.monitoring import register_collectors
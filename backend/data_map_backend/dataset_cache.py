@@ -0,0 +1,150 @@
+import logging
+import os
+import threading
+import time
+from typing import Any
+
+import cachetools
+from diskcache import Cache
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from data_map_backend.models import (
+    Dataset,
+    DatasetField,
+    DatasetSchema,
+    EmbeddingSpace,
+    ExportConverter,
+    Generator,
+    ImportConverter,
+)
+
+# Cached datasets are stored together with a version stamp, the stamp is changed whenever the dataset or any model
+# that is part of its serialization is saved. The stamps are stored in a cache on disk to share them between
+# the worker processes, each process only checks them again after this time (changes in the same process
+# are visible immediately):
+DATASET_CACHE_VERSION_CHECK_SECONDS = float(os.getenv("DATASET_CACHE_VERSION_CHECK_SECONDS", 1.0))
+DATASET_CACHE_TTL_SECONDS = 60 * 60 * 24
+
+# the serialized datasets are stored here as well, so that not every process needs to serialize them:
+shared_dataset_cache = Cache(
+    "/data/quiddity_data/dataset_cache/",
+    size_limit=512 * 1024 * 1024,
+    eviction_policy="least-recently-used",
+)
+
+# changes to generators, embedding spaces and converters affect many datasets, they change this stamp instead:
+ALL_DATASETS = "all"
+
+_local_versions: dict[int | str, tuple[int, float]] = {}  # dataset id -> (version, time of last check)
+_local_versions_lock = threading.Lock()
+
+
+def _get_shared_version(key: int | str) -> int:
+    cache_key = f"dataset_version_{key}"
+    try:
+        version = shared_dataset_cache.get(cache_key)
+        if version is None:
+            # not using a counter starting at zero: if the stamp was evicted, older entries must not match again
+            shared_dataset_cache.add(cache_key, time.time_ns())
+            version = shared_dataset_cache.get(cache_key)
+        return version  # type: ignore
+    except Exception as e:
+        logging.error(f"Error while reading dataset cache version: {e}", exc_info=True)
+        return time.time_ns()  # effectively disables the cache until the shared cache works again
+
+
+def _get_version(key: int | str) -> int:
+    now = time.monotonic()
+    with _local_versions_lock:
+        local_version = _local_versions.get(key)
+    if local_version is not None and now - local_version[1] < DATASET_CACHE_VERSION_CHECK_SECONDS:
+        return local_version[0]
+    version = _get_shared_version(key)
+    with _local_versions_lock:
+        _local_versions[key] = (version, now)
+    return version
+
+
+def get_dataset_version(dataset_id: int) -> tuple[int, int]:
+    """Returns the current version stamp of the dataset, to be used as part of cache keys."""
+    return _get_version(ALL_DATASETS), _get_version(dataset_id)
+
+
+def get_all_datasets_version() -> tuple[int]:
+    """Returns the version stamp that changes with generators, embedding spaces and converters."""
+    return (_get_version(ALL_DATASETS),)
+
+
+def invalidate_dataset_cache(dataset_id: int | str):
+    """Changes the version stamp of a dataset (or of all datasets if dataset_id is ALL_DATASETS)."""
+    cache_key = f"dataset_version_{dataset_id}"
+    version = time.time_ns()
+    try:
+        shared_dataset_cache.set(cache_key, version)
+    except Exception as e:
+        logging.error(f"Error while invalidating dataset cache: {e}", exc_info=True)
+    with _local_versions_lock:
+        _local_versions[dataset_id] = (version, time.monotonic())
+
+
+class LocalVersionedCache(object):
+    """Per-process cache for values that are only valid for a certain version of a dataset."""
+
+    def __init__(self, maxsize: int = 128):
+        self._cache: cachetools.LRUCache = cachetools.LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def get(self, key, version: tuple) -> Any | None:
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is None or cached[0] != version:
+            return None
+        return cached[1]
+
+    def set(self, key, version: tuple, value: Any):
+        with self._lock:
+            self._cache[key] = (version, value)
+
+
+def _invalidate_on_commit(dataset_ids: list[int | str]):
+    # invalidating after the commit, otherwise other processes could cache the old state again in the meantime
+    def invalidate():
+        for dataset_id in dataset_ids:
+            invalidate_dataset_cache(dataset_id)
+
+    transaction.on_commit(invalidate)
+
+
+def _get_affected_dataset_ids(instance) -> list[int | str]:
+    if isinstance(instance, Dataset):
+        return [instance.id]
+    if isinstance(instance, DatasetSchema):
+        return list(Dataset.objects.filter(schema_id=instance.id).values_list("id", flat=True))
+    if isinstance(instance, DatasetField):
+        return list(Dataset.objects.filter(schema_id=instance.schema_id).values_list("id", flat=True))  # type: ignore
+    if isinstance(instance, (Generator, EmbeddingSpace, ImportConverter, ExportConverter)):
+        return [ALL_DATASETS]
+    return []
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def invalidate_dataset_cache_on_change(sender, instance, **kwargs):
+    if kwargs.get("raw"):
+        # loading fixtures
+        return
+    dataset_ids = _get_affected_dataset_ids(instance)
+    if dataset_ids:
+        _invalidate_on_commit(dataset_ids)
+
+
+@receiver(m2m_changed)
+def invalidate_dataset_cache_on_m2m_change(sender, instance, action, **kwargs):
+    # e.g. admins of a dataset or applicable converters of a schema
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    dataset_ids = _get_affected_dataset_ids(instance)
+    if dataset_ids:
+        _invalidate_on_commit(dataset_ids)
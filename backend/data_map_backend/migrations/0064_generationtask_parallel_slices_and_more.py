@@ -0,0 +1,23 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('data_map_backend', '0063_merge_20250409_2027'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='generationtask',
+            name='parallel_slices',
+            field=models.IntegerField(default=1, help_text='Number of parts of the dataset that are scanned and generated in parallel', verbose_name='Parallel Slices'),
+        ),
+        migrations.AddField(
+            model_name='generationtask',
+            name='slice_checkpoints',
+            field=models.JSONField(blank=True, default=dict, help_text='Progress per slice, used to resume a stopped or failed task (empty when the last run finished)', verbose_name='Slice Checkpoints'),
+        ),
+    ]
@@ -999,6 +999,20 @@ class GenerationTask(models.Model, ModelTypedImplicitIdField):
         null=False,
     )
     batch_size = models.IntegerField(verbose_name="Batch Size", default=512, blank=False, null=False)
+    parallel_slices = models.IntegerField(
+        verbose_name="Parallel Slices",
+        help_text="Number of parts of the dataset that are scanned and generated in parallel",
+        default=1,
+        blank=False,
+        null=False,
+    )
+    slice_checkpoints = models.JSONField(
+        verbose_name="Slice Checkpoints",
+        help_text="Progress per slice, used to resume a stopped or failed task (empty when the last run finished)",
+        default=dict,
+        blank=True,
+        null=False,
+    )
     stop_flag = models.BooleanField(verbose_name="Stop Flag", default=False, blank=False, null=False)
 
     class TaskStatus(models.TextChoices):
@@ -1,14 +1,23 @@
 import logging
 
-from prometheus_client.core import REGISTRY, GaugeMetricFamily, StateSetMetricFamily
+from prometheus_client.core import (
+    REGISTRY,
+    CounterMetricFamily,
+    GaugeMetricFamily,
+    StateSetMetricFamily,
+)
 from prometheus_client.registry import Collector
 
+from columns.logic.llm_request_stats import llm_request_stats
 from legacy_backend.database_client.text_search_engine_client import (
     TextSearchEngineClient,
+    connection_pool_stats,
 )
 from legacy_backend.database_client.vector_search_engine_client import (
     VectorSearchEngineClient,
+    sub_item_upsert_stats,
 )
+from legacy_backend.logic.query_embedding_cache import query_embedding_cache
 
 
 def get_db_health():
@@ -89,7 +98,138 @@ class UsageStatisticsCollector(Collector):
         yield collection_item_count
 
 
+class QueryEmbeddingCacheCollector(Collector):
+    def describe(self):
+        yield CounterMetricFamily("query_embedding_cache_hits", "Number of query embeddings served from the cache")
+        yield CounterMetricFamily(
+            "query_embedding_cache_misses", "Number of query embeddings that had to be generated"
+        )
+        yield GaugeMetricFamily("query_embedding_cache_entries", "Number of query embeddings in the cache")
+        yield GaugeMetricFamily("query_embedding_cache_size_bytes", "Memory used by the query embedding cache")
+
+    def collect(self):
+        stats = query_embedding_cache.get_stats()
+        hits = CounterMetricFamily("query_embedding_cache_hits", "Number of query embeddings served from the cache")
+        hits.add_metric([], stats["hits"])
+        yield hits
+        misses = CounterMetricFamily(
+            "query_embedding_cache_misses", "Number of query embeddings that had to be generated"
+        )
+        misses.add_metric([], stats["misses"])
+        yield misses
+        entries = GaugeMetricFamily("query_embedding_cache_entries", "Number of query embeddings in the cache")
+        entries.add_metric([], stats["entries"])
+        yield entries
+        size_bytes = GaugeMetricFamily("query_embedding_cache_size_bytes", "Memory used by the query embedding cache")
+        size_bytes.add_metric([], stats["size_bytes"])
+        yield size_bytes
+
+
+class OpenSearchConnectionPoolCollector(Collector):
+    def describe(self):
+        yield CounterMetricFamily(
+            "opensearch_pool_acquisitions", "Number of connections taken from the OpenSearch connection pool"
+        )
+        yield CounterMetricFamily(
+            "opensearch_pool_slow_acquisitions", "Number of times a request waited more than 10ms for a connection"
+        )
+        yield CounterMetricFamily(
+            "opensearch_pool_wait_seconds", "Total time requests waited for an OpenSearch connection"
+        )
+        yield CounterMetricFamily(
+            "opensearch_pool_overflow_connections", "Number of connections opened because the pool was empty"
+        )
+        yield CounterMetricFamily(
+            "opensearch_pool_discarded_connections", "Number of connections closed because the pool was full"
+        )
+        yield GaugeMetricFamily("opensearch_pool_maxsize", "Maximum number of connections per OpenSearch node")
+
+    def collect(self):
+        stats = connection_pool_stats.get_stats()
+        acquisitions = CounterMetricFamily(
+            "opensearch_pool_acquisitions", "Number of connections taken from the OpenSearch connection pool"
+        )
+        acquisitions.add_metric([], stats["acquisitions"])
+        yield acquisitions
+        slow_acquisitions = CounterMetricFamily(
+            "opensearch_pool_slow_acquisitions", "Number of times a request waited more than 10ms for a connection"
+        )
+        slow_acquisitions.add_metric([], stats["slow_acquisitions"])
+        yield slow_acquisitions
+        wait_seconds = CounterMetricFamily(
+            "opensearch_pool_wait_seconds", "Total time requests waited for an OpenSearch connection"
+        )
+        wait_seconds.add_metric([], stats["wait_seconds"])
+        yield wait_seconds
+        overflow_connections = CounterMetricFamily(
+            "opensearch_pool_overflow_connections", "Number of connections opened because the pool was empty"
+        )
+        overflow_connections.add_metric([], stats["overflow_connections"])
+        yield overflow_connections
+        discarded_connections = CounterMetricFamily(
+            "opensearch_pool_discarded_connections", "Number of connections closed because the pool was full"
+        )
+        discarded_connections.add_metric([], stats["discarded_connections"])
+        yield discarded_connections
+        pool_maxsize = GaugeMetricFamily(
+            "opensearch_pool_maxsize", "Maximum number of connections per OpenSearch node"
+        )
+        pool_maxsize.add_metric([], stats["pool_maxsize"])
+        yield pool_maxsize
+
+
+class SubItemUpsertCollector(Collector):
+    def describe(self):
+        yield CounterMetricFamily("vector_db_sub_items_received", "Number of sub items of array fields upserted")
+        yield CounterMetricFamily(
+            "vector_db_sub_items_changed", "Number of upserted sub items that were new or changed and got written"
+        )
+        yield CounterMetricFamily(
+            "vector_db_sub_items_stale_deleted", "Number of sub items deleted because their array got shorter"
+        )
+
+    def collect(self):
+        stats = sub_item_upsert_stats.get_stats()
+        received = CounterMetricFamily("vector_db_sub_items_received", "Number of sub items of array fields upserted")
+        received.add_metric([], stats["received"])
+        yield received
+        changed = CounterMetricFamily(
+            "vector_db_sub_items_changed", "Number of upserted sub items that were new or changed and got written"
+        )
+        changed.add_metric([], stats["changed"])
+        yield changed
+        stale_deleted = CounterMetricFamily(
+            "vector_db_sub_items_stale_deleted", "Number of sub items deleted because their array got shorter"
+        )
+        stale_deleted.add_metric([], stats["stale_deleted"])
+        yield stale_deleted
+
+
+class LlmRequestCollector(Collector):
+    def describe(self):
+        yield CounterMetricFamily("llm_requests", "Number of LLM requests", labels=["cause"])
+        yield CounterMetricFamily("llm_tokens", "Number of tokens used by LLM requests", labels=["cause"])
+        yield CounterMetricFamily("llm_request_seconds", "Total duration of LLM requests", labels=["cause"])
+
+    def collect(self):
+        stats = llm_request_stats.get_stats()
+        requests = CounterMetricFamily("llm_requests", "Number of LLM requests", labels=["cause"])
+        tokens = CounterMetricFamily("llm_tokens", "Number of tokens used by LLM requests", labels=["cause"])
+        seconds = CounterMetricFamily("llm_request_seconds", "Total duration of LLM requests", labels=["cause"])
+        for cause, cause_stats in stats.items():
+            requests.add_metric([cause], cause_stats["requests"])
+            tokens.add_metric([cause], cause_stats["tokens"])
+            seconds.add_metric([cause], cause_stats["seconds"])
+        yield requests
+        yield tokens
+        yield seconds
+
+
 def register_collectors():
     REGISTRY.register(DataBackendStatusCollector())
     REGISTRY.register(UserCountCollector())
     REGISTRY.register(UsageStatisticsCollector())
+    REGISTRY.register(QueryEmbeddingCacheCollector())
+    REGISTRY.register(OpenSearchConnectionPoolCollector())
+    REGISTRY.register(SubItemUpsertCollector())
+    REGISTRY.register(LlmRequestCollector())
@@ -1,3 +1,93 @@
-from django.test import TestCase
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from diskcache import Cache
+from django.test import SimpleTestCase
+
+from data_map_backend import dataset_cache
+from data_map_backend.dataset_cache import (
+    ALL_DATASETS,
+    LocalVersionedCache,
+    get_all_datasets_version,
+    get_dataset_version,
+    invalidate_dataset_cache,
+    invalidate_dataset_cache_on_change,
+)
+from data_map_backend.models import Dataset, Generator
+
+
+class DatasetCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.shared_cache = Cache(self.cache_dir.name)
+        patches = [
+            mock.patch.object(dataset_cache, "shared_dataset_cache", self.shared_cache),
+            mock.patch.object(dataset_cache, "_local_versions", {}),
+            # no database transactions here, running the callbacks immediately:
+            mock.patch.object(dataset_cache.transaction, "on_commit", side_effect=lambda callback: callback()),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        self.shared_cache.close()
+        self.cache_dir.cleanup()
+
+    def simulate_other_process(self):
+        # the other process has its own local versions, but shares the cache on disk
+        dataset_cache._local_versions.clear()
+
+    def test_version_changes_on_invalidation(self):
+        version = get_dataset_version(1)
+        self.assertEqual(get_dataset_version(1), version)
+        invalidate_dataset_cache(1)
+        self.assertNotEqual(get_dataset_version(1), version)
+
+    def test_invalidation_only_affects_one_dataset(self):
+        other_version = get_dataset_version(2)
+        invalidate_dataset_cache(1)
+        self.assertEqual(get_dataset_version(2), other_version)
+
+    def test_invalidating_all_datasets(self):
+        versions = get_dataset_version(1), get_dataset_version(2), get_all_datasets_version()
+        invalidate_dataset_cache(ALL_DATASETS)
+        new_versions = get_dataset_version(1), get_dataset_version(2), get_all_datasets_version()
+        for version, new_version in zip(versions, new_versions):
+            self.assertNotEqual(version, new_version)
+
+    def test_invalidation_is_visible_in_other_processes(self):
+        version = get_dataset_version(1)
+        self.simulate_other_process()
+        self.assertEqual(get_dataset_version(1), version)
+        invalidate_dataset_cache(1)
+        new_version = get_dataset_version(1)
+        self.simulate_other_process()
+        self.assertEqual(get_dataset_version(1), new_version)
+
+    def test_local_cache_misses_after_invalidation(self):
+        cache = LocalVersionedCache()
+        cache.set(1, get_dataset_version(1), "dataset")
+        self.assertEqual(cache.get(1, get_dataset_version(1)), "dataset")
+        invalidate_dataset_cache(1)
+        self.assertIsNone(cache.get(1, get_dataset_version(1)))
+
+    def test_saving_models_invalidates_affected_datasets(self):
+        dataset_version = get_dataset_version(1)
+        other_dataset_version = get_dataset_version(2)
+        invalidate_dataset_cache_on_change(sender=Dataset, instance=Dataset(id=1))
+        self.assertNotEqual(get_dataset_version(1), dataset_version)
+        self.assertEqual(get_dataset_version(2), other_dataset_version)
+
+    def test_saving_generators_invalidates_all_datasets(self):
+        all_datasets_version = get_all_datasets_version()
+        dataset_version = get_dataset_version(1)
+        # generators use their identifier as primary key:
+        invalidate_dataset_cache_on_change(sender=Generator, instance=Generator(identifier="gen"))
+        self.assertNotEqual(get_all_datasets_version(), all_datasets_version)
+        self.assertNotEqual(get_dataset_version(1), dataset_version)
+
+    def test_loading_fixtures_does_not_invalidate(self):
+        version = get_dataset_version(1)
+        invalidate_dataset_cache_on_change(sender=Dataset, instance=Dataset(id=1), raw=True)
+        self.assertEqual(get_dataset_version(1), version)
@@ -26,6 +26,7 @@ def data_backend_proxy_view(request, sub_path: str):
         "/data_backend/remove_items": _check_if_from_backend,
         "/data_backend/dataset": _check_if_from_backend,
         "/data_backend/update_database_layout": _check_if_from_backend,
+        "/data_backend/update_database_layout/status": _check_if_from_backend,
         "/data_backend/insert_many_sync": lambda x: True,  # TODO
     }
     checks_for_routes_always_needing_authentication = {
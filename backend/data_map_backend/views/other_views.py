@@ -2,7 +2,7 @@ import json
 import logging
 import operator
 import os
-from functools import lru_cache, reduce
+from functools import reduce
 
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.db.models import Q
@@ -12,6 +12,12 @@ from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import TemplateView
 
+from data_map_backend.dataset_cache import (
+    DATASET_CACHE_TTL_SECONDS,
+    LocalVersionedCache,
+    get_dataset_version,
+    shared_dataset_cache,
+)
 from data_map_backend.models import (
     CollectionItem,
     DataCollection,
@@ -188,9 +194,17 @@ def get_dataset(request):
     return HttpResponse(result, status=200, content_type="application/json")
 
 
-@lru_cache(maxsize=128)
+# invalidated by changes to the dataset, see dataset_cache.py:
+_dataset_cache = LocalVersionedCache()
+_serialized_dataset_cache = LocalVersionedCache()
+
+
 def get_dataset_cached(dataset_id: int) -> Dataset:
-    return (
+    version = get_dataset_version(dataset_id)
+    dataset = _dataset_cache.get(dataset_id, version)
+    if dataset is not None:
+        return dataset
+    dataset = (
         Dataset.objects.select_related(
             "schema",
         )
@@ -204,12 +218,42 @@ def get_dataset_cached(dataset_id: int) -> Dataset:
         )
         .get(id=dataset_id)
     )
+    _dataset_cache.set(dataset_id, version, dataset)
+    return dataset
 
 
-@lru_cache(maxsize=128)
 def get_serialized_dataset_cached(dataset_id: int, additional_fields: tuple = tuple()) -> DotDict:
-    dataset: Dataset = get_dataset_cached(dataset_id)
+    # the item count changes without the dataset being saved, so it is not cached:
+    dataset_dict = _get_serialized_dataset_without_item_count(dataset_id)
+    if "item_count" in additional_fields:
+        dataset_dict = DotDict(dataset_dict)
+        dataset_dict["item_count"] = get_dataset_cached(dataset_id).item_count
+    return dataset_dict
+
 
+def _get_serialized_dataset_without_item_count(dataset_id: int) -> DotDict:
+    version = get_dataset_version(dataset_id)
+    cached_dataset_dict = _serialized_dataset_cache.get(dataset_id, version)
+    if cached_dataset_dict is not None:
+        return cached_dataset_dict
+    shared_cache_key = f"serialized_dataset_{dataset_id}_{version[0]}_{version[1]}"
+    try:
+        dataset_dict = shared_dataset_cache.get(shared_cache_key)
+    except Exception as e:
+        logging.error(f"Error while getting serialized dataset from cache: {e}", exc_info=True)
+        dataset_dict = None
+    if dataset_dict is None:
+        dataset_dict = _serialize_dataset(get_dataset_cached(dataset_id))
+        try:
+            shared_dataset_cache.set(shared_cache_key, dataset_dict, expire=DATASET_CACHE_TTL_SECONDS)
+        except Exception as e:
+            logging.error(f"Error while storing serialized dataset in cache: {e}", exc_info=True)
+    dataset_dict = DotDict(dataset_dict)
+    _serialized_dataset_cache.set(dataset_id, version, dataset_dict)
+    return dataset_dict
+
+
+def _serialize_dataset(dataset: Dataset) -> dict:
     dataset_dict = DatasetSerializer(instance=dataset).data
     assert isinstance(dataset_dict, dict)
     dataset_dict["schema"]["object_fields"] = {
@@ -220,9 +264,8 @@ def get_serialized_dataset_cached(dataset_id: int, additional_fields: tuple = tu
     universal_exporters = ExportConverter.objects.filter(universally_applicable=True)
     serialized_exporters = ExportConverterSerializer(universal_exporters, many=True).data
     dataset_dict["schema"]["applicable_export_converters"].extend(serialized_exporters)
-    if "item_count" in additional_fields:
-        dataset_dict["item_count"] = dataset.item_count
-    return DotDict(dataset_dict)
+    # plain JSON types, the same as received by other services via the API:
+    return json.loads(json.dumps(dataset_dict))
 
 
 @csrf_exempt
@@ -25,6 +25,7 @@ from legacy_backend.logic.export_converters import (
     export_item,
 )
 from legacy_backend.logic.insert_logic import (
+    get_database_layout_update_status,
     insert_many,
     insert_vectors,
     update_database_layout,
@@ -130,13 +131,27 @@ def update_database_layout_route(
     # TODO: check auth
     params = DotDict(request.json)  # type: ignore
     try:
-        update_database_layout(params.dataset_id)
+        # with 'background', the progress can be checked using the status endpoint
+        update_database_layout(params.dataset_id, blocking=not params.background)
     except Exception as e:
         logging.warning("Error updating database layout", exc_info=True)
         return repr(e), 500
     return "", 204
 
 
+@convert_flask_to_django_route("/data_backend/update_database_layout/status", methods=["POST"])
+def update_database_layout_status_endpoint(
+    request,
+):
+    try:
+        params = request.json or {}
+        dataset_id: int = params["dataset_id"]
+    except KeyError as e:
+        return f"parameter missing: {e}", 400
+    status = get_database_layout_update_status(dataset_id)
+    return jsonify(status)
+
+
 @convert_flask_to_django_route("/data_backend/insert_many_sync", methods=["POST"])
 def insert_many_sync_route(
     request,
@@ -159,7 +174,12 @@ def insert_vectors_sync_route(
     params = DotDict(cbor2.loads(request.data))  # type: ignore
     try:
         insert_vectors(
-            params.dataset_id, params.vector_field, params.item_pks, params.vectors, params.excluded_filter_fields
+            params.dataset_id,
+            params.vector_field,
+            params.item_pks,
+            params.vectors,
+            params.excluded_filter_fields,
+            params.payloads,  # optional, fetched from the text search engine if not provided
         )
     except Exception as e:
         logging.warning("Error inserting many items", exc_info=True)
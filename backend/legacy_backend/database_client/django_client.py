@@ -2,10 +2,10 @@ import logging
 import os
 from typing import Iterable
 
-import cachetools.func
 import requests
 
 from data_map_backend.utils import DotDict
+from data_map_backend.views.other_views import get_serialized_dataset_cached
 
 backend_url = os.getenv("backend_host", "http://localhost:55125")
 
@@ -16,14 +16,10 @@ django_client = requests.Session()
 django_client.headers.update({"Authorization": BACKEND_AUTHENTICATION_SECRET})
 
 
-@cachetools.func.ttl_cache(maxsize=128, ttl=10)  # seconds
 def get_dataset(dataset_id: int) -> DotDict:
-    url = backend_url + "/org/data_map/dataset"
-    data = {
-        "dataset_id": dataset_id,
-    }
-    result = django_client.post(url, json=data)
-    return DotDict(result.json())
+    # running in the same process as the Django backend, the dataset cache is invalidated when it is changed,
+    # so there is no need for a time-based cache and a request here
+    return get_serialized_dataset_cached(dataset_id)
 
 
 def get_collection(collection_id: int) -> DotDict | None:
@@ -1,24 +1,164 @@
-import json
+import hashlib
 import logging
 import os
+import queue
 import re
+import threading
+import time
 from collections import defaultdict
-from typing import Generator, Iterable, Optional
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Generator, Iterable, Optional
 
+import numpy as np
 import opensearchpy.helpers
-from opensearchpy import OpenSearch, RequestError
+import orjson
+from opensearchpy import OpenSearch, RequestError, Urllib3HttpConnection
 
 from data_map_backend.models import Dataset
 from data_map_backend.utils import DotDict
 from legacy_backend.database_client.remote_instance_client import use_remote_db
-from legacy_backend.utils.custom_json_encoder import CustomJSONEncoder
 from legacy_backend.utils.field_types import FieldType
-from legacy_backend.utils.helpers import run_in_batches_without_result
 from legacy_backend.utils.source_plugin_types import SourcePlugin
 
 open_search_host = os.getenv("search_engine_host", "localhost")
 open_search_port = 9200
 open_search_auth = (os.getenv("OPENSEARCH_USERNAME"), os.getenv("OPENSEARCH_PASSWORD"))
+# gzip compression for request bodies, saves network traffic for bulk requests and large mgets, but costs CPU:
+open_search_http_compress = os.getenv("OPENSEARCH_HTTP_COMPRESS", "False") == "True"
+# default is 10, but we have a lot of parallel requests (to get rid of "Connection pool is full" errors)
+open_search_pool_maxsize = int(os.getenv("OPENSEARCH_POOL_MAXSIZE", 25))
+# if True, requests wait for a free connection when the pool is exhausted instead of opening (and discarding)
+# additional connections, the wait time is exported as a metric (without blocking, it stays about zero and an
+# exhausted pool shows up as overflow and discarded connections instead):
+open_search_pool_block = os.getenv("OPENSEARCH_POOL_BLOCK", "False") == "True"
+# only search queries slower than this are logged (with a hash of the query body to find repeated queries):
+SLOW_QUERY_LOG_THRESHOLD_SECONDS = float(os.getenv("OPENSEARCH_SLOW_QUERY_LOG_THRESHOLD_SECONDS", 1.0))
+# maximum length of the query body in the log, 0 to only log the hash:
+QUERY_LOG_MAX_CHARACTERS = int(os.getenv("OPENSEARCH_QUERY_LOG_MAX_CHARACTERS", 1000))
+# waiting longer than this for a connection counts as a slow acquisition in the metrics:
+SLOW_POOL_ACQUISITION_SECONDS = 0.01
+
+# bulk requests are limited by their size in bytes (items can be very different in size, e.g. with full texts):
+BULK_MAX_BYTES = int(os.getenv("OPENSEARCH_BULK_MAX_BYTES", 10 * 1024 * 1024))
+BULK_MAX_ITEMS = int(os.getenv("OPENSEARCH_BULK_MAX_ITEMS", 5000))
+# number of bulk requests that are sent in parallel, further batches are only serialized when one of them is done:
+BULK_MAX_IN_FLIGHT = int(os.getenv("OPENSEARCH_BULK_MAX_IN_FLIGHT", 4))
+
+
+class ConnectionPoolStats(object):
+    """Counts how often and how long requests waited for a connection of the OpenSearch connection pool.
+
+    Overflow connections are opened because the pool was empty (only without OPENSEARCH_POOL_BLOCK), discarded
+    connections are closed because the pool was already full when they were returned."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.acquisitions = 0
+        self.slow_acquisitions = 0
+        self.wait_seconds = 0.0
+        self.overflow_connections = 0
+        self.discarded_connections = 0
+
+    def record(self, wait_seconds: float) -> None:
+        with self._lock:
+            self.acquisitions += 1
+            self.wait_seconds += wait_seconds
+            if wait_seconds > SLOW_POOL_ACQUISITION_SECONDS:
+                self.slow_acquisitions += 1
+
+    def record_overflow(self) -> None:
+        with self._lock:
+            self.overflow_connections += 1
+
+    def record_discarded(self) -> None:
+        with self._lock:
+            self.discarded_connections += 1
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "acquisitions": self.acquisitions,
+                "slow_acquisitions": self.slow_acquisitions,
+                "wait_seconds": self.wait_seconds,
+                "overflow_connections": self.overflow_connections,
+                "discarded_connections": self.discarded_connections,
+                "pool_maxsize": open_search_pool_maxsize,
+            }
+
+
+connection_pool_stats = ConnectionPoolStats()
+
+
+class InstrumentedUrllib3HttpConnection(Urllib3HttpConnection):
+    # measures the time spent waiting for a connection from the urllib3 pool and counts connections opened beyond
+    # and discarded because of its maxsize
+
+    def _create_urllib3_pool(self) -> None:
+        super()._create_urllib3_pool()
+        pool = self.pool
+        assert pool is not None
+        pool.block = open_search_pool_block
+        get_conn = pool._get_conn
+
+        def timed_get_conn(timeout=None):
+            t1 = time.monotonic()
+            try:
+                return get_conn(timeout=timeout)
+            finally:
+                connection_pool_stats.record(time.monotonic() - t1)
+
+        pool._get_conn = timed_get_conn  # type: ignore
+
+        # the queue of the pool raises Empty / Full exactly when urllib3 opens an additional connection / discards one:
+        connection_queue = pool.pool
+        assert connection_queue is not None
+        queue_get = connection_queue.get
+        queue_put = connection_queue.put
+
+        def counted_get(block=True, timeout=None):
+            try:
+                return queue_get(block=block, timeout=timeout)
+            except queue.Empty:
+                if not block:
+                    # in blocking mode, this is a timeout instead
+                    connection_pool_stats.record_overflow()
+                raise
+
+        def counted_put(item, block=True, timeout=None):
+            try:
+                return queue_put(item, block=block, timeout=timeout)
+            except queue.Full:
+                connection_pool_stats.record_discarded()
+                raise
+
+        connection_queue.get = counted_get  # type: ignore
+        connection_queue.put = counted_put  # type: ignore
+
+
+class BulkUpsertError(ValueError):
+    """Raised when items of one or more bulk requests couldn't be upserted.
+
+    failed_batches contains one entry per failed batch with its number, the ids of its items and the errors.
+    unsent_ids contains the ids of the items that weren't sent at all because an earlier batch failed.
+    """
+
+    def __init__(self, failed_batches: list[dict], unsent_ids: list[str] | None = None):
+        self.failed_batches = failed_batches
+        self.unsent_ids = unsent_ids or []
+        super().__init__(failed_batches, f"{len(self.unsent_ids)} items not sent")
+
+
+def _orjson_default(obj):
+    # same conversions as CustomJSONEncoder for types orjson doesn't handle itself
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    elif isinstance(obj, Callable):
+        return "<function>"
+    raise TypeError
+
+
+def _serialize_bulk_line(data: dict) -> bytes:
+    return orjson.dumps(data, default=_orjson_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
 
 
 class TextSearchEngineClient(object):
@@ -28,14 +168,15 @@ class TextSearchEngineClient(object):
     def __init__(self):
         self.client = OpenSearch(
             hosts=[{"host": open_search_host, "port": open_search_port}],
-            http_compress=False,  # gzip compression for request bodies
+            http_compress=open_search_http_compress,
             http_auth=open_search_auth,
             use_ssl=True,
             verify_certs=False,
             ssl_assert_hostname=False,
             ssl_show_warn=False,
             timeout=90,  # seconds, especially on AWS EBS volumes, requests can take very long
-            pool_maxsize=25,  # default is 10, but we have a lot of parallel requests (to get rid of "Connection pool is full" errors)
+            pool_maxsize=open_search_pool_maxsize,
+            connection_class=InstrumentedUrllib3HttpConnection,
         )
 
     @staticmethod
@@ -244,35 +385,80 @@ class TextSearchEngineClient(object):
         return response.get("hits", {}).get("hits", [])
 
     def upsert_items(self, index_name: str, ids: Iterable[str], payloads: Iterable[dict]):
-        def upsert_batch(ids_and_payloads):
-            bulk_operations = ""
-            for _id, item in ids_and_payloads:
-                op = {"update": {"_index": index_name, "_id": _id}}
-                item = item.copy()
-                item.pop("_id")
-                bulk_operations += (
-                    json.dumps(op)
-                    + "\n"
-                    + json.dumps({"doc": item, "doc_as_upsert": True}, cls=CustomJSONEncoder)
-                    + "\n"
-                )
-
-            response = self.client.bulk(body=bulk_operations)
-            if response.get("errors"):
-                error_items = []
-                if response.get("items"):
-                    for item in response["items"]:
-                        if item.get("update"):
-                            if item["update"].get("error"):
-                                error_items.append(item)
-                if error_items:
-                    logging.error(repr(error_items))
-                    raise ValueError(error_items)
-                else:
-                    logging.error(f"Error during upserting items: {response}")
-                    raise ValueError(response)
+        ids = list(ids)
+
+        def upsert_batch(batch_number: int, batch_ids: list[str], bulk_body: bytes) -> dict | None:
+            # returns a description of the failure or None if all items were upserted
+            try:
+                response = self.client.bulk(body=bulk_body)
+            except Exception as e:
+                return {"batch": batch_number, "ids": batch_ids, "errors": [repr(e)]}
+            if not response.get("errors"):
+                return None
+            error_items = [item for item in response.get("items") or [] if (item.get("update") or {}).get("error")]
+            if error_items:
+                return {
+                    "batch": batch_number,
+                    "ids": [item["update"].get("_id") for item in error_items],
+                    "errors": error_items,
+                }
+            return {"batch": batch_number, "ids": batch_ids, "errors": [response]}
+
+        failed_batches = []
+        in_flight: set[Future] = set()
+        num_sent_items = 0  # batches are sent in order, so the unsent items are the ones after this
+
+        def collect_finished(return_when: str):
+            nonlocal in_flight
+            done, in_flight = wait(in_flight, return_when=return_when)
+            for future in done:
+                if (failure := future.result()) is not None:
+                    logging.error(f"Error during upserting items in batch {failure['batch']}: {failure['errors']!r}")
+                    failed_batches.append(failure)
+
+        with ThreadPoolExecutor(max_workers=BULK_MAX_IN_FLIGHT) as executor:
+            for batch_number, (batch_ids, bulk_body) in enumerate(
+                self._generate_bulk_batches(index_name, ids, payloads)
+            ):
+                if len(in_flight) >= BULK_MAX_IN_FLIGHT:
+                    # backpressure: serializing further batches only when a request is done
+                    collect_finished(FIRST_COMPLETED)
+                if failed_batches:
+                    # not sending further batches, but waiting for the ones in flight to report their errors
+                    break
+                in_flight.add(executor.submit(upsert_batch, batch_number, batch_ids, bulk_body))
+                num_sent_items += len(batch_ids)
+            collect_finished("ALL_COMPLETED")
+
+        if failed_batches:
+            raise BulkUpsertError(
+                sorted(failed_batches, key=lambda failure: failure["batch"]), unsent_ids=ids[num_sent_items:]
+            )
 
-        run_in_batches_without_result(list(zip(ids, payloads)), 512, upsert_batch)
+    def _generate_bulk_batches(
+        self, index_name: str, ids: Iterable[str], payloads: Iterable[dict]
+    ) -> Generator[tuple[list[str], bytes], None, None]:
+        # yields NDJSON bulk bodies of at most BULK_MAX_BYTES (or a single larger item) and BULK_MAX_ITEMS items
+        batch_ids = []
+        batch_lines = []
+        batch_size = 0
+        for _id, item in zip(ids, payloads):
+            item = item.copy()
+            item.pop("_id")
+            lines = (
+                _serialize_bulk_line({"update": {"_index": index_name, "_id": _id}})
+                + b"\n"
+                + _serialize_bulk_line({"doc": item, "doc_as_upsert": True})
+                + b"\n"
+            )
+            if batch_ids and (batch_size + len(lines) > BULK_MAX_BYTES or len(batch_ids) >= BULK_MAX_ITEMS):
+                yield batch_ids, b"".join(batch_lines)
+                batch_ids, batch_lines, batch_size = [], [], 0
+            batch_ids.append(_id)
+            batch_lines.append(lines)
+            batch_size += len(lines)
+        if batch_ids:
+            yield batch_ids, b"".join(batch_lines)
 
     def remove_items(self, dataset: DotDict | Dataset, item_ids: list[str]):
         if dataset.source_plugin == SourcePlugin.REMOTE_DATASET:
@@ -335,9 +521,18 @@ class TextSearchEngineClient(object):
         return response["count"]
 
     def get_all_items_with_missing_field(
-        self, index_name: str, missing_field: str, required_fields: list[str], internal_batch_size: int = 1000
+        self,
+        index_name: str,
+        missing_field: str,
+        required_fields: list[str],
+        internal_batch_size: int = 1000,
+        slice_id: int = 0,
+        max_slices: int = 1,
     ) -> Generator:
         query = {"_source": required_fields, "query": {"bool": {"must_not": {"exists": {"field": missing_field}}}}}
+        if max_slices > 1:
+            # sliced scroll: the slices are disjoint parts of the index (based on the ids) and can be scanned in parallel
+            query["slice"] = {"id": slice_id, "max": max_slices}
         generator = opensearchpy.helpers.scan(
             self.client,
             index=index_name,
@@ -479,15 +674,29 @@ class TextSearchEngineClient(object):
             query["sort"] = sort_settings
             query["track_scores"] = True
 
-        logging.warning(f"Query: {json.dumps(query, indent=2)}")
-
+        t1 = time.monotonic()
         response = self.client.search(
             body=query,
             index=dataset.actual_database_name,
         )
+        duration = time.monotonic() - t1
+        if duration > SLOW_QUERY_LOG_THRESHOLD_SECONDS:
+            self._log_query(query, dataset.actual_database_name, duration, logging.WARNING)
+        elif logging.root.isEnabledFor(logging.DEBUG):
+            self._log_query(query, dataset.actual_database_name, duration, logging.DEBUG)
         total_matches = response.get("hits", {}).get("total", {}).get("value", 0)
         return response.get("hits", {}).get("hits", []), total_matches
 
+    def _log_query(self, query: dict, index_name: str, duration: float, level: int):
+        serialized_query = orjson.dumps(query, default=str, option=orjson.OPT_SORT_KEYS).decode()
+        query_hash = hashlib.sha256(serialized_query.encode()).hexdigest()[:16]
+        message = (
+            f"Text search query {query_hash} on {index_name} took {duration:.3f}s ({len(serialized_query)} bytes)"
+        )
+        if QUERY_LOG_MAX_CHARACTERS:
+            message += f": {serialized_query[:QUERY_LOG_MAX_CHARACTERS]}"
+        logging.log(level, message)
+
     def _convert_to_opensearch_filters(self, filters: list[dict]):
         query_filter = {
             "bool": {
@@ -1,13 +1,17 @@
 import datetime
+import hashlib
+import json
 import logging
 import os
+import threading
 import uuid
 from typing import Iterable, List
 
+import cachetools
+import cachetools.func
 import numpy as np
 from qdrant_client import QdrantClient
 from qdrant_client.http import models
-from qdrant_client.http.exceptions import UnexpectedResponse
 from qdrant_client.models import (
     FieldCondition,
     Filter,
@@ -24,7 +28,79 @@ from legacy_backend.utils.helpers import get_vector_field_dimensions
 from legacy_backend.utils.source_plugin_types import SourcePlugin
 
 qdrant_host = os.getenv("vector_database_host", "localhost")
-qdrant_port = 6333
+qdrant_port = int(os.getenv("vector_database_port", 6333))
+qdrant_grpc_port = int(os.getenv("vector_database_grpc_port", 6334))
+# "grpc" or "rest", gRPC avoids the JSON (de)serialization of large vector batches and search results,
+# if the gRPC port is not reachable, REST is used as a fallback:
+qdrant_transport = os.getenv("vector_database_transport", "rest")
+
+# search effort: hnsw_ef is derived from the number of requested results (limit and page) times this factor,
+# higher ef means more accurate search, but slower (can be overridden per dataset using the advanced options
+# 'hnsw_ef' for a fixed value or 'hnsw_ef_factor'):
+HNSW_EF_FACTOR = float(os.getenv("HNSW_EF_FACTOR", 1.5))
+HNSW_EF_MIN = int(os.getenv("HNSW_EF_MIN", 16))
+HNSW_EF_MAX = int(os.getenv("HNSW_EF_MAX", 10000))
+# collections with up to this many points are searched exactly (brute force) as the HNSW index doesn't help there
+# (per dataset: advanced option 'exact_vector_search_max_items', 0 to disable):
+EXACT_VECTOR_SEARCH_MAX_ITEMS = int(os.getenv("EXACT_VECTOR_SEARCH_MAX_ITEMS", 5000))
+
+# ranked results of recent searches are kept to serve further pages without searching from the start again,
+# the number of fetched results is doubled each time more are needed (only used for searches without vectors),
+# the size of the cache is limited by the total number of cached results:
+VECTOR_CANDIDATE_CACHE_MAX_RESULTS = int(os.getenv("VECTOR_CANDIDATE_CACHE_MAX_RESULTS", 100_000))
+VECTOR_CANDIDATE_CACHE_TTL_SECONDS = int(os.getenv("VECTOR_CANDIDATE_CACHE_TTL_SECONDS", 10 * 60))
+
+# number of parent items whose best sub items are searched in one batch request:
+SUB_ITEM_SEARCH_BATCH_SIZE = 100
+
+# sub items are written in batches of this size, otherwise it might time out:
+SUB_ITEM_UPSERT_BATCH_SIZE = 1024
+
+
+class SubItemUpsertStats(object):
+    """Counts sub items (of array vector fields) that were upserted, actually changed and removed as stale."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.received = 0
+        self.changed = 0
+        self.stale_deleted = 0
+
+    def record(self, received: int, changed: int) -> None:
+        with self._lock:
+            self.received += received
+            self.changed += changed
+
+    def record_stale_deleted(self, count: int) -> None:
+        with self._lock:
+            self.stale_deleted += count
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "received": self.received,
+                "changed": self.changed,
+                "stale_deleted": self.stale_deleted,
+            }
+
+
+sub_item_upsert_stats = SubItemUpsertStats()
+
+
+def get_sub_item_content_hash(payload: dict, vector) -> str:
+    # stored in the payload of each sub item to skip rewriting unchanged ones,
+    # the vector itself can't be compared as Qdrant normalizes it for cosine distance
+    content_hash = hashlib.sha256(np.asarray(vector, dtype=np.float32).tobytes())
+    content_hash.update(json.dumps(payload, sort_keys=True, default=str).encode())
+    return content_hash.hexdigest()
+
+
+def _get_payload_index_type(field_schema: PayloadSchemaType | models.TextIndexParams) -> str:
+    # same format as the data_type of the indexes in collection_info.payload_schema
+    if isinstance(field_schema, models.TextIndexParams):
+        return "text"
+    return str(field_schema.value)
+
 
 # docker run --name qdrant --rm -p 6333:6333 qdrant/qdrant:latest
 # then see http://localhost:55201/dashboard
@@ -35,12 +111,43 @@ class VectorSearchEngineClient(object):
     _instance: "VectorSearchEngineClient" = None  # type: ignore
 
     def __init__(self):
-        self.client = QdrantClient(
+        self.client, self.transport = self.create_qdrant_client(qdrant_transport)
+        # search key -> (ranked hits, True if there are no more results)
+        self._candidate_cache = cachetools.TTLCache(
+            maxsize=VECTOR_CANDIDATE_CACHE_MAX_RESULTS,
+            ttl=VECTOR_CANDIDATE_CACHE_TTL_SECONDS,
+            getsizeof=lambda value: max(len(value[0]), 1),
+        )
+        # collection name -> number of changes, part of the cache key so that entries of changed collections
+        # aren't used anymore (other processes only see the changes after the TTL of the cache):
+        self._collection_generations: dict[str, int] = {}
+        self._candidate_cache_lock = threading.Lock()
+        # self.client = QdrantClient(":memory:")
+
+    @staticmethod
+    def create_qdrant_client(transport: str) -> tuple[QdrantClient, str]:
+        if transport == "grpc":
+            client = QdrantClient(
+                qdrant_host,
+                port=qdrant_port,
+                grpc_port=qdrant_grpc_port,
+                prefer_grpc=True,
+                timeout=60,  # seconds, especially on AWS EBS volumes, requests can take very long
+            )
+            try:
+                client.get_collections()
+                return client, "grpc"
+            except Exception as e:
+                logging.warning(f"Qdrant gRPC port {qdrant_grpc_port} not reachable, falling back to REST: {e}")
+                client.close()
+        elif transport != "rest":
+            logging.warning(f"Unknown Qdrant transport '{transport}', using REST")
+        client = QdrantClient(
             qdrant_host,
             port=qdrant_port,
             timeout=60,  # seconds, especially on AWS EBS volumes, requests can take very long
-        )  # , grpc_port=6334, prefer_grpc=True
-        # self.client = QdrantClient(":memory:")
+        )
+        return client, "rest"
 
     @staticmethod
     def get_instance() -> "VectorSearchEngineClient":
@@ -55,6 +162,11 @@ class VectorSearchEngineClient(object):
     def _get_collection_name(self, database_name: str, vector_field: str):
         return f"{database_name}_field_{vector_field}"
 
+    def _invalidate_candidate_cache(self, collection_name: str):
+        # collection_name without the '_sub_items' suffix, invalidates the sub items collection as well
+        with self._candidate_cache_lock:
+            self._collection_generations[collection_name] = self._collection_generations.get(collection_name, 0) + 1
+
     def ensure_dataset_field_exists(
         self, dataset: dict, vector_field: str, update_params: bool = False, delete_if_params_changed: bool = False
     ):
@@ -98,28 +210,35 @@ class VectorSearchEngineClient(object):
         # TODO: parse field.index_parameters for torage type
 
         collection_name = self._get_collection_name(dataset.actual_database_name, vector_field)
+        self._invalidate_candidate_cache(collection_name)
         if field.is_array:
             collection_name = f"{collection_name}_sub_items"
 
-        try:
-            self.client.get_collection(collection_name)
-        except UnexpectedResponse as e:
-            if e.status_code != 404:
-                raise e
-            # status code is 404 -> collection doesn't exist yet
+        # not using get_collection() and a 404 error here as the error type depends on the transport (REST or gRPC)
+        if not self.client.collection_exists(collection_name):
             self.client.create_collection(
                 collection_name=collection_name,
                 vectors_config=vector_configs,
                 on_disk_payload=True,  # TODO: this might make filtering slow
             )
-        else:
-            if delete_if_params_changed:
-                self.client.recreate_collection(
-                    collection_name=collection_name,
-                    vectors_config=vector_configs,
-                    on_disk_payload=True,  # TODO: this might make filtering slow
-                )
-            elif update_params:
+        elif delete_if_params_changed:
+            self.client.recreate_collection(
+                collection_name=collection_name,
+                vectors_config=vector_configs,
+                on_disk_payload=True,  # TODO: this might make filtering slow
+            )
+        collection_info = self.client.get_collection(collection_name)
+        if update_params:
+            existing_vector_params = collection_info.config.params.vectors
+            if isinstance(existing_vector_params, dict):
+                existing_vector_params = existing_vector_params.get(field.identifier)
+            if (
+                existing_vector_params is None
+                or not existing_vector_params.on_disk
+                or not (existing_vector_params.hnsw_config and existing_vector_params.hnsw_config.on_disk)
+                or existing_vector_params.quantization_config != quantization_config
+            ):
+                logging.warning(f"Updating vector params of collection {collection_name}")
                 self.client.update_collection(
                     collection_name=collection_name,
                     vectors_config=vector_configs_update,
@@ -142,58 +261,56 @@ class VectorSearchEngineClient(object):
             FieldType.GEO_COORDINATES: PayloadSchemaType.GEO,  # FIXME: might need conversion
         }
 
-        # create payload indexes:
-        remove_indexes = []
+        # payload indexes that should exist:
+        wanted_indexes: dict[str, PayloadSchemaType | models.TextIndexParams] = {}
         for other_field in dataset.schema.object_fields.values():
             if (
                 not other_field.is_available_for_filtering
                 or (other_field.index_parameters or {}).get("exclude_from_vector_database")
                 or (other_field.index_parameters or {}).get("no_index_in_vector_database")
             ):
-                remove_indexes.append(other_field.identifier)
                 continue
             if other_field.field_type not in indexable_field_type_to_qdrant_type:
-                remove_indexes.append(other_field.identifier)
                 continue
             if other_field.is_array and other_field.field_type not in [
                 FieldType.TAG,
                 FieldType.STRING,
                 FieldType.IDENTIFIER,
             ]:
-                remove_indexes.append(other_field.identifier)
                 logging.warning("Array fields are not yet supported for indexing in Qdrant, must be flattened somehow")
                 continue
-
-            logging.warning(
-                f"Creating indexed payload field {other_field.identifier} with type {other_field.field_type}"
-            )
-            self.client.create_payload_index(
-                collection_name=collection_name,
-                field_name=other_field.identifier,
-                field_schema=indexable_field_type_to_qdrant_type[other_field.field_type],
-            )
-
-        for field_name in remove_indexes:
-            # in case an index was created before, but the field is not available for filtering anymore:
-            logging.warning(f"Removing indexed payload field {field_name} because it's not available for filtering")
-            self.client.delete_payload_index(collection_name=collection_name, field_name=field_name)
-
+            wanted_indexes[other_field.identifier] = indexable_field_type_to_qdrant_type[other_field.field_type]
         if field.is_array:
+            wanted_indexes["parent_id"] = PayloadSchemaType.KEYWORD
+            # used to find stale sub items when arrays get shorter:
+            wanted_indexes["array_index"] = PayloadSchemaType.INTEGER
+
+        # only apply the difference to the existing indexes, without waiting for each index to be built
+        # (Qdrant applies the operations in order, and building 40 indexes one after another took minutes):
+        existing_index_types = {
+            field_name: str(getattr(index_info.data_type, "value", index_info.data_type))
+            for field_name, index_info in (collection_info.payload_schema or {}).items()
+        }
+        for field_name, index_type in existing_index_types.items():
+            if field_name in wanted_indexes and _get_payload_index_type(wanted_indexes[field_name]) == index_type:
+                continue
+            # in case an index was created before, but the field is not available for filtering anymore:
             logging.warning(
-                f"Creating payload index for parent_id field because this is an array field with sub-items"
+                f"Removing indexed payload field {field_name} because it's not available for filtering or its type changed"
             )
+            self.client.delete_payload_index(collection_name=collection_name, field_name=field_name, wait=False)
+        for field_name, field_schema in wanted_indexes.items():
+            if existing_index_types.get(field_name) == _get_payload_index_type(field_schema):
+                continue
+            logging.warning(f"Creating indexed payload field {field_name} with type {field_schema}")
             self.client.create_payload_index(
-                collection_name=collection_name, field_name="parent_id", field_schema=PayloadSchemaType.KEYWORD
+                collection_name=collection_name, field_name=field_name, field_schema=field_schema, wait=False
             )
 
+        if field.is_array:
             # create a separate collection for the parent item data, for 'lookups':
             lookup_collection_name = self._get_collection_name(dataset.actual_database_name, vector_field)
-            try:
-                self.client.get_collection(lookup_collection_name)
-            except UnexpectedResponse as e:
-                if e.status_code != 404:
-                    raise e
-                # status code is 404 -> collection doesn't exist yet
+            if not self.client.collection_exists(lookup_collection_name):
                 lookup_vector_configs = {}
                 lookup_vector_configs[field.identifier] = models.VectorParams(
                     size=1, distance=models.Distance.COSINE, on_disk=True, hnsw_config=HnswConfigDiff(on_disk=True)
@@ -206,6 +323,7 @@ class VectorSearchEngineClient(object):
 
     def delete_field(self, database_name: str, vector_field: str, is_array_field: bool):
         collection_name = self._get_collection_name(database_name, vector_field)
+        self._invalidate_candidate_cache(collection_name)
         try:
             self.client.delete_collection(collection_name)
         except Exception as e:
@@ -238,44 +356,10 @@ class VectorSearchEngineClient(object):
 
     def upsert_items(self, database_name: str, vector_field: str, ids: list, payloads: list[dict], vectors: list):
         collection_name = self._get_collection_name(database_name, vector_field)
+        self._invalidate_candidate_cache(collection_name)
         is_array_of_vectors = len(vectors[0]) == 0 or isinstance(vectors[0][0], Iterable)
         if is_array_of_vectors:
-            # if an array vector field is changed that existed before, we can't just override it
-            # but need to delete all sub points before adding the new ones as there might be less new ones
-            self.client.delete(
-                collection_name=f"{collection_name}_sub_items",
-                points_selector=models.FilterSelector(
-                    filter=models.Filter(
-                        must=[
-                            models.FieldCondition(key="parent_id", match=models.MatchAny(any=ids)),
-                        ],
-                    )
-                ),
-            )
-            sub_item_ids = []
-            sub_item_vectors = []
-            sub_item_payloads = []
-            for item_id, payload, vector_array in zip(ids, payloads, vectors):
-                for i, vector in enumerate(vector_array):
-                    sub_item_payload = payload.copy()
-                    sub_item_payload["parent_id"] = item_id
-                    sub_item_payload["array_index"] = i
-                    sub_item_payloads.append(sub_item_payload)
-                    sub_item_id = f"{item_id}_{i}"
-                    sub_item_uuid = pk_to_uuid_id(sub_item_id)
-                    sub_item_ids.append(sub_item_uuid)
-                    sub_item_vectors.append(vector)
-
-            # do in batches of 1024, otherwise it might time out:
-            for i in range(0, len(sub_item_ids), 1024):
-                self.client.upsert(
-                    collection_name=f"{collection_name}_sub_items",
-                    points=models.Batch(
-                        ids=sub_item_ids[i : i + 1024],
-                        payloads=sub_item_payloads[i : i + 1024],
-                        vectors={vector_field: sub_item_vectors[i : i + 1024]},
-                    ),
-                )
+            self._upsert_sub_items(f"{collection_name}_sub_items", vector_field, ids, payloads, vectors)
             # create empty payloads and vectors for the lookup collection:
             payloads = [{} for _ in ids]
             vectors = [[0] for _ in ids]
@@ -286,8 +370,77 @@ class VectorSearchEngineClient(object):
             points=models.Batch(ids=ids, payloads=payloads, vectors={vector_field: vectors}),
         )
 
+    def _upsert_sub_items(
+        self, collection_name: str, vector_field: str, ids: list, payloads: list[dict], vectors: list
+    ):
+        # sub item ids are derived from the parent id and the array index, so existing sub items are overwritten
+        # in place, unchanged ones (same content hash) are skipped and only stale ones (array index beyond the
+        # new length) are deleted, to avoid rewriting all vectors and the deletion churn when re-importing items
+        sub_item_ids = []
+        sub_item_vectors = []
+        sub_item_payloads = []
+        for item_id, payload, vector_array in zip(ids, payloads, vectors):
+            for i, vector in enumerate(vector_array):
+                sub_item_payload = payload.copy()
+                sub_item_payload["parent_id"] = item_id
+                sub_item_payload["array_index"] = i
+                sub_item_payload["content_hash"] = get_sub_item_content_hash(sub_item_payload, vector)
+                sub_item_payloads.append(sub_item_payload)
+                sub_item_id = f"{item_id}_{i}"
+                sub_item_uuid = pk_to_uuid_id(sub_item_id)
+                sub_item_ids.append(sub_item_uuid)
+                sub_item_vectors.append(vector)
+
+        num_changed = 0
+        for i in range(0, len(sub_item_ids), SUB_ITEM_UPSERT_BATCH_SIZE):
+            batch_ids = sub_item_ids[i : i + SUB_ITEM_UPSERT_BATCH_SIZE]
+            existing_points = self.client.retrieve(
+                collection_name=collection_name, ids=batch_ids, with_payload=["content_hash"], with_vectors=False
+            )
+            existing_hashes = {str(point.id): (point.payload or {}).get("content_hash") for point in existing_points}
+            changed_indexes = [
+                index
+                for index in range(i, i + len(batch_ids))
+                if existing_hashes.get(sub_item_ids[index]) != sub_item_payloads[index]["content_hash"]
+            ]
+            if not changed_indexes:
+                continue
+            num_changed += len(changed_indexes)
+            self.client.upsert(
+                collection_name=collection_name,
+                points=models.Batch(
+                    ids=[sub_item_ids[index] for index in changed_indexes],
+                    payloads=[sub_item_payloads[index] for index in changed_indexes],
+                    vectors={vector_field: [sub_item_vectors[index] for index in changed_indexes]},
+                ),
+            )
+        sub_item_upsert_stats.record(len(sub_item_ids), num_changed)
+
+        # delete sub items beyond the new array length, with one condition per distinct length:
+        parent_ids_by_length: dict[int, list] = {}
+        for item_id, vector_array in zip(ids, vectors):
+            parent_ids_by_length.setdefault(len(vector_array), []).append(item_id)
+        stale_filter = models.Filter(
+            should=[
+                models.Filter(
+                    must=[
+                        models.FieldCondition(key="parent_id", match=models.MatchAny(any=parent_ids)),
+                        models.FieldCondition(key="array_index", range=models.Range(gte=length)),
+                    ]
+                )
+                for length, parent_ids in parent_ids_by_length.items()
+            ]
+        )
+        num_stale = self.client.count(collection_name=collection_name, count_filter=stale_filter, exact=True).count
+        if num_stale:
+            self.client.delete(
+                collection_name=collection_name, points_selector=models.FilterSelector(filter=stale_filter)
+            )
+            sub_item_upsert_stats.record_stale_deleted(num_stale)
+
     def remove_items(self, database_name: str, vector_field: str, ids: list, is_array_field: bool):
         collection_name = self._get_collection_name(database_name, vector_field)
+        self._invalidate_candidate_cache(collection_name)
         self.client.delete(collection_name, ids)
         if is_array_field:
             self.client.delete(
@@ -326,6 +479,7 @@ class VectorSearchEngineClient(object):
                     "filters": filters,
                     "return_vectors": return_vectors,
                     "limit": limit,
+                    "page": page,
                     "score_threshold": score_threshold,
                     "min_results": min_results,
                     "is_array_field": is_array_field,
@@ -333,80 +487,144 @@ class VectorSearchEngineClient(object):
                 },
             )
         collection_name = self._get_collection_name(dataset.actual_database_name, vector_field)
-        qdrant_filters = self._convert_to_qdrant_filters(filters)
+        cache_key = None
+        if not return_vectors:
+            with self._candidate_cache_lock:
+                generation = self._collection_generations.get(collection_name, 0)
+            cache_key = self._get_candidate_cache_key(
+                collection_name, generation, vector_field, query_vector, filters, is_array_field, max_sub_items
+            )
+        if is_array_field:
+            collection_name = f"{collection_name}_sub_items"
+        num_results = (page * limit) + limit
+
+        # results of earlier pages are cached, so that deep pages don't need to search from the start again
+        # (the first page is always searched again, but stored in the cache for the following pages):
+        candidates, no_more_results = [], False
+        if cache_key and page > 0:
+            with self._candidate_cache_lock:
+                candidates, no_more_results = self._candidate_cache.get(cache_key, ([], False))
+
+        if len(candidates) < num_results and not no_more_results:
+            # fetching more than needed if there were earlier pages, so that the total cost grows linearly:
+            fetch_size = max(num_results, 2 * len(candidates)) if candidates else num_results
+            candidates = self._search_candidates(
+                dataset,
+                collection_name,
+                vector_field,
+                query_vector,
+                filters,
+                return_vectors,
+                fetch_size,
+                is_array_field,
+                max_sub_items,
+            )
+            no_more_results = len(candidates) < fetch_size
+            if cache_key and len(candidates) <= VECTOR_CANDIDATE_CACHE_MAX_RESULTS:
+                with self._candidate_cache_lock:
+                    self._candidate_cache[cache_key] = (candidates, no_more_results)
 
+        # the score threshold is applied here instead of in Qdrant, so that the results without the threshold
+        # are already available if there are too few results above it (instead of searching a second time)
+        return self._apply_score_threshold(candidates[page * limit : num_results], score_threshold, min_results, limit)
+
+    def _search_candidates(
+        self,
+        dataset: DotDict,
+        collection_name: str,
+        vector_field: str,
+        query_vector: list,
+        filters: list[dict] | None,
+        return_vectors: bool,
+        num_results: int,
+        is_array_field: bool,
+        max_sub_items: int,
+    ) -> list:
+        # returns the best num_results items, ranked by score
+        qdrant_filters = self._convert_to_qdrant_filters(filters)
         if is_array_field:
             group_hits = self.client.search_groups(
-                collection_name=f"{collection_name}_sub_items",
+                collection_name=collection_name,
                 query_vector=NamedVector(name=vector_field, vector=query_vector),
                 with_payload=["array_index"],
                 with_vectors=return_vectors,
-                limit=(page * limit) + limit,
-                score_threshold=score_threshold,
+                limit=num_results,
                 group_by="parent_id",
                 group_size=max_sub_items,
                 query_filter=qdrant_filters,
+                search_params=self._get_search_params(dataset, collection_name, num_results * max_sub_items),
             )
             # hits.groups is a list of {'id': parent_id, 'hits': [{'id': sub_id, 'score': score, 'payload': dict} ...]}
-            hits = []
-            if len(group_hits.groups) <= page * limit:
-                return hits
-            for group in group_hits.groups[page * limit :]:
-                hits.append(
-                    DotDict(
-                        {
-                            "id": group.id,
-                            "score": group.hits[0].score,
-                            "array_index": group.hits[0].payload["array_index"],  # type: ignore
-                        }
-                    )
+            return [
+                DotDict(
+                    {
+                        "id": group.id,
+                        "score": group.hits[0].score,
+                        "array_index": group.hits[0].payload["array_index"],  # type: ignore
+                    }
                 )
-            if min_results > 0 and len(hits) < min_results and score_threshold:
-                # try again without score threshold
-                return self.get_items_near_vector(
-                    dataset,
-                    vector_field,
-                    query_vector,
-                    filters,
-                    return_vectors,
-                    min(min_results, limit),
-                    page,
-                    None,
-                    min_results,
-                    is_array_field,
-                    max_sub_items,
-                )
-            return hits  # type: ignore
+                for group in group_hits.groups
+            ]
 
-        hits = self.client.search(
+        return self.client.search(
             collection_name=collection_name,
             query_vector=NamedVector(name=vector_field, vector=query_vector),
             with_payload=False,
             with_vectors=return_vectors,
-            limit=limit,
-            offset=page * limit,
-            score_threshold=score_threshold,
+            limit=num_results,
             query_filter=qdrant_filters,
-            search_params=models.SearchParams(
-                hnsw_ef=50,  # higher ef means more accurate search, but slower, default is 100
-            ),
+            search_params=self._get_search_params(dataset, collection_name, num_results),
         )
-        if min_results > 0 and len(hits) < min_results and score_threshold:
-            # try again without score threshold
-            return self.get_items_near_vector(
-                dataset,
-                vector_field,
-                query_vector,
-                filters,
-                return_vectors,
-                min(min_results, limit),
-                page,
-                None,
-                min_results,
-                is_array_field,
-                max_sub_items,
-            )
-        return hits
+
+    def _get_candidate_cache_key(
+        self,
+        collection_name: str,
+        generation: int,
+        vector_field: str,
+        query_vector: list,
+        filters: list[dict] | None,
+        is_array_field: bool,
+        max_sub_items: int,
+    ) -> str:
+        key_data = hashlib.sha256(np.asarray(query_vector, dtype=np.float32).tobytes())
+        key_data.update(
+            json.dumps(
+                [collection_name, generation, vector_field, filters, is_array_field, max_sub_items],
+                sort_keys=True,
+                default=str,
+            ).encode()
+        )
+        return key_data.hexdigest()
+
+    def _apply_score_threshold(self, hits: list, score_threshold: float | None, min_results: int, limit: int) -> list:
+        # hits need to be sorted by score (descending)
+        if score_threshold is None:
+            return hits
+        hits_above_threshold = [hit for hit in hits if hit.score >= score_threshold]
+        if min_results > 0 and len(hits_above_threshold) < min_results and score_threshold:
+            # too few results above threshold -> return the best ones without threshold
+            return hits[: min(min_results, limit)]
+        return hits_above_threshold
+
+    def _get_search_params(self, dataset: DotDict, collection_name: str, num_results: int) -> models.SearchParams:
+        # search effort depending on the number of requested results instead of one value for lists and maps
+        options = dataset.merged_advanced_options or {}
+        exact_search_max_items = options.get("exact_vector_search_max_items", EXACT_VECTOR_SEARCH_MAX_ITEMS)
+        if exact_search_max_items and self._get_approximate_point_count(collection_name) <= exact_search_max_items:
+            return models.SearchParams(exact=True)
+        if options.get("hnsw_ef"):
+            return models.SearchParams(hnsw_ef=int(options["hnsw_ef"]))
+        hnsw_ef = int(num_results * options.get("hnsw_ef_factor", HNSW_EF_FACTOR))
+        return models.SearchParams(hnsw_ef=min(max(hnsw_ef, HNSW_EF_MIN), HNSW_EF_MAX))
+
+    @cachetools.func.ttl_cache(maxsize=1024, ttl=5 * 60)  # seconds
+    def _get_approximate_point_count(self, collection_name: str) -> int:
+        try:
+            return self.client.count(collection_name, exact=False).count
+        except Exception as e:
+            logging.warning(e)
+            # unknown size -> no exact search
+            return 2**63
 
     def _convert_to_qdrant_filters(self, filters: list[dict] | None) -> Filter | None:
         if not filters:
@@ -579,23 +797,59 @@ class VectorSearchEngineClient(object):
         min_results: int = 2,
         with_vectors: bool = False,
     ) -> list:
+        return self.get_best_sub_items_of_many_parents(
+            database_name,
+            vector_field,
+            [parent_id],
+            query_vector,
+            score_threshold,
+            limit,
+            min_results,
+            with_vectors,
+        )[parent_id]
+
+    def get_best_sub_items_of_many_parents(
+        self,
+        database_name: str,
+        vector_field: str,
+        parent_ids: list[str],
+        query_vector: list,
+        score_threshold: float | None = None,
+        limit: int = 5,
+        min_results: int = 2,
+        with_vectors: bool = False,
+    ) -> dict[str, list]:
+        # returns the best sub items for each parent, using one batch request instead of one search per parent
         if len(query_vector) > 0 and np.isnan(query_vector).any():
             logging.warning("Query vector is NaN, returning empty list")
             raise ValueError("Query vector is NaN")
-            return []
         collection_name = self._get_collection_name(database_name, vector_field)
-        hits = self.client.search(
-            collection_name=f"{collection_name}_sub_items",
-            query_vector=NamedVector(name=vector_field, vector=query_vector),
-            query_filter=Filter(must=[FieldCondition(key="parent_id", match=models.MatchValue(value=parent_id))]),
-            with_payload=["array_index"],
-            with_vectors=with_vectors,
-            limit=limit,
-            score_threshold=None,
-        )
-        if score_threshold is not None:
-            for i in range(min_results, len(hits)):
-                if hits[i].score < score_threshold:
-                    hits = hits[:i]
-                    break
-        return hits
+        unique_parent_ids = list(dict.fromkeys(parent_ids))
+        results = {}
+        # the batches are limited in size to not run into request size limits and timeouts:
+        for i in range(0, len(unique_parent_ids), SUB_ITEM_SEARCH_BATCH_SIZE):
+            batch_parent_ids = unique_parent_ids[i : i + SUB_ITEM_SEARCH_BATCH_SIZE]
+            batch_hits = self.client.search_batch(
+                collection_name=f"{collection_name}_sub_items",
+                requests=[
+                    models.SearchRequest(
+                        vector=NamedVector(name=vector_field, vector=query_vector),
+                        filter=Filter(
+                            must=[FieldCondition(key="parent_id", match=models.MatchValue(value=parent_id))]
+                        ),
+                        with_payload=["array_index"],
+                        with_vector=with_vectors,
+                        limit=limit,
+                        score_threshold=None,
+                    )
+                    for parent_id in batch_parent_ids
+                ],
+            )
+            for parent_id, hits in zip(batch_parent_ids, batch_hits):
+                if score_threshold is not None:
+                    for j in range(min_results, len(hits)):
+                        if hits[j].score < score_threshold:
+                            hits = hits[:j]
+                            break
+                results[parent_id] = hits
+        return results
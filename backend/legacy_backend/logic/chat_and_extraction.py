@@ -5,9 +5,7 @@ from data_map_backend.views.other_views import get_serialized_dataset_cached
 from legacy_backend.logic.chat_and_extraction_common import _sort_fields_logically
 from legacy_backend.logic.search_common import (
     get_document_details_by_id,
-    get_field_similarity_threshold,
-    get_relevant_parts_of_item_using_query_vector,
-    get_suitable_generator,
+    get_relevant_full_text_chunks,
 )
 
 
@@ -19,6 +17,22 @@ def get_item_question_context(
     max_characters_per_field: int | None = 5000,
     max_total_characters: int | None = None,
 ) -> dict:
+    return get_items_question_context(
+        dataset_id, [item_id], source_fields, question, max_characters_per_field, max_total_characters
+    )[item_id]
+
+
+def get_items_question_context(
+    dataset_id: int,
+    item_ids: list[str],
+    source_fields: list[str],
+    question: str,
+    max_characters_per_field: int | None = 5000,
+    max_total_characters: int | None = None,
+) -> dict[str, dict]:
+    """Returns the context for the question for each item of the dataset (as a dict with 'context').
+
+    The relevant full text snippets of all items are searched at once, with a single query vector."""
     dataset = get_serialized_dataset_cached(dataset_id)
     required_fields = {"_id"}
     source_fields_set = set(source_fields)
@@ -26,6 +40,7 @@ def get_item_question_context(
         required_fields = required_fields.union(dataset.schema.descriptive_text_fields)
         source_fields_set.remove("_descriptive_text_fields")
         source_fields_set.update(dataset.schema.descriptive_text_fields)
+    chunk_field = None
     if "_full_text_snippets" in source_fields:
         chunk_vector_field_name = dataset.merged_advanced_options.get("full_text_chunk_embeddings")
         if chunk_vector_field_name:
@@ -34,32 +49,39 @@ def get_item_question_context(
             required_fields.add(chunk_field)
     required_fields.update([field for field in source_fields if not field.startswith("_")])
 
-    full_item = get_document_details_by_id(dataset_id, item_id, tuple(required_fields), None) or {}
+    full_items = {
+        item_id: get_document_details_by_id(dataset_id, item_id, tuple(required_fields), None) or {}
+        for item_id in item_ids
+    }
 
-    text = ""
     source_fields = list(source_fields_set)
     _sort_fields_logically(source_fields)
 
-    for source_field in source_fields:
-        if source_field == "_full_text_snippets":
-            continue
-        elif source_field.startswith("_"):
-            continue
-        else:
-            value = full_item.get(source_field, "n/a")
-            value = str(value)[:max_characters_per_field] if max_characters_per_field else str(value)
-            name = dataset.schema.object_fields.get(source_field, {}).get("name", None) or source_field
-            text += f"{name}: {value}\n"
-            if max_total_characters and len(text) >= max_total_characters:
-                break
+    texts = {}
+    for item_id, full_item in full_items.items():
+        text = ""
+        for source_field in source_fields:
+            if source_field == "_full_text_snippets":
+                continue
+            elif source_field.startswith("_"):
+                continue
+            else:
+                value = full_item.get(source_field, "n/a")
+                value = str(value)[:max_characters_per_field] if max_characters_per_field else str(value)
+                name = dataset.schema.object_fields.get(source_field, {}).get("name", None) or source_field
+                text += f"{name}: {value}\n"
+                if max_total_characters and len(text) >= max_total_characters:
+                    break
+        texts[item_id] = text
 
     max_chunks_to_show_all = 20
     max_selected_chunks = 5
-    if "_full_text_snippets" in source_fields and (not max_total_characters or len(text) < max_total_characters):
-        chunk_vector_field_name = dataset.merged_advanced_options.get("full_text_chunk_embeddings")
-        if chunk_vector_field_name:
-            chunk_vector_field = DotDict(dataset.schema.object_fields.get(chunk_vector_field_name))
-            chunk_field = chunk_vector_field.source_fields[0]
+    chunks_to_search = {}
+    if chunk_field:
+        for item_id, full_item in full_items.items():
+            text = texts[item_id]
+            if max_total_characters and len(text) >= max_total_characters:
+                continue
             chunks = full_item.get(chunk_field, [])
             full_text = " ".join([chunk.get("text", "") for chunk in chunks])
             if len(chunks) <= max_chunks_to_show_all and (
@@ -67,53 +89,69 @@ def get_item_question_context(
             ):
                 text += f"Full Text:\n"
                 text += f"{full_text}\n"
+                texts[item_id] = text
             else:
-                generator_function = get_suitable_generator(dataset, chunk_vector_field_name, mode="search")
-                assert generator_function is not None
-                # TODO: the query vector should ideally be only generated once for all items
-                query_vector = generator_function([[question]])[0]
-                score_threshold = get_field_similarity_threshold(chunk_vector_field, input_is_image=False)
-                result = get_relevant_parts_of_item_using_query_vector(
-                    dataset,
-                    item_id,
-                    chunk_vector_field_name,
-                    query_vector,
-                    score_threshold,
-                    max_selected_chunks,
-                    rerank=True,
-                    query=question,
-                    source_texts=chunks,
-                )
-
-                include_beginning_and_end = (not max_characters_per_field or max_characters_per_field >= 5000) and len(
-                    chunks
-                ) > max_selected_chunks
-                if include_beginning_and_end:
-                    # being generous and including beginning and end of full text as those contain important information usually
-                    beginning = " ".join([chunk.get("text", "") for chunk in chunks[:3]])
-                    text += f"Beginning of Full Text:\n"
-                    text += f"{beginning}\n\n"
-
-                for part in result.get("_relevant_parts", []):
-                    chunk_before = chunks[part.get("index") - 1].get("text", "") if part.get("index") > 0 else ""
-                    this_chunk = chunks[part.get("index")].get("text", "")
-                    chunk_after = (
-                        chunks[part.get("index") + 1].get("text", "") if part.get("index") + 1 < len(chunks) else ""
-                    )
-                    relevant_text = f"[...] {chunk_before[-200:]} {this_chunk} {chunk_after[:200]} [...]"
-                    if max_characters_per_field:
-                        relevant_text = relevant_text[:max_characters_per_field]
-                    text += f"\nPotentially Relevant Snippet from {chunk_field}:\n"
-                    text += f"    {relevant_text}\n\n"
-                    if max_total_characters and len(text) >= max_total_characters:
-                        break
-
-                if include_beginning_and_end:
-                    end = " ".join([chunk.get("text", "") for chunk in chunks[-3:]])
-                    text += f"End of Full Text:\n"
-                    text += f"{end}\n\n"
-
-    if max_total_characters and len(text) > max_total_characters:
-        text = text[: max_total_characters - 1] + "\n"
-
-    return {"context": text}
+                chunks_to_search[item_id] = chunks
+
+    relevant_parts_per_item = (
+        get_relevant_full_text_chunks(dataset, chunks_to_search, question, max_selected_chunks)
+        if chunks_to_search
+        else {}
+    )
+
+    for item_id, chunks in chunks_to_search.items():
+        text = texts[item_id]
+        include_beginning_and_end = (not max_characters_per_field or max_characters_per_field >= 5000) and len(
+            chunks
+        ) > max_selected_chunks
+        if include_beginning_and_end:
+            # being generous and including beginning and end of full text as those contain important information usually
+            beginning = " ".join([chunk.get("text", "") for chunk in chunks[:3]])
+            text += f"Beginning of Full Text:\n"
+            text += f"{beginning}\n\n"
+
+        for part in relevant_parts_per_item.get(item_id, []):
+            chunk_before = chunks[part.get("index") - 1].get("text", "") if part.get("index") > 0 else ""
+            this_chunk = chunks[part.get("index")].get("text", "")
+            chunk_after = chunks[part.get("index") + 1].get("text", "") if part.get("index") + 1 < len(chunks) else ""
+            relevant_text = f"[...] {chunk_before[-200:]} {this_chunk} {chunk_after[:200]} [...]"
+            if max_characters_per_field:
+                relevant_text = relevant_text[:max_characters_per_field]
+            text += f"\nPotentially Relevant Snippet from {chunk_field}:\n"
+            text += f"    {relevant_text}\n\n"
+            if max_total_characters and len(text) >= max_total_characters:
+                break
+
+        if include_beginning_and_end:
+            end = " ".join([chunk.get("text", "") for chunk in chunks[-3:]])
+            text += f"End of Full Text:\n"
+            text += f"{end}\n\n"
+        texts[item_id] = text
+
+    results = {}
+    for item_id, text in texts.items():
+        if max_total_characters and len(text) > max_total_characters:
+            text = text[: max_total_characters - 1] + "\n"
+        results[item_id] = {"context": text}
+    return results
+
+
+def get_question_context_of_items(
+    items: list[tuple[int, str]],
+    source_fields: list[str],
+    question: str,
+    max_characters_per_field: int | None = 5000,
+    max_total_characters: int | None = None,
+) -> dict[tuple[int, str], dict]:
+    """Same as get_items_question_context(), but for (dataset_id, item_id) tuples of possibly different datasets."""
+    item_ids_per_dataset: dict[int, list[str]] = {}
+    for dataset_id, item_id in items:
+        item_ids_per_dataset.setdefault(dataset_id, []).append(item_id)
+    contexts = {}
+    for dataset_id, item_ids in item_ids_per_dataset.items():
+        dataset_contexts = get_items_question_context(
+            dataset_id, item_ids, source_fields, question, max_characters_per_field, max_total_characters
+        )
+        for item_id, context in dataset_contexts.items():
+            contexts[(dataset_id, item_id)] = context
+    return contexts
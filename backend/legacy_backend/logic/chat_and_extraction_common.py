@@ -1,9 +1,14 @@
-import json
 import logging
 
 from data_map_backend.utils import DotDict
 from legacy_backend.database_client.django_client import get_dataset
-from legacy_backend.logic.search_common import get_document_details_by_id
+from legacy_backend.database_client.text_search_engine_client import (
+    TextSearchEngineClient,
+)
+from legacy_backend.logic.search_common import (
+    get_document_details_by_id,
+    get_relevant_full_text_chunks,
+)
 
 
 def get_context_for_each_item_in_search_results(
@@ -11,14 +16,48 @@ def get_context_for_each_item_in_search_results(
 ) -> list[str]:
     contexts = []
     datasets = {ds_id: get_dataset(ds_id) for ds_id in items_by_dataset.keys()}
+    if question and reranked_chunks > 0:
+        for ds_id, dataset in datasets.items():
+            item_ids = [item_id for sorted_ds_id, item_id in sorted_ids if sorted_ds_id == ds_id]
+            _add_reranked_chunks(
+                dataset, [items_by_dataset[ds_id][item_id] for item_id in item_ids], reranked_chunks, question
+            )
     for ds_id, item_id in sorted_ids:
         dataset = datasets[ds_id]
         item = items_by_dataset[ds_id][item_id]
-        contexts.append(_item_to_context(item, dataset, reranked_chunks, question))
+        contexts.append(_item_to_context(item, dataset))
     return contexts
 
 
-def _item_to_context(item: dict, dataset: DotDict, reranked_chunks: int = 0, question: str | None = None) -> str:
+def _add_reranked_chunks(dataset: DotDict, items: list[dict], reranked_chunks: int, question: str):
+    # replaces the relevant chunks of the items with the best ones for the question, for all items at once
+    chunk_vector_field_name = dataset.merged_advanced_options.get("full_text_chunk_embeddings")
+    if not chunk_vector_field_name or not items:
+        return
+    chunk_source_field = (
+        dataset.schema.object_fields[chunk_vector_field_name].source_fields[0]
+        if dataset.schema.object_fields[chunk_vector_field_name].source_fields
+        else None
+    )
+    if not chunk_source_field:
+        return
+    items_without_chunks = [item for item in items if chunk_source_field not in item]
+    if items_without_chunks:
+        search_engine_client = TextSearchEngineClient.get_instance()
+        full_items = search_engine_client.get_items_by_ids(
+            dataset, [item["_id"] for item in items_without_chunks], fields=[chunk_source_field]
+        )
+        for item, full_item in zip(items_without_chunks, full_items):
+            item[chunk_source_field] = full_item.get(chunk_source_field)
+    chunks_per_item = {item["_id"]: item.get(chunk_source_field) or [] for item in items}
+    relevant_parts_per_item = get_relevant_full_text_chunks(dataset, chunks_per_item, question, reranked_chunks)
+    for item in items:
+        item["_relevant_parts"] = [
+            part for part in item.get("_relevant_parts", []) if part.get("field") != chunk_source_field
+        ] + relevant_parts_per_item.get(item["_id"], [])
+
+
+def _item_to_context(item: dict, dataset: DotDict) -> str:
     always_included_fields = dataset.schema.descriptive_text_fields
     _sort_fields_logically(always_included_fields)
 
@@ -29,32 +68,7 @@ def _item_to_context(item: dict, dataset: DotDict, reranked_chunks: int = 0, que
     ]
     missing_fields += [field for field in chunk_fields_with_relevant_parts if field not in item]
 
-    if question and reranked_chunks > 0 and dataset.merged_advanced_options.get("full_text_chunk_embeddings"):
-        # oversample chunks and rerank:
-        chunk_vector_field_name = dataset.merged_advanced_options.get("full_text_chunk_embeddings")
-        chunk_source_field = (
-            dataset.schema.object_fields[chunk_vector_field_name].source_fields[0]
-            if dataset.schema.object_fields[chunk_vector_field_name].source_fields
-            else None
-        )
-        missing_fields += [chunk_source_field]
-        missing_fields = tuple(set(missing_fields))
-        relevant_parts_json = json.dumps(item.get("_relevant_parts", []))
-        full_item = (
-            get_document_details_by_id(
-                item["_dataset_id"],
-                item["_id"],
-                missing_fields,
-                relevant_parts_json,
-                top_n_full_text_chunks=reranked_chunks,
-                query=question,
-            )
-            or {}
-        )
-        item["_relevant_parts"] = full_item["_relevant_parts"]
-        for field in missing_fields:
-            item[field] = full_item.get(field)
-    elif missing_fields:
+    if missing_fields:
         # just get missing fields:
         missing_fields = tuple(set(missing_fields))
         full_item = get_document_details_by_id(item["_dataset_id"], item["_id"], missing_fields) or {}
@@ -1,16 +1,51 @@
+import hashlib
 import json
 import logging
+import threading
 from typing import Callable, Optional
 
+import cachetools
+
 from data_map_backend.utils import DotDict
 from legacy_backend.logic.generator_functions import get_generator_function_from_field
 
+# planned pipelines (including the generator and compiled condition functions) per dataset schema and parameters:
+_pipeline_steps_cache: cachetools.LRUCache = cachetools.LRUCache(maxsize=256)
+_pipeline_steps_cache_lock = threading.Lock()
+
+
+def _get_schema_fingerprint(dataset: DotDict) -> str:
+    # the serialized dataset doesn't contain changed_at, so the fields themselves are used as the 'version',
+    # any change to the schema results in a different fingerprint and the pipeline is planned again
+    serialized_fields = json.dumps(dataset.schema.object_fields, sort_keys=True, default=str)
+    return hashlib.sha256(serialized_fields.encode()).hexdigest()
+
 
-# TODO: add changed_at as parameter and cache function (using changed_at as measure for dropping the cache)
 def get_pipeline_steps(
     dataset_: dict, ignored_fields: list[str] = [], enabled_fields: list[str] = [], only_fields: list[str] = []
 ) -> tuple[list[list[dict]], set[str], set[str]]:
     dataset: DotDict = DotDict(dataset_)
+    cache_key = (
+        dataset.id,
+        _get_schema_fingerprint(dataset),
+        tuple(ignored_fields),
+        tuple(enabled_fields),
+        tuple(only_fields),
+    )
+    with _pipeline_steps_cache_lock:
+        cached = _pipeline_steps_cache.get(cache_key)
+    if cached is None:
+        cached = _plan_pipeline_steps(dataset, ignored_fields, list(enabled_fields), only_fields)
+        with _pipeline_steps_cache_lock:
+            _pipeline_steps_cache[cache_key] = cached
+    pipeline_steps, required_fields, potentially_changed_fields = cached
+    # copying the containers so that the cached entry can't be changed by the caller:
+    return [list(phase) for phase in pipeline_steps], set(required_fields), set(potentially_changed_fields)
+
+
+def _plan_pipeline_steps(
+    dataset: DotDict, ignored_fields: list[str], enabled_fields: list[str], only_fields: list[str]
+) -> tuple[list[list[dict]], set[str], set[str]]:
     if has_circular_dependency(dataset):
         logging.error(f"The pipeline steps have a circular dependency, object dataset: {dataset.name}")
         logging.error(f"No pipeline steps will be executed at all for this dataset until this is fixed.")
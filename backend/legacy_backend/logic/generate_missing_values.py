@@ -1,8 +1,12 @@
 import logging
+import threading
 import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from typing import Callable
 
+from django.db import connection
+
 from data_map_backend.models import GenerationTask
 from data_map_backend.utils import DotDict
 from data_map_backend.views.other_views import get_serialized_dataset_cached
@@ -46,6 +50,16 @@ def generate_missing_values(task: GenerationTask):
     field_identifier: str = task.field.identifier
     dataset = get_serialized_dataset_cached(dataset_id)
 
+    # the dataset is scanned in slices that are processed in parallel, the checkpoints of a previous run that was
+    # stopped or failed are used to skip slices that were already finished:
+    num_slices = max(1, task.parallel_slices)
+    checkpoints = task.slice_checkpoints or {}
+    if checkpoints.get("num_slices") != num_slices:
+        checkpoints = {"num_slices": num_slices, "slices": {}}
+    is_resuming = bool(checkpoints["slices"])
+    if is_resuming:
+        task.add_log(f"Resuming previous run: {checkpoints['slices']}")
+
     # the field to be filled in might not have the necessary database columns yet:
     # update_database_layout(dataset_id)
     # TODO: store time of last layout update in dataset and compare with date of last change
@@ -60,7 +74,7 @@ def generate_missing_values(task: GenerationTask):
         f"The following fields will potentially be changed: text fields {potentially_changed_text_fields}, vector fields {potentially_changed_vector_fields}"
     )
 
-    if task.regenerate_all:
+    if task.regenerate_all and not is_resuming:
         task.add_log(f"Deleting content of field {field_identifier} because all items should be regenerated")
         delete_field_content(dataset_id, field_identifier)
         task.add_log(f"Deleted content of field {field_identifier}")
@@ -100,14 +114,38 @@ def generate_missing_values(task: GenerationTask):
         task.add_log(f"Nothing to do")
         return
 
+    # the task object is shared by the slice threads:
+    task_lock = threading.Lock()
+    stop_event = threading.Event()
+
+    def _log(message: str):
+        with task_lock:
+            task.add_log(message)
+
+    def _save_checkpoint(slice_id: int, processed: int, skipped: int, finished: bool):
+        with task_lock:
+            slice_state = checkpoints["slices"].setdefault(str(slice_id), {"processed": 0, "skipped": 0})
+            slice_state["processed"] += processed
+            slice_state["skipped"] += skipped
+            slice_state["finished"] = finished
+            task.slice_checkpoints = checkpoints
+            task.save(update_fields=["slice_checkpoints"])
+
+    def _should_stop() -> bool:
+        if not stop_event.is_set():
+            stop_flag = GenerationTask.objects.filter(id=task.id).values_list("stop_flag", flat=True).first()
+            if stop_flag:
+                stop_event.set()
+        return stop_event.is_set()
+
     def _process(elements):
         nonlocal items_processed
         t1 = time.time()
         try:
-            changed_fields = generate_missing_values_for_given_elements(pipeline_steps, elements, task.add_log)
+            changed_fields = generate_missing_values_for_given_elements(pipeline_steps, elements, _log)
         except Exception as e:
-            task.add_log(f"Error during generation: {e}")
-            task.add_log(f"Skipping batch")
+            _log(f"Error during generation: {e}")
+            _log(f"Skipping batch")
             logging.error(f"Error during generation: {e}", exc_info=True)
             return
         t2 = time.time()
@@ -115,78 +153,100 @@ def generate_missing_values(task: GenerationTask):
         _update_indexes_with_generated_values(dataset, elements, changed_fields)
         index_update_duration = time.time() - t2
         duration = generation_duration + index_update_duration
-        items_processed += len(elements)
-        progress = items_processed / float(total_items_estimated)
-        task.progress = progress
-        task.save(update_fields=["progress"])
-        task.add_log(
-            f"Processed {items_processed} of {total_items_estimated} ({progress * 100:.1f} %)\n"
-            + f"Time per item: generation {generation_duration / len(elements) * 1000:.2f} ms, index update {index_update_duration / len(elements) * 1000:.2f} ms, total {duration / len(elements) * 1000:.2f} ms\n"
-            + f"Estimated remaining time: {(duration / len(elements) * (total_items_estimated - items_processed)) / 60.0:.1f} min"
-        )
+        with task_lock:
+            items_processed += len(elements)
+            progress = items_processed / float(total_items_estimated)
+            task.progress = progress
+            task.save(update_fields=["progress"])
+            task.add_log(
+                f"Processed {items_processed} of {total_items_estimated} ({progress * 100:.1f} %)\n"
+                + f"Time per item: generation {generation_duration / len(elements) * 1000:.2f} ms, index update {index_update_duration / len(elements) * 1000:.2f} ms, total {duration / len(elements) * 1000:.2f} ms\n"
+                + f"Estimated remaining time: {(duration / len(elements) * (total_items_estimated - items_processed)) / 60.0 / num_slices:.1f} min"
+            )
 
     batch_size = task.batch_size
 
-    generator = search_engine_client.get_all_items_with_missing_field(
-        dataset.actual_database_name, field_identifier, required_text_fields, internal_batch_size=batch_size
-    )
-    elements = []
-    last_batch_time = time.time()
-    skipped_items = 0
-    for element in generator:
-        elements.append(element)
-        if len(elements) % batch_size == 0:
-            task.refresh_from_db(fields=["stop_flag"])
-            if task.stop_flag:
-                task.add_log(f"Stopped by user")
-                task.status = GenerationTask.TaskStatus.FINISHED
-                task.save(update_fields=["status"])
+    def _process_batch(slice_id: int, elements: list[dict], last_batch_time: float):
+        # processes one batch of elements of a slice and saves the checkpoint of the slice
+        skipped_items = 0
+        if is_vector_field:
+            items_where_vector_already_exists = vector_db_client.get_items_by_ids(
+                dataset,
+                [x["_id"] for x in elements],
+                field_identifier,
+                is_array_field,
+                return_payloads=False,
+                return_vectors=False,
+            )
+            if len(items_where_vector_already_exists) == len(elements):
+                _save_checkpoint(slice_id, 0, len(elements), False)
+                _log(f"Skipping batch in slice {slice_id}, skipped {len(elements)}")
                 return
-            if is_vector_field:
-                items_where_vector_already_exists = vector_db_client.get_items_by_ids(
-                    dataset,
-                    [x["_id"] for x in elements],
-                    field_identifier,
-                    is_array_field,
-                    return_payloads=False,
-                    return_vectors=False,
-                )
-                if len(items_where_vector_already_exists) == len(elements):
-                    skipped_items += len(elements)
-                    elements = []
-                    last_batch_time = time.time()
-                    task.add_log(f"Skipping batch, skipped {skipped_items}")
-                    continue
-                for item in items_where_vector_already_exists:
-                    # TODO: there might be a faster way to do this
-                    for i, element in reversed(list(enumerate(elements))):
-                        if element["_id"] == item.id:
-                            skipped_items += 1
-                            del elements[i]
-            if required_vector_fields:
-                fill_in_vector_data_list(dataset, elements, required_vector_fields)
-            element_retrieval_time = time.time() - last_batch_time
-            task.add_log(f"Time to retrieve {len(elements)} items: {element_retrieval_time * 1000:.2f} ms")
-            _process(elements)
-            elements = []
-            last_batch_time = time.time()
-    if elements:
-        task.refresh_from_db(fields=["stop_flag"])
-        if task.stop_flag:
-            task.add_log(f"Stopped by user")
-            task.status = GenerationTask.TaskStatus.FINISHED
-            task.save(update_fields=["status"])
-            return
-        # process remaining elements
+            existing_ids = {item.id for item in items_where_vector_already_exists}
+            skipped_items = len(elements)
+            elements[:] = [element for element in elements if element["_id"] not in existing_ids]
+            skipped_items -= len(elements)
         if required_vector_fields:
             fill_in_vector_data_list(dataset, elements, required_vector_fields)
         element_retrieval_time = time.time() - last_batch_time
-        task.add_log(f"Time to retrieve {len(elements)} items: {element_retrieval_time * 1000:.2f} ms")
+        _log(f"Time to retrieve {len(elements)} items: {element_retrieval_time * 1000:.2f} ms")
         _process(elements)
+        _save_checkpoint(slice_id, len(elements), skipped_items, False)
+
+    def _process_slice(slice_id: int):
+        try:
+            generator = search_engine_client.get_all_items_with_missing_field(
+                dataset.actual_database_name,
+                field_identifier,
+                required_text_fields,
+                internal_batch_size=batch_size,
+                slice_id=slice_id,
+                max_slices=num_slices,
+            )
+            elements = []
+            last_batch_time = time.time()
+            for element in generator:
+                elements.append(element)
+                if len(elements) % batch_size == 0:
+                    if _should_stop():
+                        return
+                    _process_batch(slice_id, elements, last_batch_time)
+                    elements = []
+                    last_batch_time = time.time()
+            if elements:
+                if _should_stop():
+                    return
+                # process remaining elements
+                _process_batch(slice_id, elements, last_batch_time)
+            _save_checkpoint(slice_id, 0, 0, True)
+            _log(f"Slice {slice_id} done")
+        finally:
+            if num_slices > 1:
+                # each thread has its own database connection
+                connection.close()
+
+    unfinished_slices = [
+        slice_id for slice_id in range(num_slices) if not checkpoints["slices"].get(str(slice_id), {}).get("finished")
+    ]
+    if num_slices == 1:
+        for slice_id in unfinished_slices:
+            _process_slice(slice_id)
+    else:
+        with ThreadPoolExecutor(max_workers=num_slices) as executor:
+            # list() to re-raise exceptions of the slices
+            list(executor.map(_process_slice, unfinished_slices))
+
+    if stop_event.is_set():
+        # checkpoints are kept to resume the next run
+        task.add_log(f"Stopped by user")
+        task.status = GenerationTask.TaskStatus.FINISHED
+        task.save(update_fields=["status"])
+        return
     logging.warning(f"Done")
     task.add_log(f"Done")
     task.status = GenerationTask.TaskStatus.FINISHED
-    task.save(update_fields=["status"])
+    task.slice_checkpoints = {}
+    task.save(update_fields=["status", "slice_checkpoints"])
 
 
 def generate_missing_values_for_given_elements(
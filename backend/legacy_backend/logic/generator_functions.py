@@ -24,7 +24,8 @@ GPU_IS_AVAILABLE = os.getenv("GPU_IS_AVAILABLE", "False") == "True"
 def get_generator_function_from_field(
     field: DotDict, always_return_single_value_per_item: bool = False, mode: Literal["ingest", "search"] = "ingest"
 ) -> Callable:
-    parameters = field.generator.default_parameters or {}
+    # copy, to not change the default parameters in the dataset dict (it might be cached):
+    parameters = dict(field.generator.default_parameters or {})
     if field.generator_parameters:
         parameters.update(field.generator_parameters)
     module = field.generator.module
@@ -1,7 +1,15 @@
+import datetime
 import logging
+import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import partial
+from typing import Callable
 from uuid import uuid4
 
+from diskcache import Cache
+
 from data_map_backend.models import SearchTask
 from data_map_backend.utils import DotDict, pk_to_uuid_id
 from legacy_backend.database_client.django_client import get_dataset
@@ -15,19 +23,131 @@ from legacy_backend.logic.extract_pipeline import get_pipeline_steps
 from legacy_backend.utils.field_types import FieldType
 from search.logic.notify_about_new_items import notify_about_new_items
 
-
-def update_database_layout(dataset_id: int):
+# the writes to the vector DB (one per vector field) and to the text search engine are done in parallel:
+MAX_PARALLEL_INDEX_WRITES = int(os.getenv("MAX_PARALLEL_INDEX_WRITES", 8))
+# insert_vectors() splits its batch into parts to fetch the filter payloads of the next part during the upsert:
+INSERT_VECTORS_PIPELINE_BATCH_SIZE = int(os.getenv("INSERT_VECTORS_PIPELINE_BATCH_SIZE", 128))
+
+# status of the latest database layout update per dataset, stored on disk as the status can be requested
+# from a different worker process than the one running the update:
+database_layout_update_tasks = Cache("/data/quiddity_data/database_layout_update_tasks/")
+DATABASE_LAYOUT_UPDATE_STATUS_TTL_SECONDS = 7 * 24 * 60 * 60
+
+
+class IndexWriteError(Exception):
+    """Raised when writing a batch of items to one or more of the databases failed.
+
+    All writes are attempted (and finished) before this is raised, failed_writes maps the name of each failed write
+    (e.g. 'vector field embedding' or 'text search engine') to its exception. The writes are upserts, so the whole
+    batch can simply be inserted again.
+    """
+
+    def __init__(self, failed_writes: dict[str, Exception]):
+        self.failed_writes = failed_writes
+        super().__init__(f"Writing items failed for: {', '.join(failed_writes.keys())}")
+
+
+def run_index_writes_in_parallel(writes: list[tuple[str, Callable]]):
+    if len(writes) <= 1:
+        for _, write in writes:
+            write()
+        return
+    failed_writes = {}
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_INDEX_WRITES) as executor:
+        futures = [(name, executor.submit(write)) for name, write in writes]
+        for name, future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                logging.error(f"Error while writing items ({name}): {e}", exc_info=True)
+                failed_writes[name] = e
+    if failed_writes:
+        raise IndexWriteError(failed_writes)
+
+
+def update_database_layout(dataset_id: int, blocking: bool = True) -> dict:
+    """Creates missing collections and indexes for the dataset and applies changed parameters.
+
+    Only the difference to the existing layout is applied, the vector fields and the text search index are updated
+    in parallel. If not blocking, this runs in a background thread and the progress can be checked
+    using get_database_layout_update_status(). Returns the status of the update task."""
     dataset = get_dataset(dataset_id)
     vector_db_client = VectorSearchEngineClient.get_instance()
+    search_engine_client = TextSearchEngineClient.get_instance()
     index_settings = get_index_settings(dataset)
+    steps: list[tuple[str, Callable]] = []
     for field in index_settings.all_vector_fields:
         if not dataset.schema.object_fields[field].is_available_for_search:
             continue
-        vector_db_client.ensure_dataset_field_exists(
-            dataset, field, update_params=True, delete_if_params_changed=False
+        steps.append(
+            (
+                f"vector field {field}",
+                partial(
+                    vector_db_client.ensure_dataset_field_exists,
+                    dataset,
+                    field,
+                    update_params=True,
+                    delete_if_params_changed=False,
+                ),
+            )
         )
-    search_engine_client = TextSearchEngineClient.get_instance()
-    search_engine_client.ensure_dataset_exists(dataset)
+    steps.append(("text search engine", partial(search_engine_client.ensure_dataset_exists, dataset)))
+
+    task = {
+        "task_id": str(uuid4()),
+        "started_at": datetime.datetime.now().isoformat(),
+        "finished_at": None,
+        "is_running": True,
+        "status": "started",
+        "progress": 0.0,
+        "finished_steps": [],
+        "failed_steps": {},
+    }
+    _store_database_layout_update_status(dataset_id, task, is_new_task=True)
+
+    def run():
+        with ThreadPoolExecutor(max_workers=MAX_PARALLEL_INDEX_WRITES) as executor:
+            futures = {executor.submit(step): name for name, step in steps}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    future.result()
+                    task["finished_steps"].append(name)
+                except Exception as e:
+                    logging.error(f"Error while updating database layout ({name}): {e}", exc_info=True)
+                    task["failed_steps"][name] = repr(e)
+                task["progress"] = (len(task["finished_steps"]) + len(task["failed_steps"])) / len(steps)
+                task["status"] = f"updated {name}"
+                _store_database_layout_update_status(dataset_id, task)
+        task["is_running"] = False
+        task["finished_at"] = datetime.datetime.now().isoformat()
+        task["status"] = "failed" if task["failed_steps"] else "finished"
+        _store_database_layout_update_status(dataset_id, task)
+
+    if blocking:
+        run()
+        if task["failed_steps"]:
+            raise ValueError(f"Updating the database layout failed for: {', '.join(task['failed_steps'].keys())}")
+    else:
+        threading.Thread(target=run).start()
+    return task
+
+
+def _store_database_layout_update_status(dataset_id: int, task: dict, is_new_task: bool = False):
+    try:
+        with database_layout_update_tasks.transact():
+            stored_task = database_layout_update_tasks.get(dataset_id)
+            if not is_new_task and stored_task and stored_task["task_id"] != task["task_id"]:
+                # a newer update of this dataset was started in the meantime (possibly in another process)
+                return
+            database_layout_update_tasks.set(dataset_id, task, expire=DATABASE_LAYOUT_UPDATE_STATUS_TTL_SECONDS)
+    except Exception as e:
+        # the status is only informational, the update itself should continue
+        logging.error(f"Error while storing database layout update status: {e}", exc_info=True)
+
+
+def get_database_layout_update_status(dataset_id: int) -> dict:
+    return database_layout_update_tasks.get(dataset_id) or {}  # type: ignore
 
 
 def insert_many(dataset_id: int, elements: list[dict], skip_generators: bool = False) -> list[tuple]:
@@ -131,9 +251,11 @@ def insert_many(dataset_id: int, elements: list[dict], skip_generators: bool = F
     index_settings = get_index_settings(dataset)
 
     vector_db_client = VectorSearchEngineClient.get_instance()
+    search_engine_client = TextSearchEngineClient.get_instance()
 
-    # first store all vectors in vector DB, so that we can then delete them from the elements
-    # and pass the rest to OpenSearch:
+    # the vectors of each vector field are stored in the vector DB, the rest of the item in the text search engine,
+    # all of these writes are independent and done in parallel:
+    index_writes = []
     for vector_field in index_settings.all_vector_fields:
         ids = []
         vectors = []
@@ -153,16 +275,44 @@ def insert_many(dataset_id: int, elements: list[dict], skip_generators: bool = F
             payloads.append(filtering_attributes)
 
         if vectors:
-            vector_db_client.upsert_items(dataset.actual_database_name, vector_field, ids, payloads, vectors)
+            index_writes.append(
+                (
+                    f"vector field {vector_field}",
+                    partial(
+                        vector_db_client.upsert_items,
+                        dataset.actual_database_name,
+                        vector_field,
+                        ids,
+                        payloads,
+                        vectors,
+                    ),
+                )
+            )
+
+    text_search_elements = [
+        {key: value for key, value in element.items() if key not in index_settings.all_vector_fields}
+        for element in elements
+    ]
+    index_writes.append(
+        (
+            "text search engine",
+            partial(
+                search_engine_client.upsert_items,
+                dataset.actual_database_name,
+                [item["_id"] for item in text_search_elements],
+                text_search_elements,
+            ),
+        )
+    )
+
+    # if any write fails, an IndexWriteError is raised after all writes are done and no periodic searches are run
+    run_index_writes_in_parallel(index_writes)
 
     for element in elements:
         for vector_field in index_settings.all_vector_fields:
             if vector_field in element:
                 del element[vector_field]
 
-    search_engine_client = TextSearchEngineClient.get_instance()
-    search_engine_client.upsert_items(dataset.actual_database_name, [item["_id"] for item in elements], elements)
-
     # apply search tasks on new items:
     item_ids = [item["_id"] for item in elements]
     if not skip_generators and elements:
@@ -204,26 +354,57 @@ def insert_vectors(
     item_pks: list[str],
     vectors: list[list[float]],
     excluded_filter_fields: list[str] = [],
+    payloads: list[dict] | None = None,
 ):
     """Allows to insert vectors for items that are already in the database.
-    The caller needs to take care of the best batch size itself."""
+    The caller needs to take care of the best batch size itself.
+
+    The filter payloads are fetched from the text search engine unless the caller provides them
+    (one dict with the filtering fields per item, other fields are removed)."""
+    if payloads is not None and len(payloads) != len(item_pks):
+        raise ValueError(f"Got {len(payloads)} payloads for {len(item_pks)} items")
     dataset = get_dataset(dataset_id)
     # this assumes that the item_pks are not the item._id ids and still need to be converted:
     item_ids = [pk_to_uuid_id(item_pk) for item_pk in item_pks]
 
+    vector_db_client = VectorSearchEngineClient.get_instance()
     index_settings = get_index_settings(dataset)
+    filter_fields = index_settings.vector_filtering_fields - set(excluded_filter_fields)
+
+    if payloads is not None:
+        # same fields as if they were fetched from the text search engine:
+        payloads = [{key: value for key, value in payload.items() if key in filter_fields} for payload in payloads]
+        vector_db_client.upsert_items(dataset.actual_database_name, vector_field, item_ids, payloads, vectors)
+        return
 
     text_storage_client = TextSearchEngineClient.get_instance()
-    filter_fields = index_settings.vector_filtering_fields - set(excluded_filter_fields)
-    filtering_data = text_storage_client.get_items_by_ids(dataset, item_ids, filter_fields)
-    # takes 450ms for 512 items
-    for filtering_data_item in filtering_data:
-        filtering_data_item.pop("_id")
-        filtering_data_item.pop("_dataset_id")
 
-    vector_db_client = VectorSearchEngineClient.get_instance()
-    vector_db_client.upsert_items(dataset.actual_database_name, vector_field, item_ids, filtering_data, vectors)
-    # takes 120ms for 512 items (the other operations are negligible)
+    def get_filtering_data(ids: list[str]) -> list[dict]:
+        # takes 450ms for 512 items
+        filtering_data = text_storage_client.get_items_by_ids(dataset, ids, filter_fields)
+        for filtering_data_item in filtering_data:
+            filtering_data_item.pop("_id")
+            filtering_data_item.pop("_dataset_id")
+        return filtering_data
+
+    # pipelined: the filtering data of the next part is fetched while the current part is upserted
+    # (the upsert takes 120ms for 512 items, the other operations are negligible)
+    batch_size = INSERT_VECTORS_PIPELINE_BATCH_SIZE
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        next_filtering_data = executor.submit(get_filtering_data, item_ids[:batch_size])
+        for i in range(0, len(item_ids), batch_size):
+            filtering_data = next_filtering_data.result()
+            if i + batch_size < len(item_ids):
+                next_filtering_data = executor.submit(
+                    get_filtering_data, item_ids[i + batch_size : i + 2 * batch_size]
+                )
+            vector_db_client.upsert_items(
+                dataset.actual_database_name,
+                vector_field,
+                item_ids[i : i + batch_size],
+                filtering_data,
+                vectors[i : i + batch_size],
+            )
 
 
 def get_index_settings(dataset: DotDict):
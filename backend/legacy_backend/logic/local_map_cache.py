@@ -1,9 +1,166 @@
 import json
+import logging
+import os
+import pickle
+import threading
+import time
 from collections import OrderedDict, defaultdict
 from hashlib import md5
 
+from diskcache import Cache
+
+# memory budget for finished maps, maps that are still being generated are always kept in memory
+LOCAL_MAPS_MAX_MEMORY_BYTES = int(os.getenv("LOCAL_MAPS_MAX_MEMORY_BYTES", 2 * 1024 * 1024 * 1024))
+# finished maps that weren't accessed for this time are moved from memory to disk:
+LOCAL_MAPS_MEMORY_TTL_SECONDS = int(os.getenv("LOCAL_MAPS_MEMORY_TTL_SECONDS", 60 * 60))
+LOCAL_MAPS_DISK_TTL_SECONDS = int(os.getenv("LOCAL_MAPS_DISK_TTL_SECONDS", 60 * 60 * 24 * 7))
+LOCAL_MAPS_DISK_MAX_BYTES = int(os.getenv("LOCAL_MAPS_DISK_MAX_BYTES", 20 * 1024 * 1024 * 1024))
+LOCAL_MAPS_SPILL_DIR = "/data/quiddity_data/map_cache/"
+
+
+class LocalMapStore(object):
+    """Dict-like storage for map data that moves finished maps to disk when they are not used or memory is low.
+
+    Maps are only spilled once they are finished, as the map generation thread still writes into in-progress maps.
+    Spilled maps are loaded back into memory transparently when they are accessed again.
+    """
+
+    def __init__(self, max_memory_bytes: int, memory_ttl: float, spill_dir: str, disk_ttl: float, max_disk_bytes: int):
+        self.max_memory_bytes = max_memory_bytes
+        self.memory_ttl = memory_ttl
+        self.disk_ttl = disk_ttl
+        self._spill_dir = spill_dir
+        self._max_disk_bytes = max_disk_bytes
+        self._disk_cache: Cache | None = None  # created lazily to not touch the disk at import time
+        self._maps: dict[str, dict] = {}
+        # pickled size of finished maps, used as an estimate of their memory usage:
+        self._sizes: dict[str, int] = {}
+        # maps that were removed from memory but are still being written to disk:
+        self._spilling: dict[str, dict] = {}
+        # only protects the dicts above, pickling and disk access happen outside of the lock:
+        self._lock = threading.RLock()
+
+    @property
+    def disk_cache(self) -> Cache:
+        if self._disk_cache is None:
+            self._disk_cache = Cache(
+                self._spill_dir, size_limit=self._max_disk_bytes, eviction_policy="least-recently-used"
+            )
+        return self._disk_cache
+
+    def __contains__(self, map_id: str) -> bool:
+        with self._lock:
+            if map_id in self._maps or map_id in self._spilling:
+                return True
+        return map_id in self.disk_cache
+
+    def __getitem__(self, map_id: str) -> dict:
+        map_data = self.get(map_id)
+        if map_data is None:
+            raise KeyError(map_id)
+        return map_data
+
+    def __setitem__(self, map_id: str, map_data: dict):
+        with self._lock:
+            self._maps[map_id] = map_data
+            self._sizes.pop(map_id, None)
+            self._spilling.pop(map_id, None)
+        self.disk_cache.delete(map_id)
+
+    def get(self, map_id: str, default=None) -> dict | None:
+        with self._lock:
+            if map_id in self._maps:
+                return self._maps[map_id]
+            if map_id in self._spilling:
+                # accessed again while being written to disk
+                map_data = self._spilling[map_id]
+                self._maps[map_id] = map_data
+                return map_data
+        try:
+            map_data = self.disk_cache.get(map_id)
+            if isinstance(map_data, bytes):
+                map_data = pickle.loads(map_data)
+        except Exception as e:
+            logging.error(f"Error while loading map {map_id} from disk: {e}", exc_info=True)
+            self.disk_cache.delete(map_id)
+            map_data = None
+        if map_data is None:
+            return default
+        with self._lock:
+            if map_id in self._maps:
+                # loaded or replaced by another thread in the meantime
+                return self._maps[map_id]
+            map_data["last_accessed"] = time.time()
+            self._maps[map_id] = map_data
+            return map_data
+
+    def clear(self):
+        with self._lock:
+            self._maps.clear()
+            self._sizes.clear()
+            self._spilling.clear()
+        self.disk_cache.clear()
+
+    def memory_usage(self) -> int:
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def evict(self):
+        # spills maps to disk that weren't accessed for a while or when the memory budget is exceeded
+        with self._lock:
+            finished_maps = {map_id: map_data for map_id, map_data in self._maps.items() if map_data.get("finished")}
+            sizes = {map_id: self._sizes[map_id] for map_id in finished_maps if map_id in self._sizes}
+
+        # the maps are pickled once to get their size, the result is kept for the maps that are spilled now:
+        pickled_maps: dict[str, bytes] = {}
+        for map_id, map_data in finished_maps.items():
+            if map_id not in sizes:
+                pickled_maps[map_id] = pickle.dumps(map_data, protocol=pickle.HIGHEST_PROTOCOL)
+                sizes[map_id] = len(pickled_maps[map_id])
+
+        # least recently used first:
+        finished_map_ids = sorted(finished_maps, key=lambda map_id: finished_maps[map_id].get("last_accessed") or 0)
+        now = time.time()
+        memory_usage = sum(sizes.values())
+        spilled_map_ids = []
+        with self._lock:
+            for map_id in finished_map_ids:
+                if self._maps.get(map_id) is not finished_maps[map_id]:
+                    # replaced or removed in the meantime
+                    continue
+                last_accessed = finished_maps[map_id].get("last_accessed") or 0
+                if memory_usage > self.max_memory_bytes or now - last_accessed >= self.memory_ttl:
+                    self._spilling[map_id] = self._maps.pop(map_id)
+                    self._sizes.pop(map_id, None)
+                    spilled_map_ids.append(map_id)
+                    memory_usage -= sizes[map_id]
+                else:
+                    self._sizes[map_id] = sizes[map_id]
+
+        for map_id in spilled_map_ids:
+            self._spill(map_id, finished_maps[map_id], pickled_maps.get(map_id))
+
+    def _spill(self, map_id: str, map_data: dict, pickled_map: bytes | None):
+        try:
+            if pickled_map is None:
+                pickled_map = pickle.dumps(map_data, protocol=pickle.HIGHEST_PROTOCOL)
+            self.disk_cache.set(map_id, pickled_map, expire=self.disk_ttl)
+        except Exception as e:
+            # the map is lost in this case, but it can be generated again
+            logging.error(f"Error while moving map {map_id} to disk: {e}", exc_info=True)
+        with self._lock:
+            if self._spilling.get(map_id) is map_data:
+                del self._spilling[map_id]
+
+
 # global temp storage:
-local_maps = {}
+local_maps = LocalMapStore(
+    LOCAL_MAPS_MAX_MEMORY_BYTES,
+    LOCAL_MAPS_MEMORY_TTL_SECONDS,
+    LOCAL_MAPS_SPILL_DIR,
+    LOCAL_MAPS_DISK_TTL_SECONDS,
+    LOCAL_MAPS_DISK_MAX_BYTES,
+)
 
 vectorize_stage_hash_to_map_id = defaultdict(list)
 
@@ -19,6 +176,15 @@ def clear_local_map_cache():
     projection_stage_hash_to_map_id.clear()
 
 
+def remove_expired_map_ids_from_stage_hashes():
+    # maps removed from memory and disk can't be reused anymore
+    for stage_hash_to_map_id in [vectorize_stage_hash_to_map_id, projection_stage_hash_to_map_id]:
+        for stage_hash, map_ids in list(stage_hash_to_map_id.items()):
+            map_ids[:] = [map_id for map_id in map_ids if map_id in local_maps]
+            if not map_ids:
+                del stage_hash_to_map_id[stage_hash]
+
+
 def get_map_parameters_hash(parameters: dict) -> str:
     parameters_hash = md5(json.dumps(parameters).encode()).hexdigest()
     return parameters_hash
@@ -33,6 +33,7 @@ from legacy_backend.logic.local_map_cache import (
     get_vectorize_stage_hash,
     local_maps,
     projection_stage_hash_to_map_id,
+    remove_expired_map_ids_from_stage_hashes,
     vectorize_stage_hash_to_map_id,
 )
 from legacy_backend.logic.search import (
@@ -98,6 +99,7 @@ def get_or_create_map(params, ignore_cache: bool) -> str:
     map_id: str = get_map_parameters_hash(params)
 
     if map_id not in local_maps or ignore_cache:
+        local_maps.evict()
         map_data = deepcopy(default_map_data)
         map_data["last_accessed"] = time.time()
         map_data["parameters"] = params
@@ -260,6 +262,8 @@ def generate_map(map_id: str, ignore_cache: bool):
     # adding this map to the partial map caches:
     vectorize_stage_hash_to_map_id[vectorize_stage_params_hash].append(map_id)
     projection_stage_hash_to_map_id[projection_stage_params_hash].append(map_id)
+    remove_expired_map_ids_from_stage_hashes()
+    local_maps.evict()
 
 
 def find_similar_map(vectorize_stage_params_hash: str, projection_stage_params_hash: str) -> dict | None:
@@ -790,8 +794,9 @@ def get_map_selection_statistics(map_id: str, selected_ids: list[tuple[int, str]
 
 
 def get_map_results(map_id) -> dict | None:
+    # finished maps that weren't accessed for a while are moved to disk by local_maps.evict()
+    # and are loaded back from there transparently
     result = local_maps[map_id]
     result["last_accessed"] = time.time()
-    # TODO: go through local_maps every hour and delete that ones that weren't been accessed in the last hour
 
     return result
@@ -0,0 +1,97 @@
+import logging
+import os
+import threading
+import unicodedata
+from typing import Callable
+
+import cachetools
+import numpy as np
+
+# memory budget for all cached query vectors together (a 768d float64 vector takes about 6KB)
+QUERY_EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("QUERY_EMBEDDING_CACHE_MAX_BYTES", 64 * 1024 * 1024))
+
+
+def normalize_query_text(text: str) -> str:
+    # whitespace and unicode composition don't change the meaning of a query, but case might, so it is kept
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+class QueryEmbeddingCache(object):
+    """Process-wide LRU cache for query embeddings, keyed by generator identity and normalized query text."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._cache = cachetools.LRUCache(maxsize=max_bytes, getsizeof=lambda vector: vector.nbytes)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_embeddings(self, generator_key: tuple, texts: list[str], generator_function: Callable) -> list | None:
+        # the normalized text is only used for the cache key, the generator gets the original text
+        # (models might be sensitive to case or whitespace)
+        normalized_texts = [normalize_query_text(text) for text in texts]
+        vectors: list[np.ndarray | None] = []
+        with self._lock:
+            for text in normalized_texts:
+                vectors.append(self._cache.get((generator_key, text)))
+        # normalized text -> first original text with this normalization:
+        missing_texts: dict[str, str] = {}
+        for text, normalized_text, vector in zip(texts, normalized_texts, vectors):
+            if vector is None and normalized_text not in missing_texts:
+                missing_texts[normalized_text] = text
+        with self._lock:
+            self.misses += len(missing_texts)
+            self.hits += len(texts) - len(missing_texts)
+
+        if missing_texts:
+            embeddings = generator_function([[text] for text in missing_texts.values()])
+            if embeddings is None or len(embeddings) != len(missing_texts):
+                # generator failed, don't cache anything and return the result as it would be without the cache
+                return embeddings
+            new_vectors = {
+                normalized_text: np.array(embedding) for normalized_text, embedding in zip(missing_texts, embeddings)
+            }
+            with self._lock:
+                for normalized_text, vector in new_vectors.items():
+                    try:
+                        self._cache[(generator_key, normalized_text)] = vector
+                    except ValueError:
+                        # vector is larger than the whole cache
+                        pass
+            vectors = [
+                new_vectors[text] if vector is None else vector for text, vector in zip(normalized_texts, vectors)
+            ]
+
+        # returning lists (like the generators do) so that callers can't modify the cached arrays
+        return [vector.tolist() for vector in vectors]  # type: ignore
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._cache),
+                "size_bytes": self._cache.currsize,
+                "max_bytes": self.max_bytes,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+
+query_embedding_cache = QueryEmbeddingCache(QUERY_EMBEDDING_CACHE_MAX_BYTES)
+
+
+def get_cached_query_generator(generator_key: tuple, generator_function: Callable) -> Callable:
+    # wraps a generator function of the form generator(batch, log_error) -> list[vector]
+    # for query batches (one text source per item, e.g. [["query"]]), other batches bypass the cache
+    def cached_generator(batch, log_error=logging.warning):
+        if not all(len(source_fields) == 1 and isinstance(source_fields[0], str) for source_fields in batch):
+            return generator_function(batch, log_error)
+        texts = [source_fields[0] for source_fields in batch]
+        return query_embedding_cache.get_embeddings(
+            generator_key, texts, lambda text_batch: generator_function(text_batch, log_error)
+        )
+
+    return cached_generator
@@ -2,9 +2,14 @@ import copy
 import itertools
 import json
 import logging
+import os
+import time
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
 
 import numpy as np
+from django.db import connection
 
 from data_map_backend.utils import DotDict
 from data_map_backend.views.other_views import get_serialized_dataset_cached
@@ -48,6 +53,13 @@ from legacy_backend.utils.collect_timings import Timings
 from legacy_backend.utils.field_types import FieldType
 from legacy_backend.utils.source_plugin_types import SourcePlugin
 
+# upper limit of concurrent vector / keyword queries for a single search request (shared by all its datasets)
+MAX_PARALLEL_SEARCH_LEGS = int(os.getenv("MAX_PARALLEL_SEARCH_LEGS", 8))
+# upper limit of datasets that are searched at the same time for a single search request
+MAX_PARALLEL_DATASET_SEARCHES = int(os.getenv("MAX_PARALLEL_DATASET_SEARCHES", 5))
+# -> a search request runs at most max(MAX_PARALLEL_SEARCH_LEGS, MAX_PARALLEL_DATASET_SEARCHES) queries at the same
+# time, using at most MAX_PARALLEL_DATASET_SEARCHES + MAX_PARALLEL_SEARCH_LEGS worker threads
+
 
 # @lru_cache()
 def get_search_results(params_str: str, purpose: str, timings: Timings | None = None) -> dict:
@@ -60,105 +72,14 @@ def get_search_results(params_str: str, purpose: str, timings: Timings | None =
     all_items_by_dataset = {}
     all_score_info = {}
     total_matches_sum = 0
+    similar_item_info = None
     if params.search.search_type == "similar_to_item":
         similar_item_info = _get_item_for_similarity_search(params.search)
 
-    for dataset_id in params.search.dataset_ids:
-        dataset = DotDict(get_serialized_dataset_cached(dataset_id))
-        score_info = {}
-        total_matches = 0
-
-        check_filters(dataset, params.search.filters, params.search.retrieval_mode)
-
-        if dataset.source_plugin == SourcePlugin.BING_WEB_API and params.search.search_type == "external_input":
-            query = params.search.all_field_query
-            limit = (
-                params.search.result_list_items_per_page
-                if purpose == "list"
-                else params.search.max_items_used_for_mapping
-            )
-            limit = min(limit, dataset.source_plugin_parameters.get("max_results") or 300, 300)
-            offset = params.search.result_list_current_page * limit if purpose == "list" else 0
-            sorted_ids, full_items, total_matches = bing_web_search_formatted(
-                dataset.id,
-                query,
-                limit=limit,
-                offset=offset,
-                website_filter=dataset.source_plugin_parameters.get("website_filter"),
-            )
-            sorted_id_sets.append([(dataset_id, item_id) for item_id in sorted_ids])
-            all_items_by_dataset[dataset_id] = full_items
-            pipeline_steps, required_fields, _ = get_pipeline_steps(dataset, only_fields=["favicon_url"])
-            generate_missing_values_for_given_elements(pipeline_steps, list(full_items.values()))
-            continue
-
-        if (
-            dataset.source_plugin == SourcePlugin.SEMANTIC_SCHOLAR_API
-            and params.search.search_type == "external_input"
-        ):
-            query = params.search.all_field_query
-            limit = (
-                params.search.result_list_items_per_page
-                if purpose == "list"
-                else params.search.max_items_used_for_mapping
-            )
-            required_fields = get_required_fields(dataset, params.vectorize, purpose)
-            sorted_ids, full_items = semantic_scholar_search_formatted(dataset.id, query, required_fields, limit=limit)
-            sorted_id_sets.append([(dataset_id, item_id) for item_id in sorted_ids])
-            all_items_by_dataset[dataset_id] = full_items
-            continue
-
-        if dataset.source_plugin == SourcePlugin.KLEINANZEIGEN and params.search.search_type == "external_input":
-            query = params.search.all_field_query
-            limit = (
-                params.search.result_list_items_per_page
-                if purpose == "list"
-                else params.search.max_items_used_for_mapping
-            )
-            offset = params.search.result_list_current_page * limit if purpose == "list" else 0
-            sorted_ids, full_items = get_kleinanzeigen_results(dataset.id, query, limit=limit, offset=offset)
-            sorted_id_sets.append([(dataset_id, item_id) for item_id in sorted_ids])
-            all_items_by_dataset[dataset_id] = full_items
-            continue
-
-        if params.search.search_type == "external_input":
-            if params.search.use_separate_queries:
-                sorted_ids, full_items = get_search_results_using_separate_queries(
-                    dataset, params.search, params.vectorize, purpose, timings
-                )
-            else:
-                sorted_ids, full_items, score_info, total_matches = get_search_results_using_combined_query(
-                    dataset, params.search, params.vectorize, purpose, timings
-                )
-        elif params.search.search_type == "cluster":
-            sorted_ids, full_items = get_search_results_for_cluster(
-                dataset, params.search, params.vectorize, purpose, timings
-            )
-        elif params.search.search_type == "map_subset":
-            sorted_ids, full_items = get_search_results_for_map_subset(
-                dataset, params.search, params.vectorize, purpose, timings
-            )
-        elif params.search.search_type == "collection":
-            sorted_ids, full_items = get_search_results_included_in_collection(
-                dataset, params.search, params.vectorize, purpose, timings
-            )
-        elif params.search.search_type == "recommended_for_collection":
-            sorted_ids, full_items, score_info = get_search_results_matching_a_collection(
-                dataset, params.search, params.vectorize, purpose, timings
-            )
-        elif params.search.search_type == "similar_to_item":
-            assert isinstance(similar_item_info, tuple)
-            sorted_ids, full_items, score_info = get_search_results_similar_to_item(
-                dataset, params.search, params.vectorize, purpose, timings, similar_item_info
-            )
-        elif params.search.search_type == "random_sample":
-            sorted_ids, full_items, score_info, total_matches = get_search_results_for_global_map(
-                dataset, params.search, params.vectorize, purpose, timings
-            )
-        else:
-            logging.error("Unsupported search type: " + params.search.search_type)
-            sorted_ids = []
-            full_items = {}
+    dataset_results = search_datasets_in_parallel(params, purpose, timings, similar_item_info)
+    for dataset_id, (sorted_ids, full_items, score_info, total_matches) in zip(
+        params.search.dataset_ids, dataset_results
+    ):
         sorted_id_sets.append([(dataset_id, item_id) for item_id in sorted_ids])
         all_items_by_dataset[dataset_id] = full_items
         all_score_info.update(score_info)
@@ -180,8 +101,141 @@ def get_search_results(params_str: str, purpose: str, timings: Timings | None =
     return result
 
 
+def search_datasets_in_parallel(
+    params: DotDict, purpose: str, timings: Timings, similar_item_info: tuple | None
+) -> list[tuple[list, dict, dict, int]]:
+    dataset_ids = params.search.dataset_ids
+    if len(dataset_ids) <= 1:
+        return [
+            _get_search_results_for_dataset(dataset_id, params, purpose, timings, similar_item_info)
+            for dataset_id in dataset_ids
+        ]
+
+    max_workers = min(len(dataset_ids), MAX_PARALLEL_DATASET_SEARCHES)
+    # the datasets share the leg budget of the request instead of each starting MAX_PARALLEL_SEARCH_LEGS threads
+    # (with a share of one, the legs of a dataset run one after another in its worker thread):
+    max_parallel_legs = max(1, MAX_PARALLEL_SEARCH_LEGS // max_workers)
+
+    def search_dataset(dataset_id: int):
+        # each dataset gets its own timings, as the sequential steps of the datasets overlap
+        try:
+            dataset_timings = Timings()
+            results = _get_search_results_for_dataset(
+                dataset_id, params, purpose, dataset_timings, similar_item_info, max_parallel_legs
+            )
+            return results, dataset_timings
+        finally:
+            # the Django DB connection of this worker thread isn't closed automatically
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # results are in the order of the dataset ids, not in the order of completion
+        results_and_timings = list(executor.map(search_dataset, dataset_ids))
+    for dataset_id, (_, dataset_timings) in zip(dataset_ids, results_and_timings):
+        timings.add_sub_timings(f"dataset {dataset_id}", dataset_timings)
+    timings.log(f"searching {len(dataset_ids)} datasets in parallel")
+    return [results for results, _ in results_and_timings]
+
+
+def _get_search_results_for_dataset(
+    dataset_id: int,
+    params: DotDict,
+    purpose: str,
+    timings: Timings,
+    similar_item_info: tuple | None,
+    max_parallel_legs: int = MAX_PARALLEL_SEARCH_LEGS,
+) -> tuple[list, dict, dict, int]:
+    dataset = DotDict(get_serialized_dataset_cached(dataset_id))
+    score_info = {}
+    total_matches = 0
+
+    check_filters(dataset, params.search.filters, params.search.retrieval_mode)
+
+    if dataset.source_plugin == SourcePlugin.BING_WEB_API and params.search.search_type == "external_input":
+        query = params.search.all_field_query
+        limit = (
+            params.search.result_list_items_per_page if purpose == "list" else params.search.max_items_used_for_mapping
+        )
+        limit = min(limit, dataset.source_plugin_parameters.get("max_results") or 300, 300)
+        offset = params.search.result_list_current_page * limit if purpose == "list" else 0
+        sorted_ids, full_items, total_matches = bing_web_search_formatted(
+            dataset.id,
+            query,
+            limit=limit,
+            offset=offset,
+            website_filter=dataset.source_plugin_parameters.get("website_filter"),
+        )
+        pipeline_steps, required_fields, _ = get_pipeline_steps(dataset, only_fields=["favicon_url"])
+        generate_missing_values_for_given_elements(pipeline_steps, list(full_items.values()))
+        # total matches of web search results are not included in the total count
+        return sorted_ids, full_items, score_info, 0
+
+    if dataset.source_plugin == SourcePlugin.SEMANTIC_SCHOLAR_API and params.search.search_type == "external_input":
+        query = params.search.all_field_query
+        limit = (
+            params.search.result_list_items_per_page if purpose == "list" else params.search.max_items_used_for_mapping
+        )
+        required_fields = get_required_fields(dataset, params.vectorize, purpose)
+        sorted_ids, full_items = semantic_scholar_search_formatted(dataset.id, query, required_fields, limit=limit)
+        return sorted_ids, full_items, score_info, total_matches
+
+    if dataset.source_plugin == SourcePlugin.KLEINANZEIGEN and params.search.search_type == "external_input":
+        query = params.search.all_field_query
+        limit = (
+            params.search.result_list_items_per_page if purpose == "list" else params.search.max_items_used_for_mapping
+        )
+        offset = params.search.result_list_current_page * limit if purpose == "list" else 0
+        sorted_ids, full_items = get_kleinanzeigen_results(dataset.id, query, limit=limit, offset=offset)
+        return sorted_ids, full_items, score_info, total_matches
+
+    if params.search.search_type == "external_input":
+        if params.search.use_separate_queries:
+            sorted_ids, full_items = get_search_results_using_separate_queries(
+                dataset, params.search, params.vectorize, purpose, timings
+            )
+        else:
+            sorted_ids, full_items, score_info, total_matches = get_search_results_using_combined_query(
+                dataset, params.search, params.vectorize, purpose, timings, max_parallel_legs
+            )
+    elif params.search.search_type == "cluster":
+        sorted_ids, full_items = get_search_results_for_cluster(
+            dataset, params.search, params.vectorize, purpose, timings
+        )
+    elif params.search.search_type == "map_subset":
+        sorted_ids, full_items = get_search_results_for_map_subset(
+            dataset, params.search, params.vectorize, purpose, timings
+        )
+    elif params.search.search_type == "collection":
+        sorted_ids, full_items = get_search_results_included_in_collection(
+            dataset, params.search, params.vectorize, purpose, timings
+        )
+    elif params.search.search_type == "recommended_for_collection":
+        sorted_ids, full_items, score_info = get_search_results_matching_a_collection(
+            dataset, params.search, params.vectorize, purpose, timings
+        )
+    elif params.search.search_type == "similar_to_item":
+        assert isinstance(similar_item_info, tuple)
+        sorted_ids, full_items, score_info = get_search_results_similar_to_item(
+            dataset, params.search, params.vectorize, purpose, timings, similar_item_info
+        )
+    elif params.search.search_type == "random_sample":
+        sorted_ids, full_items, score_info, total_matches = get_search_results_for_global_map(
+            dataset, params.search, params.vectorize, purpose, timings
+        )
+    else:
+        logging.error("Unsupported search type: " + params.search.search_type)
+        sorted_ids = []
+        full_items = {}
+    return sorted_ids, full_items, score_info, total_matches
+
+
 def get_search_results_using_combined_query(
-    dataset, search_settings: DotDict, vectorize_settings: DotDict, purpose: str, timings: Timings
+    dataset,
+    search_settings: DotDict,
+    vectorize_settings: DotDict,
+    purpose: str,
+    timings: Timings,
+    max_parallel_legs: int = MAX_PARALLEL_SEARCH_LEGS,
 ) -> tuple[list, dict, dict, int]:
     raw_query = search_settings.all_field_query
     negative_query = search_settings.all_field_query_negative
@@ -214,8 +268,8 @@ def get_search_results_using_combined_query(
     )
     if not (filters or queries):
         raise ValueError("No search queries or filters provided")
-    actual_total_matches = 0
-    result_sets: list[dict] = []
+    # each query and field combination is an independent retrieval leg, they are run concurrently below
+    search_legs: list[tuple[str, Callable[[], tuple[dict, int]]]] = []
     for query in queries:
         text_fields = []
         for field in dataset.schema.object_fields.values():
@@ -226,43 +280,53 @@ def get_search_results_using_combined_query(
                     field, input_is_image=bool(query.positive_image_url or query.negative_image_url)
                 )
                 score_threshold = score_threshold if search_settings.use_similarity_thresholds else None
-                results = get_vector_search_results(
+
+                def vector_leg(query=query, field=field, score_threshold=score_threshold) -> tuple[dict, int]:
+                    results = get_vector_search_results(
+                        dataset,
+                        field.identifier,
+                        query,
+                        search_settings.vector,
+                        filters,
+                        required_fields=[],
+                        internal_input_weight=search_settings.internal_input_weight,
+                        limit=limit,
+                        page=page,
+                        score_threshold=score_threshold,
+                        max_sub_items=search_settings.max_sub_items_per_item,
+                    )
+                    return results, len(results)
+
+                search_legs.append((f"vector database query ({field.identifier})", vector_leg))
+            elif search_settings.retrieval_mode in ["keyword", "hybrid"] and field.field_type == FieldType.TEXT:
+                text_fields.append(field.identifier)
+            else:
+                continue
+        if text_fields:
+
+            def keyword_leg(query=query, text_fields=text_fields) -> tuple[dict, int]:
+                return get_fulltext_search_results(
                     dataset,
-                    field.identifier,
+                    text_fields,
                     query,
-                    search_settings.vector,
                     filters,
-                    required_fields=[],
-                    internal_input_weight=search_settings.internal_input_weight,
+                    required_fields=["_id"],
                     limit=limit,
                     page=page,
-                    score_threshold=score_threshold,
-                    max_sub_items=search_settings.max_sub_items_per_item,
+                    # maps only need the ids (and vectors) of the items, highlights would require a second query
+                    # for the top items as maps use more than MAX_ITEMS_TO_HIGHLIGHT items:
+                    return_highlights=search_settings.return_highlights and purpose == "list",
+                    use_bolding_in_highlights=search_settings.use_bolding_in_highlights,
+                    auto_relax_query=search_settings.auto_relax_query,
+                    ranking_settings=search_settings.ranking_settings,
                 )
-                result_sets.append(results)
-                actual_total_matches = max(actual_total_matches, len(results))
-                timings.log("vector database query")
-            elif search_settings.retrieval_mode in ["keyword", "hybrid"] and field.field_type == FieldType.TEXT:
-                text_fields.append(field.identifier)
-            else:
-                continue
-        if text_fields:
-            results, total_matches = get_fulltext_search_results(
-                dataset,
-                text_fields,
-                query,
-                filters,
-                required_fields=["_id"],
-                limit=limit,
-                page=page,
-                return_highlights=search_settings.return_highlights,
-                use_bolding_in_highlights=search_settings.use_bolding_in_highlights,
-                auto_relax_query=search_settings.auto_relax_query,
-                ranking_settings=search_settings.ranking_settings,
-            )
-            result_sets.append(results)
-            actual_total_matches = max(actual_total_matches, total_matches)
-            timings.log("keyword database query")
+
+            search_legs.append(("keyword database query", keyword_leg))
+
+    leg_results = run_search_legs_in_parallel(search_legs, timings, max_parallel_legs)
+    # results are in the order of the legs (not of completion), so that rank fusion stays deterministic
+    result_sets: list[dict] = [results for results, _ in leg_results]
+    actual_total_matches = max([total_matches for _, total_matches in leg_results], default=0)
 
     # TODO: boost fulltext search the more words with low document frequency appear in query?
 
@@ -272,6 +336,33 @@ def get_search_results_using_combined_query(
     )
 
 
+def run_search_legs_in_parallel(
+    search_legs: list[tuple[str, Callable]], timings: Timings, max_parallel_legs: int = MAX_PARALLEL_SEARCH_LEGS
+) -> list:
+    if len(search_legs) <= 1 or max_parallel_legs <= 1:
+        results = []
+        for description, leg in search_legs:
+            results.append(leg())
+            timings.log(description)
+        return results
+
+    def run_leg(leg: Callable):
+        try:
+            t1 = time.time()
+            return leg(), time.time() - t1
+        finally:
+            # the Django DB connection of this worker thread isn't closed automatically
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=min(len(search_legs), max_parallel_legs)) as executor:
+        futures = [executor.submit(run_leg, leg) for _, leg in search_legs]
+        results_and_durations = [future.result() for future in futures]
+    for (description, _), (_, duration) in zip(search_legs, results_and_durations):
+        timings.log_duration(f"{description} [parallel]", duration)
+    timings.log(f"{len(search_legs)} parallel database queries")
+    return [results for results, _ in results_and_durations]
+
+
 def get_search_results_using_separate_queries(
     dataset, search_settings: DotDict, vectorize_settings: DotDict, purpose: str, timings: Timings
 ) -> tuple[list, dict]:
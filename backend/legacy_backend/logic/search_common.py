@@ -2,12 +2,14 @@ import copy
 import json
 import logging
 import math
+import os
 from functools import lru_cache
 from typing import Iterable, Literal
 
 import cachetools.func
 import numpy as np
 
+from data_map_backend.dataset_cache import LocalVersionedCache, get_all_datasets_version
 from data_map_backend.models import Generator
 from data_map_backend.utils import DotDict, pk_to_uuid_id
 from data_map_backend.views.other_views import get_serialized_dataset_cached
@@ -26,11 +28,16 @@ from legacy_backend.logic.generator_functions import (
     get_generator_function_from_field,
 )
 from legacy_backend.logic.postprocess_search_results import enrich_search_results
+from legacy_backend.logic.query_embedding_cache import get_cached_query_generator
 from legacy_backend.utils.collect_timings import Timings
 from legacy_backend.utils.field_types import FieldType
 from legacy_backend.utils.helpers import normalize_array
 from legacy_backend.utils.source_plugin_types import SourcePlugin
 
+# highlights are expensive (about 360ms instead of 60ms for 2k items), for larger result sets (e.g. maps) only the
+# top items get highlights, using a second query restricted to them:
+MAX_ITEMS_TO_HIGHLIGHT = int(os.getenv("MAX_ITEMS_TO_HIGHLIGHT", 100))
+
 
 class QueryInput(object):
     def __init__(
@@ -65,7 +72,7 @@ def combine_and_sort_result_sets(
     timings: Timings,
 ) -> tuple[list, dict, dict]:
     score_info = get_score_curves_and_cut_sets(result_sets, search_settings, dataset)
-    total_items = combine_result_sets_and_calculate_scores(result_sets, timings)
+    total_items = combine_result_sets_and_calculate_scores(result_sets, timings, limit)
     sorted_ids, full_items = sort_items_and_complete_them(dataset, total_items, required_fields, limit, timings)
     return sorted_ids, full_items, score_info
 
@@ -75,18 +82,21 @@ def get_score_curves_and_cut_sets(result_sets: list[dict], search_settings: DotD
     for result_set in result_sets:
         if not result_set:
             continue
-        sorted_items = sorted(result_set.values(), key=lambda item: item["_origins"][0]["score"], reverse=True)
-        example_origin = sorted_items[0]["_origins"][0]
-        scores = [item["_origins"][0]["score"] for item in sorted_items]
-        normalized_scores = normalize_array(np.array(scores)).tolist()
-        cutoff_index = len(sorted_items)  # no cutoff by default
+        items = list(result_set.values())
+        scores_unsorted = np.fromiter((item["_origins"][0]["score"] for item in items), dtype=float, count=len(items))
+        # stable sort, so that items with the same score stay in the original order (like sorted(reverse=True)):
+        order = np.argsort(-scores_unsorted, kind="stable")
+        scores = scores_unsorted[order]
+        example_origin = items[order[0]]["_origins"][0]
+        normalized_scores = normalize_array(scores).tolist()
+        cutoff_index = len(items)  # no cutoff by default
         title = f"{example_origin['type']}, {example_origin['field']}, {example_origin['query']}"
         positive_examples = []
         negative_examples = []
         reason = "no cutoff"
         if search_settings.use_autocut:
             useful_items_info = get_number_of_useful_items(
-                scores,
+                scores,  # type: ignore
                 search_settings.autocut_min_results,
                 search_settings.autocut_strategy,
                 search_settings.autocut_min_score,
@@ -94,25 +104,25 @@ def get_score_curves_and_cut_sets(result_sets: list[dict], search_settings: DotD
             )
             cutoff_index = useful_items_info["count"]
             reason = useful_items_info["reason"]
-            if cutoff_index != len(sorted_items):
+            if cutoff_index != len(items):
                 # TODO: there might be a better way to remove the cut items from the dictionary
                 # result_set.clear()
                 # for item in sorted_items[:cutoff_index]:
                 #     result_set[item['_id']] = item
                 positive_examples = [
-                    sorted_items[max(0, cutoff_index - 5)]["_id"],
-                    sorted_items[max(0, cutoff_index - 2)]["_id"],
+                    items[order[max(0, cutoff_index - 5)]]["_id"],
+                    items[order[max(0, cutoff_index - 2)]]["_id"],
                 ]
                 negative_examples = [
-                    sorted_items[min(len(sorted_items) - 1, cutoff_index + 5)]["_id"],
-                    sorted_items[min(len(sorted_items) - 1, cutoff_index + 2)]["_id"],
+                    items[order[min(len(items) - 1, cutoff_index + 5)]]["_id"],
+                    items[order[min(len(items) - 1, cutoff_index + 2)]]["_id"],
                 ]
         score_info[title] = {
             "scores": normalized_scores,
             "cutoff_index": cutoff_index,
             "reason": reason,
-            "max_score": max(scores),
-            "min_score": min(scores),
+            "max_score": float(scores[0]),
+            "min_score": float(scores[-1]),
             "positive_examples": positive_examples,
             "negative_examples": negative_examples,
         }
@@ -163,29 +173,73 @@ def get_score_curves_and_cut_sets(result_sets: list[dict], search_settings: DotD
     return score_info
 
 
-def combine_result_sets_and_calculate_scores(result_sets: list[dict], timings: Timings):
-    total_items = result_sets[0] if result_sets else {}
-    for result_set in result_sets[1:]:
-        for item in result_set.values():
-            if item["_id"] not in total_items:
-                total_items[item["_id"]] = item
-            else:
-                total_items[item["_id"]]["_origins"] += item["_origins"]
-                if "_relevant_parts" in item:
-                    if "_relevant_parts" not in total_items[item["_id"]]:
-                        total_items[item["_id"]]["_relevant_parts"] = []
-                    total_items[item["_id"]]["_relevant_parts"] += item["_relevant_parts"]
-
-    for item in total_items.values():
-        item["_reciprocal_rank_score"] = sum([1.0 / origin["rank"] for origin in item["_origins"]])
-
-    if len(result_sets) > 1:
-        for item in total_items.values():
-            item["_score"] = math.sqrt(item["_reciprocal_rank_score"])  # making the score scale linear again
+def combine_result_sets_and_calculate_scores(result_sets: list[dict], timings: Timings, limit: int | None = None):
+    """Merges the result sets of the search legs and calculates the reciprocal rank fusion scores.
+
+    If limit is given, only the items with the highest scores are merged and returned (in order of their score)."""
+    if not result_sets:
+        return {}
+    # each item gets a position in the score array (in the order of first appearance),
+    # the scores are then summed up per position using numpy
+    id_to_position: dict[str, int] = {}
+    all_positions = []
+    all_ranks = []
+    for result_set in result_sets:
+        positions = np.fromiter(
+            (id_to_position.setdefault(item_id, len(id_to_position)) for item_id in result_set),
+            dtype=np.int64,
+            count=len(result_set),
+        )
+        origin_counts = np.fromiter(
+            (len(item["_origins"]) for item in result_set.values()), dtype=np.int64, count=len(result_set)
+        )
+        all_positions.append(np.repeat(positions, origin_counts))
+        all_ranks.append(
+            np.fromiter(
+                (origin["rank"] for item in result_set.values() for origin in item["_origins"]),
+                dtype=float,
+                count=int(origin_counts.sum()),
+            )
+        )
+    reciprocal_rank_scores = np.zeros(len(id_to_position))
+    # np.add.at adds the values one after another in their original order (unlike e.g. np.bincount),
+    # so that the scores are exactly the same as with sum() over the origins of each item:
+    np.add.at(reciprocal_rank_scores, np.concatenate(all_positions), 1.0 / np.concatenate(all_ranks))
+    item_ids = list(id_to_position.keys())
+
+    if limit is None:
+        selected_positions = range(len(item_ids))
     else:
-        for item in total_items.values():
-            item["_score"] = item["_origins"][0]["score"]
+        # stable sort, so that items with the same score stay in the order of first appearance:
+        selected_positions = np.argsort(-reciprocal_rank_scores, kind="stable")[:limit].tolist()
     timings.log("rank fusion")
+
+    # merging the items only for the selected positions:
+    total_items = {}
+    for position in selected_positions:
+        item_id = item_ids[position]
+        item = None
+        for result_set in result_sets:
+            other_item = result_set.get(item_id)
+            if other_item is None:
+                continue
+            if item is None:
+                item = other_item
+                continue
+            item["_origins"] += other_item["_origins"]
+            if "_relevant_parts" in other_item:
+                if "_relevant_parts" not in item:
+                    item["_relevant_parts"] = []
+                item["_relevant_parts"] += other_item["_relevant_parts"]
+        assert item is not None
+        reciprocal_rank_score = float(reciprocal_rank_scores[position])
+        item["_reciprocal_rank_score"] = reciprocal_rank_score
+        if len(result_sets) > 1:
+            item["_score"] = math.sqrt(reciprocal_rank_score)  # making the score scale linear again
+        else:
+            item["_score"] = item["_origins"][0]["score"]
+        total_items[item_id] = item
+    timings.log("merging items")
     return total_items
 
 
@@ -193,10 +247,15 @@ def sort_items_and_complete_them(
     dataset: DotDict, total_items: dict, required_fields: list[str], limit: int, timings: Timings
 ) -> tuple[list[str], dict[str, dict]]:
     # TODO: check how much faster it is to get partial results from search engines and only fill in missing fields
-    sorted_ids = sorted(total_items.keys(), key=lambda id: total_items[id]["_reciprocal_rank_score"], reverse=True)
-    for id_to_remove in sorted_ids[limit:]:
-        del total_items[id_to_remove]
-    sorted_ids = sorted_ids[:limit]
+    item_ids = list(total_items.keys())
+    reciprocal_rank_scores = np.fromiter(
+        (item["_reciprocal_rank_score"] for item in total_items.values()), dtype=float, count=len(item_ids)
+    )
+    # stable sort, so that items with the same score stay in the original order (like sorted(reverse=True)):
+    order = np.argsort(-reciprocal_rank_scores, kind="stable").tolist()
+    for index in order[limit:]:
+        del total_items[item_ids[index]]
+    sorted_ids = [item_ids[index] for index in order[:limit]]
     # adding reciprocal rank scores to the items to be able to compare it in the UI with reranked results:
     for rank, item_id in enumerate(sorted_ids):
         item = total_items[item_id]
@@ -292,6 +351,8 @@ def get_fulltext_search_results(
                 ]
 
     text_db_client = TextSearchEngineClient.get_instance()
+    highlight_in_search = return_highlights and limit <= MAX_ITEMS_TO_HIGHLIGHT
+    default_operator = "and"
     search_result, total_matches = text_db_client.get_search_results(
         dataset,
         text_fields,
@@ -301,12 +362,13 @@ def get_fulltext_search_results(
         page,
         limit,
         required_fields,
-        highlights=return_highlights,
+        highlights=highlight_in_search,
         use_bolding_in_highlights=use_bolding_in_highlights,
         sort_settings=sort_settings,
         boost_function=boost_function,
     )
     if auto_relax_query and total_matches == 0:
+        default_operator = "or"
         search_result, total_matches = text_db_client.get_search_results(
             dataset,
             text_fields,
@@ -316,12 +378,31 @@ def get_fulltext_search_results(
             page,
             limit,
             required_fields,
-            highlights=return_highlights,
+            highlights=highlight_in_search,
             use_bolding_in_highlights=use_bolding_in_highlights,
-            default_operator="or",
+            default_operator=default_operator,
             sort_settings=sort_settings,
             boost_function=boost_function,
         )
+    if return_highlights and not highlight_in_search and search_result and query.positive_query_str:
+        top_item_ids = [item["_id"] for item in search_result[:MAX_ITEMS_TO_HIGHLIGHT]]
+        highlight_results, _ = text_db_client.get_search_results(
+            dataset,
+            text_fields,
+            [*(filters or []), {"field": "_id", "value": top_item_ids, "operator": "in"}],
+            query.positive_query_str,
+            "",
+            0,
+            len(top_item_ids),
+            ["_id"],
+            highlights=True,
+            use_bolding_in_highlights=use_bolding_in_highlights,
+            default_operator=default_operator,
+        )
+        highlights_by_id = {item["_id"]: item.get("highlight", {}) for item in highlight_results}
+        for item in search_result:
+            if item["_id"] in highlights_by_id:
+                item["highlight"] = highlights_by_id[item["_id"]]
     items = {}
     # TODO: required_fields is not implemented properly, the actual item data would be in item["_source"] and needs to be copied
     ignored_keyword_highlight_fields = dataset.merged_advanced_options.ignored_keyword_highlight_fields or []
@@ -352,22 +433,36 @@ def get_fulltext_search_results(
     return items, total_matches
 
 
-def get_suitable_generator(dataset, vector_field: str, mode: Literal["ingest", "search"] = "ingest"):
-    generators = Generator.objects.all()
-    field = dataset.schema.object_fields[vector_field]
-    embedding_space_identifier = (
-        field.generator.embedding_space.identifier if field.generator else field.embedding_space.identifier
-    )
+# text generator per embedding space, invalidated when generators or embedding spaces are changed:
+_text_generator_cache = LocalVersionedCache()
 
-    # for text query:
+
+def get_text_generator_for_embedding_space(embedding_space_identifier: str) -> Generator | None:
+    version = get_all_datasets_version()
+    cached = _text_generator_cache.get(embedding_space_identifier, version)
+    if cached is not None:
+        return cached[0]
     suitable_generator = None
-    for generator in generators:
+    for generator in Generator.objects.select_related("embedding_space").all():
         if (
             generator.embedding_space
             and generator.embedding_space.identifier == embedding_space_identifier
             and generator.input_type == FieldType.TEXT
         ):
             suitable_generator = generator
+    # wrapped in a tuple to also cache that there is no suitable generator:
+    _text_generator_cache.set(embedding_space_identifier, version, (suitable_generator,))
+    return suitable_generator
+
+
+def get_suitable_generator(dataset, vector_field: str, mode: Literal["ingest", "search"] = "ingest"):
+    field = dataset.schema.object_fields[vector_field]
+    embedding_space_identifier = (
+        field.generator.embedding_space.identifier if field.generator else field.embedding_space.identifier
+    )
+
+    # for text query:
+    suitable_generator = get_text_generator_for_embedding_space(embedding_space_identifier)
 
     if not suitable_generator:
         return None
@@ -380,10 +475,20 @@ def get_suitable_generator(dataset, vector_field: str, mode: Literal["ingest", "
         generator_function = get_generator_function_from_field(
             dataset.schema.object_fields[vector_field], always_return_single_value_per_item=True, mode=mode
         )
+        parameters = {**(field.generator.default_parameters or {}), **(field.generator_parameters or {})}
+        generator_key = (embedding_space_identifier, field.generator.module, json.dumps(parameters, sort_keys=True))
     else:
         generator_function = get_generator_function(
             suitable_generator.module, suitable_generator.default_parameters or {}, False, mode=mode
         )
+        generator_key = (
+            embedding_space_identifier,
+            suitable_generator.module,
+            json.dumps(suitable_generator.default_parameters or {}, sort_keys=True),
+        )
+    if mode == "search":
+        # the same query is often embedded again for other datasets, pages, OR-parts and map refreshes
+        return get_cached_query_generator((*generator_key, mode), generator_function)
     return generator_function
 
 
@@ -585,49 +690,121 @@ def get_relevant_parts_of_item_using_query_vector(
     source_texts: list[str] | None = None,
     oversample_for_reranking: int = 3,
 ) -> dict:
+    return get_relevant_parts_of_items_using_query_vector(
+        dataset,
+        [item_id],
+        vector_field,
+        query_vector,
+        score_threshold,
+        limit,
+        min_results,
+        rerank,
+        query,
+        {item_id: source_texts} if source_texts is not None else None,
+        oversample_for_reranking,
+    )[item_id]
+
+
+def get_relevant_parts_of_items_using_query_vector(
+    dataset: DotDict,
+    item_ids: list[str],
+    vector_field: str,
+    query_vector: list,
+    score_threshold: float | None = None,
+    limit: int = 5,
+    min_results: int = 2,
+    rerank: bool = False,
+    query: str | None = None,
+    source_texts_per_item: dict[str, list[str]] | None = None,
+    oversample_for_reranking: int = 3,
+) -> dict[str, dict]:
+    """Returns the best parts of the array field (e.g. full text chunks) for each item, using one batch search.
+
+    The result maps each item id to an item with '_origins' and '_relevant_parts'."""
     vector_db_client = VectorSearchEngineClient.get_instance()
     num_results = limit + oversample_for_reranking if rerank else limit
-    if source_texts and len(source_texts) == 1:
-        vector_search_results = [DotDict({"score": 1.0, "payload": {"array_index": 0}})]
-    else:
-        vector_search_results = vector_db_client.get_best_sub_items(
-            dataset.actual_database_name,
-            vector_field,
-            item_id,
-            query_vector,
-            score_threshold,
-            num_results,
-            min_results,
-        )
-    if rerank and query and source_texts and len(vector_search_results) > 1:
-        texts = [source_texts[item.payload["array_index"]] for item in vector_search_results]
-        reranking = get_reranking_results(query, tuple(texts), limit)
-        vector_search_results = [vector_search_results[rerank_result.index] for rerank_result in reranking.results]
-    if len(vector_search_results) == 0:
-        logging.warning(
-            f"No relevant parts found for item {item_id} using vector search, this should not happen if the item is expected to have full text chunks"
-        )
-    score = max(*(item.score for item in vector_search_results), 0.0) if len(vector_search_results) > 0 else 0.0
-    item = {
-        "_id": item_id,
-        "_dataset_id": dataset.id,
-        "_origins": [{"type": "vector", "field": vector_field, "query": "unknown", "score": score, "rank": 1}],
+    source_texts_per_item = source_texts_per_item or {}
+    # items with only one part don't need to be searched:
+    ids_to_search = [item_id for item_id in item_ids if len(source_texts_per_item.get(item_id) or []) != 1]
+    vector_search_results_per_item = {
+        item_id: [DotDict({"score": 1.0, "payload": {"array_index": 0}})]
+        for item_id in item_ids
+        if item_id not in ids_to_search
     }
+    if ids_to_search:
+        vector_search_results_per_item.update(
+            vector_db_client.get_best_sub_items_of_many_parents(
+                dataset.actual_database_name,
+                vector_field,
+                ids_to_search,
+                query_vector,
+                score_threshold,
+                num_results,
+                min_results,
+            )
+        )
     array_source_field = (
         dataset.schema.object_fields[vector_field].source_fields[0]
         if dataset.schema.object_fields[vector_field].source_fields
         else None
     )
-    item["_relevant_parts"] = [
-        {
-            "origin": "vector_array",
-            "field": array_source_field,
-            "index": item.payload["array_index"],
-            "score": item.score,
+
+    items = {}
+    for item_id in item_ids:
+        vector_search_results = vector_search_results_per_item.get(item_id, [])
+        source_texts = source_texts_per_item.get(item_id)
+        if rerank and query and source_texts and len(vector_search_results) > 1:
+            texts = [source_texts[item.payload["array_index"]] for item in vector_search_results]
+            reranking = get_reranking_results(query, tuple(texts), limit)
+            vector_search_results = [vector_search_results[rerank_result.index] for rerank_result in reranking.results]
+        if len(vector_search_results) == 0:
+            logging.warning(
+                f"No relevant parts found for item {item_id} using vector search, this should not happen if the item is expected to have full text chunks"
+            )
+        score = max(*(item.score for item in vector_search_results), 0.0) if len(vector_search_results) > 0 else 0.0
+        item = {
+            "_id": item_id,
+            "_dataset_id": dataset.id,
+            "_origins": [{"type": "vector", "field": vector_field, "query": "unknown", "score": score, "rank": 1}],
         }
-        for item in vector_search_results
-    ]
-    return item
+        item["_relevant_parts"] = [
+            {
+                "origin": "vector_array",
+                "field": array_source_field,
+                "index": item.payload["array_index"],
+                "score": item.score,
+            }
+            for item in vector_search_results
+        ]
+        items[item_id] = item
+    return items
+
+
+def get_relevant_full_text_chunks(
+    dataset: DotDict, chunks_per_item: dict[str, list], query: str, limit: int
+) -> dict[str, list[dict]]:
+    """Returns the relevant parts of the full text chunks of each item for the query (reranked).
+
+    The dataset needs to have the 'full_text_chunk_embeddings' advanced option. The query vector is generated once
+    and the chunks of all items are searched in one batch."""
+    chunk_vector_field_name = dataset.merged_advanced_options.get("full_text_chunk_embeddings")
+    chunk_vector_field = DotDict(dataset.schema.object_fields.get(chunk_vector_field_name))
+    generator_function = get_suitable_generator(dataset, chunk_vector_field_name, mode="search")
+    assert generator_function is not None
+    query_vector = generator_function([[query]])[0]
+    score_threshold = get_field_similarity_threshold(chunk_vector_field, input_is_image=False)
+    items = get_relevant_parts_of_items_using_query_vector(
+        dataset,
+        list(chunks_per_item.keys()),
+        chunk_vector_field_name,
+        query_vector,
+        score_threshold,
+        limit,
+        rerank=True,
+        query=query,
+        source_texts_per_item=chunks_per_item,
+    )
+    return {item_id: item.get("_relevant_parts", []) for item_id, item in items.items()}
 
 
 def _field_is_available_for_filtering(field: DotDict, retrieval_mode: str):
@@ -885,22 +1062,10 @@ def get_document_details_by_id(
         )
 
     if get_new_full_text_chunks:
-        generator_function = get_suitable_generator(dataset, chunk_vector_field_name, mode="search")
-        assert generator_function is not None and isinstance(top_n_full_text_chunks, int)
-        query_vector = generator_function([[query]])[0]
-        score_threshold = get_field_similarity_threshold(chunk_vector_field, input_is_image=False)
-        chunks = item.get(chunk_field, [])
-        new_relevant_parts = get_relevant_parts_of_item_using_query_vector(
-            dataset,
-            item_id,
-            chunk_vector_field_name,
-            query_vector,
-            score_threshold,
-            top_n_full_text_chunks,
-            rerank=True,
-            query=query,
-            source_texts=chunks,
-        ).get("_relevant_parts", [])
+        assert query is not None and isinstance(top_n_full_text_chunks, int)
+        new_relevant_parts = get_relevant_full_text_chunks(
+            dataset, {item_id: item.get(chunk_field, [])}, query, top_n_full_text_chunks
+        )[item_id]
         for i in range(len(relevant_parts_list) - 1, -1, -1):
             if relevant_parts_list[i].get("field") == chunk_field:
                 del relevant_parts_list[i]
@@ -0,0 +1,85 @@
+"""
+Run with "python3 -m legacy_backend.test.benchmark_qdrant_transport" from the backend folder
+
+Compares upsert and search throughput of the Qdrant REST and gRPC transports using a temporary collection.
+"""
+
+import os
+import time
+import uuid
+
+import django
+import numpy as np
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project_base.settings")
+django.setup()
+
+from qdrant_client.http import models  # noqa: E402
+
+from legacy_backend.database_client.vector_search_engine_client import (  # noqa: E402
+    VectorSearchEngineClient,
+)
+
+VECTOR_FIELD = "embedding"
+DIMENSIONS = 1024
+NUM_POINTS = 20_000
+BATCH_SIZE = 1024  # same as for sub items in VectorSearchEngineClient.upsert_items()
+SEARCH_LIMIT = 5000  # typical map size
+NUM_SEARCHES = 10
+
+
+def benchmark_transport(transport: str, vectors: np.ndarray, query_vectors: np.ndarray):
+    client, actual_transport = VectorSearchEngineClient.create_qdrant_client(transport)
+    if actual_transport != transport:
+        print(f"{transport}: not available, skipping")
+        return
+    collection_name = f"benchmark_transport_{transport}_{uuid.uuid4().hex[:8]}"
+    client.create_collection(
+        collection_name=collection_name,
+        vectors_config={VECTOR_FIELD: models.VectorParams(size=DIMENSIONS, distance=models.Distance.COSINE)},
+    )
+    try:
+        ids = [str(uuid.uuid4()) for _ in range(len(vectors))]
+        payloads = [{"index": i} for i in range(len(vectors))]
+        t1 = time.perf_counter()
+        for i in range(0, len(vectors), BATCH_SIZE):
+            client.upsert(
+                collection_name=collection_name,
+                points=models.Batch(
+                    ids=ids[i : i + BATCH_SIZE],
+                    payloads=payloads[i : i + BATCH_SIZE],
+                    vectors={VECTOR_FIELD: vectors[i : i + BATCH_SIZE].tolist()},
+                ),
+            )
+        upsert_duration = time.perf_counter() - t1
+
+        t1 = time.perf_counter()
+        for query_vector in query_vectors:
+            client.search(
+                collection_name=collection_name,
+                query_vector=models.NamedVector(name=VECTOR_FIELD, vector=query_vector.tolist()),
+                with_payload=False,
+                with_vectors=False,
+                limit=SEARCH_LIMIT,
+            )
+        search_duration = time.perf_counter() - t1
+
+        print(
+            f"{transport}: upsert {len(vectors) / upsert_duration:.0f} points/s, "
+            f"search {len(query_vectors) / search_duration:.1f} queries/s (limit {SEARCH_LIMIT})"
+        )
+    finally:
+        client.delete_collection(collection_name)
+        client.close()
+
+
+def main():
+    rng = np.random.default_rng(42)
+    vectors = rng.random((NUM_POINTS, DIMENSIONS), dtype=np.float32)
+    query_vectors = rng.random((NUM_SEARCHES, DIMENSIONS), dtype=np.float32)
+    for transport in ["rest", "grpc"]:
+        benchmark_transport(transport, vectors, query_vectors)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Run with "python3 -m legacy_backend.test.benchmark_rank_fusion" from the backend folder
+
+Compares the rank fusion in search_common with the previous pure-Python implementation
+on synthetic result sets, checks that the rankings, scores and merged origins are identical
+and that the new implementation is faster.
+"""
+
+import gc
+import math
+import os
+import random
+import time
+
+import django
+import numpy as np
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project_base.settings")
+django.setup()
+
+from legacy_backend.logic.search_common import (  # noqa: E402
+    combine_result_sets_and_calculate_scores,
+)
+from legacy_backend.utils.collect_timings import Timings  # noqa: E402
+
+NUM_LEGS = 4
+ITEMS_PER_LEG = 10_000
+ID_SPACE = 25_000  # legs overlap partially
+LIMIT = 1000
+
+
+def generate_result_sets(seed: int = 42) -> list[dict]:
+    rng = random.Random(seed)
+    result_sets = []
+    for leg in range(NUM_LEGS):
+        ids = rng.sample(range(ID_SPACE), ITEMS_PER_LEG)
+        # rounded scores to get ties, like the ones returned by the search engines:
+        scores = sorted((round(rng.random(), 2) for _ in ids), reverse=True)
+        result_set = {}
+        for rank, (item_id, score) in enumerate(zip(ids, scores)):
+            result_set[str(item_id)] = {
+                "_id": str(item_id),
+                "_origins": [
+                    {"type": "vector", "field": f"leg_{leg}", "query": "q", "score": score, "rank": rank + 1}
+                ],
+            }
+        result_sets.append(result_set)
+    return result_sets
+
+
+def reference_rank_fusion(result_sets: list[dict], limit: int) -> tuple[list[str], dict]:
+    total_items = result_sets[0] if result_sets else {}
+    for result_set in result_sets[1:]:
+        for item in result_set.values():
+            if item["_id"] not in total_items:
+                total_items[item["_id"]] = item
+            else:
+                total_items[item["_id"]]["_origins"] += item["_origins"]
+    for item in total_items.values():
+        item["_reciprocal_rank_score"] = sum([1.0 / origin["rank"] for origin in item["_origins"]])
+    for item in total_items.values():
+        item["_score"] = math.sqrt(item["_reciprocal_rank_score"])
+    sorted_ids = sorted(total_items.keys(), key=lambda id: total_items[id]["_reciprocal_rank_score"], reverse=True)
+    return sorted_ids[:limit], total_items
+
+
+def vectorized_rank_fusion(result_sets: list[dict], limit: int) -> tuple[list[str], dict]:
+    # same as the first part of sort_items_and_complete_them(), without fetching the item data
+    total_items = combine_result_sets_and_calculate_scores(result_sets, Timings(), limit)
+    item_ids = list(total_items.keys())
+    scores = np.fromiter((item["_reciprocal_rank_score"] for item in total_items.values()), dtype=float)
+    order = np.argsort(-scores, kind="stable").tolist()
+    return [item_ids[index] for index in order[:limit]], total_items
+
+
+def benchmark(function, repetitions: int = 15) -> tuple[float, tuple]:
+    durations = []
+    result = None
+    for _ in range(repetitions):
+        result_sets = generate_result_sets()
+        gc.disable()  # the many small dicts otherwise trigger garbage collections at random points
+        t1 = time.perf_counter()
+        result = function(result_sets, LIMIT)
+        durations.append(time.perf_counter() - t1)
+        gc.enable()
+    return min(durations), result  # type: ignore
+
+
+def main():
+    reference_duration, (reference_ids, reference_items) = benchmark(reference_rank_fusion)
+    duration, (ids, items) = benchmark(vectorized_rank_fusion)
+
+    assert ids == reference_ids, "ranking differs"
+    for item_id in ids:
+        assert items[item_id]["_reciprocal_rank_score"] == reference_items[item_id]["_reciprocal_rank_score"]
+        assert items[item_id]["_score"] == reference_items[item_id]["_score"]
+        assert items[item_id]["_origins"] == reference_items[item_id]["_origins"]
+
+    print(f"{NUM_LEGS} legs with {ITEMS_PER_LEG} items each, {len(reference_items)} unique items")
+    print(f"reference:  {reference_duration * 1000:.1f} ms")
+    print(f"vectorized: {duration * 1000:.1f} ms")
+    print("rankings, scores and origins are identical")
+    assert duration < reference_duration, "vectorized rank fusion is not faster than the reference"
+
+
+if __name__ == "__main__":
+    main()
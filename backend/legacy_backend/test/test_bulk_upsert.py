@@ -0,0 +1,102 @@
+"""
+Run with "python3 -m unittest legacy_backend.test.test_bulk_upsert" from the backend folder
+"""
+
+import json
+import os
+import threading
+import unittest
+from unittest import mock
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project_base.settings")
+django.setup()
+
+from legacy_backend.database_client import text_search_engine_client  # noqa: E402
+from legacy_backend.database_client.text_search_engine_client import (  # noqa: E402
+    BulkUpsertError,
+    TextSearchEngineClient,
+)
+
+
+class FakeOpenSearch(object):
+    def __init__(self, failing_ids: set[str] | None = None, failing_requests: set[int] | None = None):
+        self.failing_ids = failing_ids or set()
+        self.failing_requests = failing_requests or set()  # numbers of bulk requests that raise an exception
+        self.sent_ids: list[str] = []
+        self._lock = threading.Lock()
+        self._num_requests = 0
+
+    def bulk(self, body: bytes) -> dict:
+        lines = [json.loads(line) for line in body.decode().splitlines()]
+        ids = [line["update"]["_id"] for line in lines[::2]]
+        with self._lock:
+            request_number = self._num_requests
+            self._num_requests += 1
+            self.sent_ids += ids
+        if request_number in self.failing_requests:
+            raise ConnectionError("connection lost")
+        items = [
+            (
+                {"update": {"_id": _id, "error": {"type": "mapper_parsing_exception"}}}
+                if _id in self.failing_ids
+                else {"update": {"_id": _id, "result": "created"}}
+            )
+            for _id in ids
+        ]
+        return {"errors": any("error" in item["update"] for item in items), "items": items}
+
+
+def create_items(count: int) -> tuple[list[str], list[dict]]:
+    ids = [f"item_{i}" for i in range(count)]
+    return ids, [{"_id": _id, "title": f"Title {_id}"} for _id in ids]
+
+
+class BulkUpsertTest(unittest.TestCase):
+    def setUp(self):
+        patches = [
+            mock.patch.object(text_search_engine_client, "BULK_MAX_ITEMS", 2),
+            # one request at a time, so that the order of the requests is deterministic:
+            mock.patch.object(text_search_engine_client, "BULK_MAX_IN_FLIGHT", 1),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def create_client(self, opensearch: FakeOpenSearch) -> TextSearchEngineClient:
+        with mock.patch.object(text_search_engine_client, "OpenSearch", return_value=opensearch):
+            return TextSearchEngineClient()
+
+    def test_all_items_are_sent_in_batches(self):
+        opensearch = FakeOpenSearch()
+        ids, payloads = create_items(5)
+        self.create_client(opensearch).upsert_items("index", ids, payloads)
+        self.assertEqual(opensearch.sent_ids, ids)
+
+    def test_failed_items_are_reported(self):
+        opensearch = FakeOpenSearch(failing_ids={"item_4"})
+        ids, payloads = create_items(5)
+        with self.assertRaises(BulkUpsertError) as context:
+            self.create_client(opensearch).upsert_items("index", ids, payloads)
+        self.assertEqual(len(context.exception.failed_batches), 1)
+        self.assertEqual(context.exception.failed_batches[0]["batch"], 2)
+        self.assertEqual(context.exception.failed_batches[0]["ids"], ["item_4"])
+        self.assertEqual(context.exception.unsent_ids, [])
+
+    def test_unsent_items_are_reported_after_failed_request(self):
+        opensearch = FakeOpenSearch(failing_requests={1})
+        ids, payloads = create_items(9)
+        with self.assertRaises(BulkUpsertError) as context:
+            self.create_client(opensearch).upsert_items("index", ids, payloads)
+        error = context.exception
+        self.assertEqual([failure["batch"] for failure in error.failed_batches], [1])
+        self.assertEqual(error.failed_batches[0]["ids"], ["item_2", "item_3"])
+        # the request with item 0 and 1 succeeded, all other items are either failed or unsent:
+        failed_ids = [_id for failure in error.failed_batches for _id in failure["ids"]]
+        self.assertEqual(failed_ids + error.unsent_ids, ids[2:])
+        self.assertEqual(opensearch.sent_ids, ids[: len(ids) - len(error.unsent_ids)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+"""
+Run with "python3 -m unittest legacy_backend.test.test_database_layout_update" from the backend folder
+"""
+
+import os
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import django
+from diskcache import Cache
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project_base.settings")
+django.setup()
+
+from data_map_backend.utils import DotDict  # noqa: E402
+from legacy_backend.logic import insert_logic  # noqa: E402
+from legacy_backend.utils.field_types import FieldType  # noqa: E402
+
+DATASET = DotDict(
+    {
+        "schema": {
+            "object_fields": {
+                "embedding": {
+                    "identifier": "embedding",
+                    "field_type": FieldType.VECTOR,
+                    "is_available_for_search": True,
+                    "is_available_for_filtering": False,
+                },
+            },
+        },
+    }
+)
+
+
+class DatabaseLayoutUpdateTest(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.vector_db_client = mock.Mock()
+        self.search_engine_client = mock.Mock()
+        patches = [
+            mock.patch.object(insert_logic, "database_layout_update_tasks", Cache(self.cache_dir.name)),
+            mock.patch.object(insert_logic, "get_dataset", return_value=DATASET),
+            mock.patch.object(
+                insert_logic.VectorSearchEngineClient, "get_instance", return_value=self.vector_db_client
+            ),
+            mock.patch.object(
+                insert_logic.TextSearchEngineClient, "get_instance", return_value=self.search_engine_client
+            ),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def tearDown(self):
+        insert_logic.database_layout_update_tasks.close()
+        self.cache_dir.cleanup()
+
+    def get_status_from_other_process(self) -> dict:
+        # a separate cache instance on the same directory, like in another worker process
+        with Cache(self.cache_dir.name) as other_cache:
+            return other_cache.get(1) or {}  # type: ignore
+
+    def test_status_is_shared(self):
+        task = insert_logic.update_database_layout(1, blocking=True)
+        status = self.get_status_from_other_process()
+        self.assertEqual(status["task_id"], task["task_id"])
+        self.assertEqual(status["status"], "finished")
+        self.assertEqual(status["progress"], 1.0)
+        self.assertEqual(sorted(status["finished_steps"]), ["text search engine", "vector field embedding"])
+        self.assertEqual(insert_logic.get_database_layout_update_status(1), status)
+
+    def test_failed_steps_are_stored(self):
+        self.search_engine_client.ensure_dataset_exists.side_effect = ConnectionError("not reachable")
+        with self.assertRaises(ValueError):
+            insert_logic.update_database_layout(1, blocking=True)
+        status = self.get_status_from_other_process()
+        self.assertEqual(status["status"], "failed")
+        self.assertIn("text search engine", status["failed_steps"])
+
+    def test_background_update(self):
+        task = insert_logic.update_database_layout(1, blocking=False)
+        for _ in range(100):
+            if not self.get_status_from_other_process().get("is_running"):
+                break
+            time.sleep(0.01)
+        status = self.get_status_from_other_process()
+        self.assertEqual(status["task_id"], task["task_id"])
+        self.assertEqual(status["status"], "finished")
+
+    def test_older_task_does_not_overwrite_newer_one(self):
+        old_task = {"task_id": "old", "status": "started"}
+        insert_logic._store_database_layout_update_status(1, old_task, is_new_task=True)
+        insert_logic._store_database_layout_update_status(1, {"task_id": "new", "status": "started"}, is_new_task=True)
+        old_task["status"] = "finished"
+        insert_logic._store_database_layout_update_status(1, old_task)
+        self.assertEqual(self.get_status_from_other_process()["task_id"], "new")
+
+    def test_unknown_dataset_has_empty_status(self):
+        self.assertEqual(insert_logic.get_database_layout_update_status(2), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
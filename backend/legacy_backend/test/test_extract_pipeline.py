@@ -0,0 +1,88 @@
+"""
+Run with "python3 -m unittest legacy_backend.test.test_extract_pipeline" from the backend folder
+"""
+
+import copy
+import os
+import unittest
+from unittest import mock
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project_base.settings")
+django.setup()
+
+from legacy_backend.logic import extract_pipeline  # noqa: E402
+from legacy_backend.logic.extract_pipeline import get_pipeline_steps  # noqa: E402
+
+GENERATOR = {"requires_multiple_input_fields": False, "returns_multiple_fields": False}
+
+DATASET = {
+    "id": 1,
+    "name": "test",
+    "schema": {
+        "object_fields": {
+            "text": {
+                "identifier": "text",
+                "source_fields": [],
+                "generator": None,
+                "should_be_generated": False,
+            },
+            "embedding": {
+                "identifier": "embedding",
+                "source_fields": ["text"],
+                "generator": GENERATOR,
+                "should_be_generated": True,
+                "generating_condition": None,
+            },
+        },
+    },
+}
+
+
+class PipelineStepsCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.dataset = copy.deepcopy(DATASET)
+        patches = [
+            mock.patch.object(extract_pipeline, "_pipeline_steps_cache", extract_pipeline.cachetools.LRUCache(16)),
+            mock.patch.object(extract_pipeline, "get_generator_function_from_field", return_value=lambda batch: batch),
+            mock.patch.object(extract_pipeline, "_plan_pipeline_steps", wraps=extract_pipeline._plan_pipeline_steps),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_pipeline_is_planned_once(self):
+        first = get_pipeline_steps(self.dataset)
+        second = get_pipeline_steps(self.dataset)
+        self.assertEqual(first, second)
+        self.assertEqual(extract_pipeline._plan_pipeline_steps.call_count, 1)
+        pipeline_steps, required_fields, potentially_changed_fields = first
+        self.assertEqual([[step["target_field"] for step in phase] for phase in pipeline_steps], [["embedding"]])
+        self.assertEqual(required_fields, {"text"})
+        self.assertEqual(potentially_changed_fields, {"embedding"})
+
+    def test_schema_change_invalidates_cache(self):
+        get_pipeline_steps(self.dataset)
+        self.dataset["schema"]["object_fields"]["embedding"]["should_be_generated"] = False
+        pipeline_steps, _, _ = get_pipeline_steps(self.dataset)
+        self.assertEqual(pipeline_steps, [])
+        self.assertEqual(extract_pipeline._plan_pipeline_steps.call_count, 2)
+
+    def test_arguments_are_part_of_the_key(self):
+        get_pipeline_steps(self.dataset)
+        pipeline_steps, _, _ = get_pipeline_steps(self.dataset, ignored_fields=["embedding"])
+        self.assertEqual(pipeline_steps, [])
+        self.assertEqual(extract_pipeline._plan_pipeline_steps.call_count, 2)
+
+    def test_cached_entry_is_not_changed_by_caller(self):
+        pipeline_steps, required_fields, _ = get_pipeline_steps(self.dataset)
+        pipeline_steps.append([])
+        required_fields.add("other")
+        pipeline_steps, required_fields, _ = get_pipeline_steps(self.dataset)
+        self.assertEqual(len(pipeline_steps), 1)
+        self.assertEqual(required_fields, {"text"})
+
+
+if __name__ == "__main__":
+    unittest.main()
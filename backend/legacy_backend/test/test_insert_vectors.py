@@ -0,0 +1,77 @@
+"""
+Run with "python3 -m unittest legacy_backend.test.test_insert_vectors" from the backend folder
+"""
+
+import os
+import unittest
+from unittest import mock
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project_base.settings")
+django.setup()
+
+from data_map_backend.utils import DotDict, pk_to_uuid_id  # noqa: E402
+from legacy_backend.logic import insert_logic  # noqa: E402
+from legacy_backend.logic.insert_logic import insert_vectors  # noqa: E402
+from legacy_backend.utils.field_types import FieldType  # noqa: E402
+
+DATASET = DotDict(
+    {
+        "actual_database_name": "test_db",
+        "schema": {
+            "object_fields": {
+                "embedding": {"identifier": "embedding", "field_type": FieldType.VECTOR},
+                "year": {"identifier": "year", "field_type": FieldType.INTEGER, "is_available_for_filtering": True},
+                "language": {
+                    "identifier": "language",
+                    "field_type": FieldType.STRING,
+                    "is_available_for_filtering": True,
+                },
+                "title": {"identifier": "title", "field_type": FieldType.TEXT},
+            },
+        },
+    }
+)
+
+
+class InsertVectorsTest(unittest.TestCase):
+    def setUp(self):
+        self.vector_db_client = mock.Mock()
+        self.search_engine_client = mock.Mock()
+        patches = [
+            mock.patch.object(insert_logic, "get_dataset", return_value=DATASET),
+            mock.patch.object(
+                insert_logic.VectorSearchEngineClient, "get_instance", return_value=self.vector_db_client
+            ),
+            mock.patch.object(
+                insert_logic.TextSearchEngineClient, "get_instance", return_value=self.search_engine_client
+            ),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_provided_payloads_are_reduced_to_filter_fields(self):
+        payloads = [
+            {"year": 2020, "language": "en", "title": "A"},
+            {"year": 2021, "title": "B"},
+        ]
+        insert_vectors(1, "embedding", ["a", "b"], [[0.1], [0.2]], ["language"], payloads)
+        self.search_engine_client.get_items_by_ids.assert_not_called()
+        self.vector_db_client.upsert_items.assert_called_once_with(
+            "test_db",
+            "embedding",
+            [pk_to_uuid_id("a"), pk_to_uuid_id("b")],
+            [{"year": 2020}, {"year": 2021}],
+            [[0.1], [0.2]],
+        )
+
+    def test_number_of_payloads_must_match_items(self):
+        with self.assertRaises(ValueError):
+            insert_vectors(1, "embedding", ["a", "b"], [[0.1], [0.2]], payloads=[{"year": 2020}])
+        self.vector_db_client.upsert_items.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+"""
+Run with "python3 -m unittest legacy_backend.test.test_keyword_highlights" from the backend folder
+"""
+
+import os
+import unittest
+from unittest import mock
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project_base.settings")
+django.setup()
+
+from data_map_backend.utils import DotDict  # noqa: E402
+from legacy_backend.logic import search, search_common  # noqa: E402
+from legacy_backend.logic.search_common import (  # noqa: E402
+    MAX_ITEMS_TO_HIGHLIGHT,
+    QueryInput,
+    get_fulltext_search_results,
+)
+from legacy_backend.utils.collect_timings import Timings  # noqa: E402
+from legacy_backend.utils.field_types import FieldType  # noqa: E402
+
+DATASET = DotDict(
+    {
+        "id": 1,
+        "created_in_ui": False,
+        "merged_advanced_options": {},
+        "schema": {
+            "advanced_options": {},
+            "default_search_fields": ["title"],
+            "object_fields": {
+                "title": {"identifier": "title", "field_type": FieldType.TEXT, "is_available_for_search": True},
+            },
+        },
+    }
+)
+
+
+def fake_search_results(dataset, text_fields, filters, query, negative_query, page, limit, *args, **kwargs):
+    return [{"_id": str(i), "_score": 1.0, "highlight": {"title": ["<b>x</b>"]}} for i in range(limit)], limit
+
+
+class KeywordHighlightsTest(unittest.TestCase):
+    def setUp(self):
+        self.text_db_client = mock.Mock()
+        self.text_db_client.get_search_results.side_effect = fake_search_results
+        patch = mock.patch.object(
+            search_common.TextSearchEngineClient, "get_instance", return_value=self.text_db_client
+        )
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def search(self, limit: int, return_highlights: bool) -> dict:
+        items, _ = get_fulltext_search_results(
+            DATASET, ["title"], QueryInput("x"), [], ["_id"], limit, 0, return_highlights=return_highlights
+        )
+        return items
+
+    def test_no_highlight_query_without_highlights(self):
+        self.search(MAX_ITEMS_TO_HIGHLIGHT * 3, return_highlights=False)
+        self.assertEqual(self.text_db_client.get_search_results.call_count, 1)
+        self.assertFalse(self.text_db_client.get_search_results.call_args.kwargs["highlights"])
+
+    def test_highlights_of_top_items_are_fetched_separately(self):
+        items = self.search(MAX_ITEMS_TO_HIGHLIGHT * 3, return_highlights=True)
+        self.assertEqual(self.text_db_client.get_search_results.call_count, 2)
+        highlight_filter = self.text_db_client.get_search_results.call_args.args[2][-1]
+        self.assertEqual(len(highlight_filter["value"]), MAX_ITEMS_TO_HIGHLIGHT)
+        self.assertEqual(len(items["0"]["_relevant_parts"]), 1)
+
+    def test_maps_dont_request_highlights(self):
+        search_settings = DotDict(
+            {
+                "all_field_query": "x",
+                "all_field_query_negative": "",
+                "result_list_items_per_page": 10,
+                "result_list_current_page": 0,
+                "max_items_used_for_mapping": 2000,
+                "retrieval_mode": "keyword",
+                "filters": [],
+                "return_highlights": True,
+            }
+        )
+        patches = [
+            mock.patch.object(search, "get_fulltext_search_results", return_value=({}, 0)),
+            mock.patch.object(search, "get_required_fields", return_value=[]),
+            mock.patch.object(search, "adapt_filters_to_dataset", return_value=[]),
+            mock.patch.object(search, "combine_and_sort_result_sets", return_value=([], {}, {})),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+        for purpose, highlights_expected in [("list", True), ("map", False)]:
+            search.get_search_results_using_combined_query(DATASET, search_settings, DotDict(), purpose, Timings())
+            kwargs = search.get_fulltext_search_results.call_args.kwargs
+            self.assertEqual(kwargs["return_highlights"], highlights_expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
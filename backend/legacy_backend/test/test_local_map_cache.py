@@ -0,0 +1,108 @@
+"""
+Run with "python3 -m unittest legacy_backend.test.test_local_map_cache" from the backend folder
+"""
+
+import pickle
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from legacy_backend.logic.local_map_cache import LocalMapStore
+
+
+def create_map(map_id: str, finished: bool = True, size: int = 1000) -> dict:
+    return {"map_id": map_id, "finished": finished, "last_accessed": time.time(), "data": "x" * size}
+
+
+class LocalMapStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.spill_dir = tempfile.TemporaryDirectory()
+        map_size = len(pickle.dumps(create_map("map_0"), protocol=pickle.HIGHEST_PROTOCOL))
+        # room for two maps in memory:
+        self.store = LocalMapStore(
+            max_memory_bytes=2 * map_size,
+            memory_ttl=3600,
+            spill_dir=self.spill_dir.name,
+            disk_ttl=3600,
+            max_disk_bytes=100 * 1024 * 1024,
+        )
+
+    def tearDown(self):
+        self.store.disk_cache.close()
+        self.spill_dir.cleanup()
+
+    def test_memory_budget_spills_least_recently_used_maps(self):
+        for i in range(4):
+            map_data = create_map(f"map_{i}")
+            map_data["last_accessed"] = time.time() - 10 + i  # map_0 is the least recently used one
+            self.store[f"map_{i}"] = map_data
+        self.store.evict()
+        self.assertLessEqual(self.store.memory_usage(), self.store.max_memory_bytes)
+        self.assertNotIn("map_0", self.store._maps)
+        self.assertNotIn("map_1", self.store._maps)
+        self.assertIn("map_3", self.store._maps)
+
+    def test_spilled_maps_are_loaded_again(self):
+        for i in range(4):
+            self.store[f"map_{i}"] = create_map(f"map_{i}")
+        self.store.evict()
+        for i in range(4):
+            self.assertIn(f"map_{i}", self.store)
+            self.assertEqual(self.store[f"map_{i}"]["map_id"], f"map_{i}")
+
+    def test_unfinished_maps_stay_in_memory(self):
+        for i in range(4):
+            self.store[f"map_{i}"] = create_map(f"map_{i}", finished=False)
+        self.store.evict()
+        self.assertEqual(len(self.store._maps), 4)
+
+    def test_maps_not_accessed_within_ttl_are_spilled(self):
+        self.store.memory_ttl = 60
+        old_map = create_map("old")
+        old_map["last_accessed"] = time.time() - 120
+        self.store["old"] = old_map
+        self.store["new"] = create_map("new")
+        self.store.evict()
+        self.assertNotIn("old", self.store._maps)
+        self.assertIn("new", self.store._maps)
+        self.assertIn("old", self.store)
+
+    def test_maps_are_pickled_once_when_spilled(self):
+        for i in range(4):
+            self.store[f"map_{i}"] = create_map(f"map_{i}")
+        with mock.patch.object(pickle, "dumps", wraps=pickle.dumps) as dumps:
+            self.store.evict()
+        pickled_map_ids = [args[0]["map_id"] for args, _ in dumps.call_args_list if isinstance(args[0], dict)]
+        self.assertEqual(sorted(pickled_map_ids), ["map_0", "map_1", "map_2", "map_3"])
+
+    def test_disk_is_accessed_without_holding_the_lock(self):
+        lock_was_free = []
+
+        def try_lock():
+            acquired = self.store._lock.acquire(timeout=1)
+            lock_was_free.append(acquired)
+            if acquired:
+                self.store._lock.release()
+
+        def check_lock(*args, **kwargs):
+            # the lock is reentrant, so it needs to be acquired from another thread:
+            thread = threading.Thread(target=try_lock)
+            thread.start()
+            thread.join()
+
+        for i in range(4):
+            self.store[f"map_{i}"] = create_map(f"map_{i}")
+        disk_cache = self.store.disk_cache
+        with (
+            mock.patch.object(disk_cache, "set", side_effect=check_lock),
+            mock.patch.object(disk_cache, "get", side_effect=check_lock),
+        ):
+            self.store.evict()
+            self.assertIsNone(self.store.get("map_0"))
+        self.assertEqual(lock_was_free, [True, True, True])
+
+
+if __name__ == "__main__":
+    unittest.main()
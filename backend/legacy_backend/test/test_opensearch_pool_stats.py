@@ -0,0 +1,69 @@
+"""
+Run with "python3 -m unittest legacy_backend.test.test_opensearch_pool_stats" from the backend folder
+"""
+
+import os
+import unittest
+from unittest import mock
+
+import django
+from urllib3.exceptions import EmptyPoolError
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project_base.settings")
+django.setup()
+
+from legacy_backend.database_client import text_search_engine_client  # noqa: E402
+from legacy_backend.database_client.text_search_engine_client import (  # noqa: E402
+    ConnectionPoolStats,
+    InstrumentedUrllib3HttpConnection,
+)
+
+
+class ConnectionPoolStatsTest(unittest.TestCase):
+    def setUp(self):
+        self.stats = ConnectionPoolStats()
+        patch = mock.patch.object(text_search_engine_client, "connection_pool_stats", self.stats)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def create_pool(self, block: bool):
+        # no request is sent, connections are only opened when used
+        with mock.patch.object(text_search_engine_client, "open_search_pool_block", block):
+            connection = InstrumentedUrllib3HttpConnection(host="localhost", port=9200, pool_maxsize=2)
+        self.addCleanup(connection.close)
+        return connection.pool
+
+    def test_connections_beyond_maxsize_are_counted(self):
+        pool = self.create_pool(block=False)
+        connections = [pool._get_conn() for _ in range(3)]
+        for connection in connections:
+            pool._put_conn(connection)
+        stats = self.stats.get_stats()
+        self.assertEqual(stats["acquisitions"], 3)
+        self.assertEqual(stats["overflow_connections"], 1)
+        self.assertEqual(stats["discarded_connections"], 1)
+
+    def test_reused_connections_are_not_counted(self):
+        pool = self.create_pool(block=False)
+        for _ in range(5):
+            pool._put_conn(pool._get_conn())
+        stats = self.stats.get_stats()
+        self.assertEqual(stats["acquisitions"], 5)
+        self.assertEqual(stats["overflow_connections"], 0)
+        self.assertEqual(stats["discarded_connections"], 0)
+
+    def test_timeout_in_blocking_mode_is_no_overflow(self):
+        pool = self.create_pool(block=True)
+        connections = [pool._get_conn() for _ in range(2)]
+        with self.assertRaises(EmptyPoolError):
+            pool._get_conn(timeout=0.01)
+        for connection in connections:
+            pool._put_conn(connection)
+        stats = self.stats.get_stats()
+        self.assertEqual(stats["acquisitions"], 3)
+        self.assertEqual(stats["slow_acquisitions"], 1)
+        self.assertEqual(stats["overflow_connections"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
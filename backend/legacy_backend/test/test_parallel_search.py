@@ -0,0 +1,69 @@
+"""
+Run with "python3 -m unittest legacy_backend.test.test_parallel_search" from the backend folder
+"""
+
+import os
+import threading
+import time
+import unittest
+from unittest import mock
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project_base.settings")
+django.setup()
+
+from data_map_backend.utils import DotDict  # noqa: E402
+from legacy_backend.logic import search  # noqa: E402
+from legacy_backend.utils.collect_timings import Timings  # noqa: E402
+
+
+class ConcurrencyCounter(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.max_running = 0
+
+    def run(self, result):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.02)
+        with self.lock:
+            self.running -= 1
+        return result
+
+
+class ParallelSearchTest(unittest.TestCase):
+    def setUp(self):
+        self.counter = ConcurrencyCounter()
+
+    def search_dataset(self, dataset_id, params, purpose, timings, similar_item_info, max_parallel_legs):
+        legs = [(f"leg {i}", lambda i=i: self.counter.run(([i], 1))) for i in range(8)]
+        search.run_search_legs_in_parallel(legs, timings, max_parallel_legs)
+        return [dataset_id], {}, {}, 1
+
+    def test_datasets_share_the_leg_budget(self):
+        params = DotDict({"search": {"dataset_ids": list(range(10))}})
+        with (
+            mock.patch.object(search, "_get_search_results_for_dataset", side_effect=self.search_dataset),
+            mock.patch.object(search, "MAX_PARALLEL_SEARCH_LEGS", 8),
+            mock.patch.object(search, "MAX_PARALLEL_DATASET_SEARCHES", 4),
+        ):
+            results = search.search_datasets_in_parallel(params, "list", Timings(), None)
+        self.assertEqual([sorted_ids for sorted_ids, _, _, _ in results], [[i] for i in range(10)])
+        self.assertLessEqual(self.counter.max_running, 8)
+
+    def test_legs_run_in_calling_thread_without_budget(self):
+        threads = set()
+
+        def leg():
+            threads.add(threading.get_ident())
+            return [], 0
+
+        search.run_search_legs_in_parallel([("a", leg), ("b", leg)], Timings(), max_parallel_legs=1)
+        self.assertEqual(threads, {threading.get_ident()})
+
+
+if __name__ == "__main__":
+    unittest.main()
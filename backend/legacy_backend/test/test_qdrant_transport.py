@@ -0,0 +1,53 @@
+"""
+Run with "python3 -m unittest legacy_backend.test.test_qdrant_transport" from the backend folder
+"""
+
+import os
+import unittest
+from unittest import mock
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project_base.settings")
+django.setup()
+
+from legacy_backend.database_client import vector_search_engine_client  # noqa: E402
+from legacy_backend.database_client.vector_search_engine_client import (  # noqa: E402
+    VectorSearchEngineClient,
+)
+
+
+class QdrantTransportTest(unittest.TestCase):
+    def setUp(self):
+        patch = mock.patch.object(vector_search_engine_client, "QdrantClient")
+        self.qdrant_client_class = patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_grpc(self):
+        client, transport = VectorSearchEngineClient.create_qdrant_client("grpc")
+        self.assertEqual(transport, "grpc")
+        self.assertIs(client, self.qdrant_client_class.return_value)
+        self.assertTrue(self.qdrant_client_class.call_args.kwargs["prefer_grpc"])
+
+    def test_fallback_to_rest_if_grpc_is_not_reachable(self):
+        grpc_client, rest_client = mock.Mock(), mock.Mock()
+        grpc_client.get_collections.side_effect = ConnectionError("port not reachable")
+        self.qdrant_client_class.side_effect = [grpc_client, rest_client]
+        client, transport = VectorSearchEngineClient.create_qdrant_client("grpc")
+        self.assertEqual(transport, "rest")
+        self.assertIs(client, rest_client)
+        grpc_client.close.assert_called_once()
+        self.assertNotIn("prefer_grpc", self.qdrant_client_class.call_args.kwargs)
+
+    def test_rest(self):
+        _, transport = VectorSearchEngineClient.create_qdrant_client("rest")
+        self.assertEqual(transport, "rest")
+        self.assertEqual(self.qdrant_client_class.call_count, 1)
+
+    def test_unknown_transport_uses_rest(self):
+        _, transport = VectorSearchEngineClient.create_qdrant_client("carrier_pigeon")
+        self.assertEqual(transport, "rest")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+Run with "python3 -m unittest legacy_backend.test.test_query_embedding_cache" from the backend folder
+"""
+
+import unittest
+
+import numpy as np
+
+from legacy_backend.logic.query_embedding_cache import QueryEmbeddingCache
+
+GENERATOR_KEY = ("space", "module", "{}", "search")
+
+
+class FakeGenerator(object):
+    def __init__(self, dimensions: int = 4):
+        self.dimensions = dimensions
+        self.calls: list[list[str]] = []
+
+    def __call__(self, batch: list[list[str]]) -> list[list[float]]:
+        texts = [source_fields[0] for source_fields in batch]
+        self.calls.append(texts)
+        return [[float(len(text))] * self.dimensions for text in texts]
+
+
+class QueryEmbeddingCacheTest(unittest.TestCase):
+    def test_repeated_query_is_served_from_cache(self):
+        cache = QueryEmbeddingCache(max_bytes=1024 * 1024)
+        generator = FakeGenerator()
+        first = cache.get_embeddings(GENERATOR_KEY, ["hello world"], generator)
+        second = cache.get_embeddings(GENERATOR_KEY, ["hello world"], generator)
+        self.assertEqual(first, second)
+        self.assertEqual(len(generator.calls), 1)
+        self.assertEqual(cache.get_stats()["hits"], 1)
+
+    def test_generator_gets_original_text(self):
+        cache = QueryEmbeddingCache(max_bytes=1024 * 1024)
+        generator = FakeGenerator()
+        cache.get_embeddings(GENERATOR_KEY, ["  Hello   World "], generator)
+        self.assertEqual(generator.calls, [["  Hello   World "]])
+        # same normalized text -> cache hit, no second call:
+        cache.get_embeddings(GENERATOR_KEY, ["Hello World"], generator)
+        self.assertEqual(len(generator.calls), 1)
+
+    def test_case_is_part_of_the_key(self):
+        cache = QueryEmbeddingCache(max_bytes=1024 * 1024)
+        generator = FakeGenerator()
+        cache.get_embeddings(GENERATOR_KEY, ["Apple"], generator)
+        cache.get_embeddings(GENERATOR_KEY, ["apple"], generator)
+        self.assertEqual(generator.calls, [["Apple"], ["apple"]])
+
+    def test_size_limit_evicts_least_recently_used(self):
+        vector_bytes = np.array([0.0] * 4).nbytes
+        cache = QueryEmbeddingCache(max_bytes=2 * vector_bytes)
+        generator = FakeGenerator()
+        for text in ["a", "b", "c"]:
+            cache.get_embeddings(GENERATOR_KEY, [text], generator)
+        stats = cache.get_stats()
+        self.assertEqual(stats["entries"], 2)
+        self.assertLessEqual(stats["size_bytes"], stats["max_bytes"])
+        # "a" was evicted, "c" is still cached:
+        cache.get_embeddings(GENERATOR_KEY, ["c"], generator)
+        self.assertEqual(len(generator.calls), 3)
+        cache.get_embeddings(GENERATOR_KEY, ["a"], generator)
+        self.assertEqual(len(generator.calls), 4)
+
+    def test_vector_larger_than_cache_is_not_stored(self):
+        cache = QueryEmbeddingCache(max_bytes=8)
+        generator = FakeGenerator(dimensions=16)
+        result = cache.get_embeddings(GENERATOR_KEY, ["large"], generator)
+        self.assertEqual(len(result or []), 1)
+        self.assertEqual(cache.get_stats()["entries"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+Run with "python3 -m unittest legacy_backend.test.test_rank_fusion" from the backend folder
+"""
+
+import copy
+import math
+import os
+import random
+import unittest
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project_base.settings")
+django.setup()
+
+from legacy_backend.logic.search_common import (  # noqa: E402
+    combine_result_sets_and_calculate_scores,
+)
+from legacy_backend.utils.collect_timings import Timings  # noqa: E402
+
+
+def generate_result_sets(num_legs: int, items_per_leg: int, id_space: int, seed: int = 1) -> list[dict]:
+    rng = random.Random(seed)
+    result_sets = []
+    for leg in range(num_legs):
+        ids = rng.sample(range(id_space), items_per_leg)
+        scores = sorted((round(rng.random(), 1) for _ in ids), reverse=True)
+        result_set = {}
+        for rank, (item_id, score) in enumerate(zip(ids, scores)):
+            item = {
+                "_id": str(item_id),
+                "_origins": [
+                    {"type": "vector", "field": f"leg_{leg}", "query": "q", "score": score, "rank": rank + 1}
+                ],
+            }
+            if leg % 2 == 1:
+                item["_relevant_parts"] = [{"field": f"leg_{leg}", "index": rank}]
+            result_set[str(item_id)] = item
+        result_sets.append(result_set)
+    return result_sets
+
+
+def reference_rank_fusion(result_sets: list[dict]) -> dict:
+    # previous implementation
+    total_items = result_sets[0] if result_sets else {}
+    for result_set in result_sets[1:]:
+        for item in result_set.values():
+            if item["_id"] not in total_items:
+                total_items[item["_id"]] = item
+            else:
+                total_items[item["_id"]]["_origins"] += item["_origins"]
+                if "_relevant_parts" in item:
+                    if "_relevant_parts" not in total_items[item["_id"]]:
+                        total_items[item["_id"]]["_relevant_parts"] = []
+                    total_items[item["_id"]]["_relevant_parts"] += item["_relevant_parts"]
+    for item in total_items.values():
+        item["_reciprocal_rank_score"] = sum([1.0 / origin["rank"] for origin in item["_origins"]])
+        if len(result_sets) > 1:
+            item["_score"] = math.sqrt(item["_reciprocal_rank_score"])
+        else:
+            item["_score"] = item["_origins"][0]["score"]
+    return total_items
+
+
+def top_ids(items: dict, limit: int) -> list[str]:
+    # sorted() is stable, items with the same score stay in the order of the dict
+    return sorted(items.keys(), key=lambda id: items[id]["_reciprocal_rank_score"], reverse=True)[:limit]
+
+
+class RankFusionTest(unittest.TestCase):
+    def assert_same_as_reference(self, result_sets: list[dict], limit: int | None):
+        reference_items = reference_rank_fusion(copy.deepcopy(result_sets))
+        items = combine_result_sets_and_calculate_scores(copy.deepcopy(result_sets), Timings(), limit)
+        expected_ids = top_ids(reference_items, limit or len(reference_items))
+        self.assertEqual(top_ids(items, len(items)), expected_ids)
+        for item_id in expected_ids:
+            self.assertEqual(items[item_id], reference_items[item_id])
+
+    def test_multiple_legs_without_limit(self):
+        self.assert_same_as_reference(generate_result_sets(3, 200, 400), None)
+
+    def test_multiple_legs_with_limit(self):
+        self.assert_same_as_reference(generate_result_sets(4, 500, 1200), 50)
+
+    def test_single_leg_keeps_original_score(self):
+        self.assert_same_as_reference(generate_result_sets(1, 100, 300), 20)
+
+    def test_limit_larger_than_number_of_items(self):
+        self.assert_same_as_reference(generate_result_sets(2, 10, 15), 1000)
+
+    def test_empty_result_sets(self):
+        self.assertEqual(combine_result_sets_and_calculate_scores([], Timings(), 10), {})
+        self.assertEqual(combine_result_sets_and_calculate_scores([{}, {}], Timings(), 10), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
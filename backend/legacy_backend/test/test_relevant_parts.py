@@ -0,0 +1,95 @@
+"""
+Run with "python3 -m unittest legacy_backend.test.test_relevant_parts" from the backend folder
+"""
+
+import os
+import unittest
+from unittest import mock
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project_base.settings")
+django.setup()
+
+from data_map_backend.utils import DotDict  # noqa: E402
+from legacy_backend.logic import search_common  # noqa: E402
+from legacy_backend.logic.search_common import (  # noqa: E402
+    get_relevant_full_text_chunks,
+    get_relevant_parts_of_item_using_query_vector,
+)
+
+DATASET = DotDict(
+    {
+        "id": 1,
+        "actual_database_name": "test_db",
+        "merged_advanced_options": {"full_text_chunk_embeddings": "chunk_vectors"},
+        "schema": {
+            "object_fields": {
+                "chunk_vectors": {
+                    "identifier": "chunk_vectors",
+                    "source_fields": ["chunks"],
+                    "generator": None,
+                    "text_similarity_threshold": 0.5,
+                },
+            },
+        },
+    }
+)
+
+
+def sub_item(array_index: int, score: float) -> DotDict:
+    return DotDict({"score": score, "payload": {"array_index": array_index}})
+
+
+def keep_order_reranking(query: str, texts: tuple, top_n: int) -> DotDict:
+    return DotDict({"results": [DotDict({"index": i}) for i in range(min(len(texts), top_n))]})
+
+
+class RelevantPartsTest(unittest.TestCase):
+    def setUp(self):
+        self.vector_db_client = mock.Mock()
+        self.vector_db_client.get_best_sub_items_of_many_parents.side_effect = (
+            lambda database_name, vector_field, parent_ids, *args: {
+                parent_id: [sub_item(2, 0.9), sub_item(0, 0.7)] for parent_id in parent_ids
+            }
+        )
+        self.generator_function = mock.Mock(return_value=[[0.1, 0.2]])
+        patches = [
+            mock.patch.object(
+                search_common.VectorSearchEngineClient, "get_instance", return_value=self.vector_db_client
+            ),
+            mock.patch.object(search_common, "get_suitable_generator", return_value=self.generator_function),
+            mock.patch.object(search_common, "get_reranking_results", side_effect=keep_order_reranking),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def test_chunks_of_all_items_are_searched_at_once(self):
+        chunks_per_item = {
+            "a": [{"text": "one"}, {"text": "two"}, {"text": "three"}],
+            "b": [{"text": "one"}, {"text": "two"}, {"text": "three"}],
+            "c": [{"text": "only chunk"}],
+        }
+        relevant_parts = get_relevant_full_text_chunks(DATASET, chunks_per_item, "question", 2)
+
+        self.generator_function.assert_called_once_with([["question"]])
+        self.vector_db_client.get_best_sub_items_of_many_parents.assert_called_once()
+        args = self.vector_db_client.get_best_sub_items_of_many_parents.call_args.args
+        self.assertEqual(args[:4], ("test_db", "chunk_vectors", ["a", "b"], [0.1, 0.2]))
+        self.assertEqual(args[4], 0.5)  # score threshold of the field
+
+        self.assertEqual([part["index"] for part in relevant_parts["a"]], [2, 0])
+        self.assertEqual(relevant_parts["a"][0]["field"], "chunks")
+        # items with a single chunk are not searched:
+        self.assertEqual([part["index"] for part in relevant_parts["c"]], [0])
+
+    def test_single_item(self):
+        item = get_relevant_parts_of_item_using_query_vector(DATASET, "a", "chunk_vectors", [0.1, 0.2])
+        self.assertEqual(item["_id"], "a")
+        self.assertEqual(item["_origins"][0]["score"], 0.9)
+        self.assertEqual([part["index"] for part in item["_relevant_parts"]], [2, 0])
+
+
+if __name__ == "__main__":
+    unittest.main()
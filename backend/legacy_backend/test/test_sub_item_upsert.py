@@ -0,0 +1,105 @@
+"""
+Run with "python3 -m unittest legacy_backend.test.test_sub_item_upsert" from the backend folder
+"""
+
+import os
+import unittest
+from unittest import mock
+
+import django
+from qdrant_client.http import models
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project_base.settings")
+django.setup()
+
+from data_map_backend.utils import DotDict, pk_to_uuid_id  # noqa: E402
+from legacy_backend.database_client import vector_search_engine_client  # noqa: E402
+from legacy_backend.database_client.vector_search_engine_client import (  # noqa: E402
+    VectorSearchEngineClient,
+)
+
+
+def matches(payload: dict, filter: models.Filter) -> bool:
+    # supports only the conditions used for sub items
+    def matches_condition(condition) -> bool:
+        if isinstance(condition, models.Filter):
+            return matches(payload, condition)
+        value = payload.get(condition.key)
+        if condition.match is not None:
+            return value in condition.match.any
+        return value is not None and value >= condition.range.gte
+
+    if filter.must and not all(matches_condition(condition) for condition in filter.must):
+        return False
+    if filter.should and not any(matches_condition(condition) for condition in filter.should):
+        return False
+    return True
+
+
+class FakeQdrantClient(object):
+    def __init__(self):
+        self.points: dict[str, dict] = {}  # id -> payload
+        self.num_upserted = 0
+
+    def retrieve(self, collection_name: str, ids: list, **kwargs) -> list:
+        return [DotDict({"id": _id, "payload": self.points[_id]}) for _id in ids if _id in self.points]
+
+    def upsert(self, collection_name: str, points: models.Batch):
+        if not collection_name.endswith("_sub_items"):
+            return
+        for _id, payload in zip(points.ids, points.payloads or []):
+            self.points[str(_id)] = payload
+        self.num_upserted += len(points.ids)
+
+    def count(self, collection_name: str, count_filter: models.Filter, exact: bool):
+        return DotDict({"count": sum(matches(payload, count_filter) for payload in self.points.values())})
+
+    def delete(self, collection_name: str, points_selector: models.FilterSelector):
+        self.points = {_id: p for _id, p in self.points.items() if not matches(p, points_selector.filter)}
+
+
+class SubItemUpsertTest(unittest.TestCase):
+    def setUp(self):
+        self.qdrant = FakeQdrantClient()
+        with mock.patch.object(VectorSearchEngineClient, "create_qdrant_client", return_value=(self.qdrant, "rest")):
+            self.client = VectorSearchEngineClient()
+        self.stats = vector_search_engine_client.SubItemUpsertStats()
+        patch = mock.patch.object(vector_search_engine_client, "sub_item_upsert_stats", self.stats)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def upsert(self, vectors_per_item: dict[str, list]):
+        ids = list(vectors_per_item.keys())
+        payloads = [{"title": f"Title {_id}"} for _id in ids]
+        self.client.upsert_items("db", "chunks", ids, payloads, list(vectors_per_item.values()))
+
+    def sub_items(self) -> set[tuple[str, int]]:
+        return {(payload["parent_id"], payload["array_index"]) for payload in self.qdrant.points.values()}
+
+    def test_sub_items_are_stored_with_stable_ids(self):
+        self.upsert({"a": [[0.1, 0.2], [0.3, 0.4]]})
+        self.assertEqual(self.sub_items(), {("a", 0), ("a", 1)})
+        self.assertIn(pk_to_uuid_id("a_1"), self.qdrant.points)
+
+    def test_unchanged_sub_items_are_not_rewritten(self):
+        self.upsert({"a": [[0.1, 0.2], [0.3, 0.4]]})
+        self.upsert({"a": [[0.1, 0.2], [0.5, 0.6]]})
+        self.assertEqual(self.qdrant.num_upserted, 3)
+        self.assertEqual(self.stats.get_stats(), {"received": 4, "changed": 3, "stale_deleted": 0})
+
+    def test_stale_sub_items_are_deleted(self):
+        self.upsert({"a": [[0.1, 0.2], [0.3, 0.4], [0.5, 0.6]], "b": [[0.1, 0.2], [0.3, 0.4]], "c": [[0.7, 0.8]]})
+        # a gets shorter, b is empty now, c is not part of this upsert:
+        self.upsert({"a": [[0.1, 0.2]], "b": []})
+        self.assertEqual(self.sub_items(), {("a", 0), ("c", 0)})
+        self.assertEqual(self.stats.get_stats()["stale_deleted"], 4)
+
+    def test_longer_array_keeps_existing_sub_items(self):
+        self.upsert({"a": [[0.1, 0.2]]})
+        self.upsert({"a": [[0.1, 0.2], [0.3, 0.4]]})
+        self.assertEqual(self.sub_items(), {("a", 0), ("a", 1)})
+        self.assertEqual(self.stats.get_stats()["stale_deleted"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+"""
+Run with "python3 -m unittest legacy_backend.test.test_vector_candidate_cache" from the backend folder
+"""
+
+import os
+import unittest
+from unittest import mock
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project_base.settings")
+django.setup()
+
+from data_map_backend.utils import DotDict  # noqa: E402
+from legacy_backend.database_client import vector_search_engine_client  # noqa: E402
+from legacy_backend.database_client.vector_search_engine_client import (  # noqa: E402
+    VectorSearchEngineClient,
+)
+
+
+class FakeQdrantClient(object):
+    def __init__(self, num_points: int = 1000):
+        self.num_points = num_points
+        self.search_limits: list[int] = []
+
+    def search(self, limit: int, **kwargs) -> list:
+        self.search_limits.append(limit)
+        return [DotDict({"id": i, "score": 1.0 - i / self.num_points}) for i in range(min(limit, self.num_points))]
+
+    def upsert(self, **kwargs):
+        pass
+
+    def delete(self, *args, **kwargs):
+        pass
+
+
+class VectorCandidateCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.qdrant = FakeQdrantClient()
+        with mock.patch.object(VectorSearchEngineClient, "create_qdrant_client", return_value=(self.qdrant, "rest")):
+            self.client = VectorSearchEngineClient()
+        self.dataset = DotDict(
+            {
+                "source_plugin": "",
+                "actual_database_name": "db",
+                # no exact search, to not need the point count:
+                "merged_advanced_options": {"exact_vector_search_max_items": 0},
+            }
+        )
+
+    def search(self, page: int, limit: int = 10) -> list:
+        return self.client.get_items_near_vector(
+            self.dataset,
+            "vector",
+            [0.1, 0.2],
+            None,
+            return_vectors=False,
+            limit=limit,
+            page=page,
+            score_threshold=None,
+        )
+
+    def test_following_pages_are_served_from_cache(self):
+        self.search(page=0)
+        self.search(page=1)
+        self.search(page=3)
+        # page 1 doubles the number of fetched results, page 3 doubles them again:
+        self.assertEqual(self.qdrant.search_limits, [10, 20, 40])
+        results = self.search(page=2)
+        self.assertEqual([hit.id for hit in results], list(range(20, 30)))
+        self.assertEqual(len(self.qdrant.search_limits), 3)
+
+    def test_first_page_is_not_served_from_cache(self):
+        self.search(page=0)
+        self.search(page=0)
+        self.assertEqual(self.qdrant.search_limits, [10, 10])
+
+    def test_upsert_invalidates_cache(self):
+        self.search(page=0)
+        self.search(page=1)
+        self.client.upsert_items("db", "vector", [1], [{}], [[0.3, 0.4]])
+        self.search(page=1)
+        self.assertEqual(self.qdrant.search_limits, [10, 20, 20])
+
+    def test_remove_invalidates_cache(self):
+        self.search(page=0)
+        self.search(page=1)
+        self.client.remove_items("db", "vector", [1], is_array_field=False)
+        self.search(page=1)
+        self.assertEqual(self.qdrant.search_limits, [10, 20, 20])
+
+    def test_other_collections_stay_cached(self):
+        self.search(page=0)
+        self.client.upsert_items("other_db", "vector", [1], [{}], [[0.3, 0.4]])
+        self.search(page=1)
+        self.assertEqual(self.qdrant.search_limits, [10, 20])
+        self.search(page=1)
+        self.assertEqual(len(self.qdrant.search_limits), 2)
+
+    def test_cache_size_is_limited_by_number_of_results(self):
+        with mock.patch.object(vector_search_engine_client, "VECTOR_CANDIDATE_CACHE_MAX_RESULTS", 50):
+            with mock.patch.object(
+                VectorSearchEngineClient, "create_qdrant_client", return_value=(self.qdrant, "rest")
+            ):
+                self.client = VectorSearchEngineClient()
+            self.search(page=0, limit=30)
+            self.assertEqual(self.client._candidate_cache.currsize, 30)
+            # 60 results don't fit into the cache and aren't stored:
+            self.search(page=1, limit=30)
+            self.assertEqual(self.client._candidate_cache.currsize, 30)
+        self.assertLessEqual(self.client._candidate_cache.currsize, self.client._candidate_cache.maxsize)
+
+
+if __name__ == "__main__":
+    unittest.main()
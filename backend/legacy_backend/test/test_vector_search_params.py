@@ -0,0 +1,62 @@
+"""
+Run with "python3 -m unittest legacy_backend.test.test_vector_search_params" from the backend folder
+"""
+
+import os
+import unittest
+from unittest import mock
+
+import django
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "project_base.settings")
+django.setup()
+
+from data_map_backend.utils import DotDict  # noqa: E402
+from legacy_backend.database_client import vector_search_engine_client  # noqa: E402
+from legacy_backend.database_client.vector_search_engine_client import (  # noqa: E402
+    HNSW_EF_FACTOR,
+    HNSW_EF_MAX,
+    HNSW_EF_MIN,
+    VectorSearchEngineClient,
+)
+
+
+class VectorSearchParamsTest(unittest.TestCase):
+    def setUp(self):
+        self.qdrant = mock.Mock()
+        self.qdrant.count.return_value = DotDict({"count": 1_000_000})
+        with mock.patch.object(VectorSearchEngineClient, "create_qdrant_client", return_value=(self.qdrant, "rest")):
+            self.client = VectorSearchEngineClient()
+
+    def get_search_params(self, num_results: int, collection_name: str = "large", **options):
+        dataset = DotDict({"merged_advanced_options": options})
+        # the point count is cached per collection, so each test uses its own collection names:
+        return self.client._get_search_params(dataset, f"{self.id()}_{collection_name}", num_results)
+
+    def test_ef_depends_on_number_of_results(self):
+        self.assertEqual(self.get_search_params(1000).hnsw_ef, int(1000 * HNSW_EF_FACTOR))
+        self.assertEqual(self.get_search_params(2000).hnsw_ef, int(2000 * HNSW_EF_FACTOR))
+        self.assertFalse(self.get_search_params(1000).exact)
+
+    def test_ef_is_clamped(self):
+        self.assertEqual(self.get_search_params(1).hnsw_ef, HNSW_EF_MIN)
+        self.assertEqual(self.get_search_params(10_000_000).hnsw_ef, HNSW_EF_MAX)
+
+    def test_dataset_options(self):
+        self.assertEqual(self.get_search_params(1000, hnsw_ef=64).hnsw_ef, 64)
+        self.assertEqual(self.get_search_params(1000, hnsw_ef_factor=3).hnsw_ef, 3000)
+
+    def test_small_collections_are_searched_exactly(self):
+        self.qdrant.count.return_value = DotDict({"count": 100})
+        self.assertTrue(self.get_search_params(10, collection_name="small").exact)
+        # disabled per dataset:
+        self.assertFalse(self.get_search_params(10, collection_name="small", exact_vector_search_max_items=0).exact)
+
+    def test_unknown_collection_size_is_not_searched_exactly(self):
+        self.qdrant.count.side_effect = ValueError("collection not found")
+        with mock.patch.object(vector_search_engine_client, "EXACT_VECTOR_SEARCH_MAX_ITEMS", 10**9):
+            self.assertFalse(self.get_search_params(10, collection_name="unknown").exact)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -14,6 +14,15 @@ class Timings(object):
         self.timings.append({"part": description, "duration": duration})
         self.last_timestamp = now
 
+    def log_duration(self, description, duration):
+        # for steps that ran in parallel to other steps, doesn't move the timestamp of the sequential steps
+        self.timings.append({"part": description, "duration": duration})
+
+    def add_sub_timings(self, prefix, other: "Timings"):
+        # for timings of a sub-task that ran in parallel to other sub-tasks
+        for timing in other.timings:
+            self.log_duration(f"{prefix}: {timing['part']}", timing["duration"])
+
     def get_timestamps(self):
         return self.timings
 
@@ -1,6 +1,9 @@
+import io
+import json
 import logging
 import os
 import time
+import zlib
 from collections import defaultdict
 
 import numpy as np
@@ -27,6 +30,15 @@ from map.schemas import (
     ProjectionData,
 )
 
+# "float32" or "float16" for the binary format (.npy), "json" for the legacy format
+UMAP_TRANSPORT_FORMAT = os.getenv("UMAP_TRANSPORT_FORMAT", "float32")
+UMAP_TRANSPORT_COMPRESSION = os.getenv("UMAP_TRANSPORT_COMPRESSION", "False") == "True"
+NPY_MIMETYPE = "application/x-npy"
+
+
+class UnsupportedTransportFormat(Exception):
+    pass
+
 
 def get_collection_items(
     collection: DataCollection,
@@ -68,6 +80,12 @@ def _umap_on_external_server(
     vectors: np.ndarray, projection_parameters: dict, reduced_dimensions_required: int
 ) -> np.ndarray:
     url = os.getenv("GPU_UTILITY_SERVER_URL", "http://localhost:55180") + "/api/umap"
+    if UMAP_TRANSPORT_FORMAT != "json":
+        try:
+            return _umap_on_external_server_binary(url, vectors, projection_parameters, reduced_dimensions_required)
+        except UnsupportedTransportFormat as e:
+            # e.g. an older version of the GPU utility server, falling back to JSON
+            logging.warning(f"Binary UMAP transport not supported by server, using JSON: {e}")
     data = {
         "vectors": vectors.tolist(),
         "reduced_dimensions": reduced_dimensions_required,
@@ -78,6 +96,37 @@ def _umap_on_external_server(
     return projections
 
 
+def _umap_on_external_server_binary(
+    url: str, vectors: np.ndarray, projection_parameters: dict, reduced_dimensions_required: int
+) -> np.ndarray:
+    # sending the raw buffer (.npy format including dtype and shape) instead of JSON lists of floats
+    # is about 10x smaller (float16: 20x) and doesn't require parsing on both sides
+    buffer = io.BytesIO()
+    dtype = np.float16 if UMAP_TRANSPORT_FORMAT == "float16" else np.float32
+    np.save(buffer, np.ascontiguousarray(vectors, dtype=dtype), allow_pickle=False)
+    body = buffer.getvalue()
+    headers = {
+        "Content-Type": NPY_MIMETYPE,
+        "Accept": NPY_MIMETYPE,
+        "X-Umap-Parameters": json.dumps(
+            {"reduced_dimensions": reduced_dimensions_required, "projection_parameters": projection_parameters}
+        ),
+    }
+    if UMAP_TRANSPORT_COMPRESSION:
+        body = zlib.compress(body, level=1)
+        headers["Content-Encoding"] = "deflate"
+    result = requests.post(url, data=body, headers=headers)
+    # older servers don't know the binary format, any other error (e.g. a crash during UMAP) is raised as usual:
+    if result.status_code in (404, 405, 415) or (
+        result.status_code == 400 and result.text.startswith("invalid vector data")
+    ):
+        raise UnsupportedTransportFormat(f"status {result.status_code}, {result.text[:200]}")
+    result.raise_for_status()
+    if not result.headers.get("Content-Type", "").startswith(NPY_MIMETYPE):
+        raise UnsupportedTransportFormat(f"status {result.status_code}, {result.headers.get('Content-Type')}")
+    return np.load(io.BytesIO(result.content), allow_pickle=False)
+
+
 def _local_umap(vectors: np.ndarray, projection_parameters: dict, reduced_dimensions_required: int) -> np.ndarray:
     # this is using the CPU-based, slow UMAP implementation (but therefore doesn't require the heavy cuml library)
     from umap import UMAP
@@ -0,0 +1,84 @@
+import io
+import json
+import unittest
+import zlib
+from unittest import mock
+
+import numpy as np
+import requests
+
+from map.logic import map_generation_steps
+from map.logic.map_generation_steps import (
+    NPY_MIMETYPE,
+    UnsupportedTransportFormat,
+    _umap_on_external_server_binary,
+)
+
+
+def make_response(status_code: int, content: bytes, content_type: str) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    response.headers["Content-Type"] = content_type
+    return response
+
+
+class BinaryUmapTransportTest(unittest.TestCase):
+    def setUp(self):
+        self.vectors = np.random.default_rng(0).random((20, 8)).astype(np.float32)
+        self.projections = np.random.default_rng(1).random((20, 2)).astype(np.float32)
+        self.received = {}
+
+    def fake_gpu_server(self, url, data, headers):
+        # decodes the request the same way as the GPU utility server
+        self.received["parameters"] = json.loads(headers["X-Umap-Parameters"])
+        if headers.get("Content-Encoding") == "deflate":
+            data = zlib.decompress(data)
+        self.received["vectors"] = np.load(io.BytesIO(data), allow_pickle=False)
+        buffer = io.BytesIO()
+        np.save(buffer, self.projections, allow_pickle=False)
+        return make_response(200, buffer.getvalue(), NPY_MIMETYPE)
+
+    def run_umap(self, transport_format: str, compression: bool) -> np.ndarray:
+        with (
+            mock.patch.object(map_generation_steps, "UMAP_TRANSPORT_FORMAT", transport_format),
+            mock.patch.object(map_generation_steps, "UMAP_TRANSPORT_COMPRESSION", compression),
+            mock.patch.object(map_generation_steps.requests, "post", side_effect=self.fake_gpu_server),
+        ):
+            return _umap_on_external_server_binary("http://gpu/api/umap", self.vectors, {"n_neighbors": 5}, 2)
+
+    def test_float32_round_trip(self):
+        projections = self.run_umap("float32", compression=False)
+        self.assertEqual(self.received["vectors"].dtype, np.float32)
+        np.testing.assert_array_equal(self.received["vectors"], self.vectors)
+        np.testing.assert_array_equal(projections, self.projections)
+        self.assertEqual(
+            self.received["parameters"], {"reduced_dimensions": 2, "projection_parameters": {"n_neighbors": 5}}
+        )
+
+    def test_float16_deflate_round_trip(self):
+        projections = self.run_umap("float16", compression=True)
+        self.assertEqual(self.received["vectors"].dtype, np.float16)
+        self.assertEqual(self.received["vectors"].shape, self.vectors.shape)
+        np.testing.assert_allclose(self.received["vectors"], self.vectors, atol=1e-3)
+        np.testing.assert_array_equal(projections, self.projections)
+
+    def post_returning(self, response: requests.Response):
+        return mock.patch.object(map_generation_steps.requests, "post", return_value=response)
+
+    def test_unsupported_format_on_old_server(self):
+        for response in [
+            make_response(415, b"Unsupported Media Type", "text/html"),
+            make_response(404, b"Not Found", "text/html"),
+            make_response(400, b"invalid vector data: bad header", "text/html"),
+        ]:
+            with self.post_returning(response), self.assertRaises(UnsupportedTransportFormat):
+                _umap_on_external_server_binary("http://gpu/api/umap", self.vectors, {}, 2)
+
+    def test_server_errors_are_raised(self):
+        for response in [
+            make_response(500, b"Internal Server Error", "text/html"),
+            make_response(400, b"invalid X-Umap-Parameters header", "text/html"),
+        ]:
+            with self.post_returning(response), self.assertRaises(requests.HTTPError):
+                _umap_on_external_server_binary("http://gpu/api/umap", self.vectors, {}, 2)
@@ -13,7 +13,7 @@ from data_map_backend.models import (
     FieldType,
 )
 from data_map_backend.schemas import ItemRelevance
-from legacy_backend.logic.chat_and_extraction import get_item_question_context
+from legacy_backend.logic.chat_and_extraction import get_question_context_of_items
 from search.schemas import ApprovalUsingComparisonReason, SearchTaskSettings
 
 
@@ -122,14 +122,20 @@ def approve_using_comparison(
         COLUMN_META_SOURCE_FIELDS.DESCRIPTIVE_TEXT_FIELDS,
     ]
     max_items_per_comparison = 15
-    for collection_item in new_items[:max_items_per_comparison]:
-        if collection_item.field_type != FieldType.IDENTIFIER:
-            continue
+    compared_items = [
+        collection_item
+        for collection_item in new_items[:max_items_per_comparison]
+        if collection_item.field_type == FieldType.IDENTIFIER
+    ]
+    item_contexts = get_question_context_of_items(
+        [(collection_item.dataset_id, collection_item.item_id) for collection_item in compared_items],  # type: ignore
+        fields,
+        search_task.user_input,
+    )
+    for collection_item in compared_items:
         assert collection_item.dataset_id is not None
         assert collection_item.item_id is not None
-        input_data = get_item_question_context(
-            collection_item.dataset_id, collection_item.item_id, fields, search_task.user_input
-        )["context"]
+        input_data = item_contexts[(collection_item.dataset_id, collection_item.item_id)]["context"]
         # input_data has newline at the end
         documents += f"document_id {collection_item.id}:\n{input_data}"
         for column in relevance_columns:  # should be only one in most cases
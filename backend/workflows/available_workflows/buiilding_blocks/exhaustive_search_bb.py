@@ -212,11 +212,16 @@ class ExhaustiveSearchBB(BaseBuidingBlock[ExhaustiveSearchInputContext, Exhausti
                 X_train.append(record.vector[abstract_vector_field_name])
                 Y_train.append(item_relevance)
             # then collect vectors of chunks
+            best_chunks_per_item = vector_client.get_best_sub_items_of_many_parents(
+                dataset.actual_database_name,  # type: ignore
+                chunk_vector_field_name,
+                [u.item_id for u in unique_items if u.item_id],  # type: ignore
+                vector,
+                with_vectors=True,
+                limit=1,
+            )
             for item in unique_items:
-                resp = vector_client.get_best_sub_items(
-                    dataset.actual_database_name, chunk_vector_field_name, item.item_id, vector, with_vectors=True, limit=1  # type: ignore
-                )
-                for sub_item in resp:
+                for sub_item in best_chunks_per_item.get(item.item_id, []):  # type: ignore
                     X_train.append(sub_item.vector["full_text_chunk_embeddings"])
                     Y_train.append(item.relevance)
 
@@ -15,7 +15,7 @@ from data_map_backend.models import (
     WritingTask,
 )
 from data_map_backend.schemas import ItemRelevance
-from legacy_backend.logic.chat_and_extraction import get_item_question_context
+from legacy_backend.logic.chat_and_extraction import get_question_context_of_items
 from write.prompts import writing_task_prompt_without_items
 
 
@@ -173,7 +173,16 @@ def _get_documents_context(task: WritingTask, items: BaseManager[CollectionItem]
             collection=task.collection, identifier__in=source_column_identifiers
         )
 
-    # collect context:
+    # collect context (for all items at once, to search their relevant parts in one batch):
+    item_contexts = get_question_context_of_items(
+        [
+            (item.dataset_id, item.item_id)
+            for item in items
+            if item.field_type == FieldType.IDENTIFIER and item.dataset_id is not None and item.item_id is not None
+        ],
+        task.source_fields,
+        task.expression,
+    )
     contexts = []
     provided_data_items = []
     for item in items:
@@ -184,9 +193,7 @@ def _get_documents_context(task: WritingTask, items: BaseManager[CollectionItem]
         elif item.field_type == FieldType.IDENTIFIER:
             assert item.dataset_id is not None
             assert item.item_id is not None
-            item_context = get_item_question_context(
-                item.dataset_id, item.item_id, task.source_fields, task.expression
-            )["context"]
+            item_context = item_contexts[(item.dataset_id, item.item_id)]["context"]
             item_text = f"Document ID: {len(provided_data_items) + 1}\n{item_context}"
             for additional_source_column in source_columns:
                 if not item.column_data:
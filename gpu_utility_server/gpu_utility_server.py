@@ -1,7 +1,10 @@
+import io
+import json
 import logging
+import zlib
 
 import numpy as np
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 from werkzeug import serving
 
@@ -32,6 +35,10 @@ def log_request(self, *args, **kwargs):
 
 serving.WSGIRequestHandler.log_request = log_request
 
+# binary format for vectors and projections: the .npy format (raw buffer plus dtype and shape header),
+# optionally compressed with zlib ("Content-Encoding: deflate")
+NPY_MIMETYPE = "application/x-npy"
+
 
 @app.route("/health", methods=["GET"])
 def health():
@@ -40,6 +47,8 @@ def health():
 
 @app.route("/api/umap", methods=["POST"])
 def umap_endpoint():
+    if request.mimetype == NPY_MIMETYPE:
+        return umap_endpoint_binary()
     data = request.get_json()
     vectors = np.array(data["vectors"])
     reduced_dimensions = data["reduced_dimensions"]
@@ -50,6 +59,34 @@ def umap_endpoint():
     return jsonify({"projections": projections.tolist()})
 
 
+def umap_endpoint_binary():
+    # the parameters are sent as JSON in a header, the body only contains the vectors
+    try:
+        parameters = json.loads(request.headers.get("X-Umap-Parameters", ""))
+        reduced_dimensions = int(parameters["reduced_dimensions"])
+        projection_parameters = parameters.get("projection_parameters") or {}
+        if not isinstance(projection_parameters, dict):
+            raise TypeError("projection_parameters is not an object")
+    except (ValueError, KeyError, TypeError) as e:
+        # e.g. missing or truncated header
+        return f"invalid X-Umap-Parameters header: {e!r}", 400
+    body = request.get_data()
+    try:
+        if request.headers.get("Content-Encoding") == "deflate":
+            body = zlib.decompress(body)
+        vectors = np.load(io.BytesIO(body), allow_pickle=False)
+    except (ValueError, zlib.error) as e:
+        return f"invalid vector data: {e}", 400
+    # UMAP works on float32 internally anyway, float16 is just used to make the transfer smaller
+    vectors = vectors.astype(np.float32, copy=False)
+
+    projections = do_umap(vectors, reduced_dimensions, projection_parameters)
+
+    buffer = io.BytesIO()
+    np.save(buffer, projections.astype(np.float32, copy=False), allow_pickle=False)
+    return Response(buffer.getvalue(), mimetype=NPY_MIMETYPE)
+
+
 def do_umap(
     vectors: np.ndarray,
     reduced_dimensions: int,
@@ -40,7 +40,9 @@ def insert_vectors(
     item_pks: list[str],
     vectors: list[list[float]],
     excluded_filter_fields: list[str] = [],
+    payloads: list[dict] | None = None,
 ):
+    # payloads: optional filtering fields per item, saves fetching them from the text search engine
     url = data_backend_url + "/data_backend/insert_vectors_sync"
     data = {
         "dataset_id": dataset_id,
@@ -48,6 +50,7 @@ def insert_vectors(
         "item_pks": item_pks,
         "vectors": vectors,
         "excluded_filter_fields": excluded_filter_fields,
+        "payloads": payloads,
     }
     cbor_data = cbor2.dumps(data)
     response = requests.post(url, data=cbor_data)